@@ -1,4 +1,5 @@
 import utime
+import micropython
 
 def _clamp(value, limits):
     lower, upper = limits
@@ -24,7 +25,13 @@ class PID(object):
         output_limits=[None, None],
         auto_mode=True,
         proportional_on_measurement=False,
-        error_map=None
+        error_map=None,
+        bumpless=False,
+        setpoint_ramp=None,
+        gain_schedule=None,
+        schedule_on='setpoint',
+        derivative_tau=None,
+        tracking_time=None
     ):
         """
         Initialize a new PID controller.
@@ -51,9 +58,29 @@ class PID(object):
             the input directly rather than on the error (which is the traditional way). Using
             proportional-on-measurement avoids overshoot for some types of systems.
         :param error_map: Function to transform the error value in another constrained value.
+        :param bumpless: Whether setpoint and Kp changes made with :meth:`set_setpoint` and
+            :attr:`tunings` should leave the output unchanged at the time of the change. The
+            proportional kick is moved into the integral term, which then takes the output to
+            the new setpoint without the jump.
+        :param setpoint_ramp: Maximum rate of change of the setpoint in units per second, when
+            changed with :meth:`set_setpoint`. None to apply new setpoints at once.
+        :param gain_schedule: Table of (x, Kp, Ki, Kd) the tunings are interpolated from, see
+            :meth:`set_schedule`. When set, Kp, Ki and Kd are the gains used until the first update.
+        :param schedule_on: 'setpoint' or 'input', what x of the gain schedule is.
+        :param derivative_tau: Time constant in seconds of a first-order low-pass filter on the
+            derivative term, None for no filter. A step of the input (sensor quantization, noise)
+            then moves the output over derivative_tau instead of in one update.
+        :param tracking_time: Time constant in seconds of the back-calculation anti-windup, None to
+            only clamp the integral to the output limits. While the output is saturated, the
+            integral term is pulled towards the value that would just saturate it, so the controller
+            leaves the limit as soon as the error allows instead of first unwinding the integral.
+            Usually between Td = Kd/Kp and Ti = Kp/Ki. With a large Kd, filter the derivative too:
+            a noisy derivative saturating the output would otherwise be fed into the integral.
         """
-        self.Kp, self.Ki, self.Kd = Kp, Ki, Kd
         self.setpoint = setpoint
+        self.bumpless = bumpless
+        self.setpoint_ramp = setpoint_ramp
+        self._target = None
         self.sample_time = sample_time
 
         def get_scale(x):
@@ -92,9 +119,17 @@ class PID(object):
         self._last_output = None
         self._last_input = None
 
+        self._Kp, self._Ki, self._Kd = 0, 0, 0
+        self.tunings = Kp, Ki, Kd
+        self.derivative_tau = derivative_tau
+        self.tracking_time = tracking_time
+        self._schedule = None
+        self.schedule_on = schedule_on
         self.output_limits = output_limits
         self.reset()
+        self.set_schedule(gain_schedule, schedule_on)
 
+    @micropython.native
     def __call__(self, input_, dt=None):
         """
         Update the PID controller.
@@ -103,15 +138,18 @@ class PID(object):
         sample_time has passed since the last update. If no new output is calculated,
         return the previous output instead (or None if no value has been calculated yet).
 
+        The gains are taken premultiplied by the time unit (see :meth:`_constants`) and the
+        limits are checked inline: this runs every control tick.
+
         :param dt: If set, uses this value for timestep instead of real time. This can be used in
             simulations when simulation time is different from real time.
         """
-        if not self.auto_mode:
+        if not self._auto_mode:
             return self._last_output
 
         now = self.time()
         if dt is None:
-            dt = utime.ticks_diff(now,self._last_time) if (utime.ticks_diff(now,self._last_time)) else 1e-16
+            dt = utime.ticks_diff(now, self._last_time) or 1e-16
         elif dt <= 0:
             raise ValueError('dt has negative value {}, must be positive'.format(dt))
 
@@ -119,9 +157,18 @@ class PID(object):
             # Only update every sample_time
             return self._last_output
 
+        # Move the setpoint towards the target of set_setpoint
+        if self._target is not None:
+            self._ramp(dt)
+
+        # Gains for the current operating point
+        if self._schedule is not None and self.schedule_on == 'input':
+            self._apply_schedule(input_)
+
         # Compute error terms
         error = self.setpoint - input_
-        d_input = input_ - (self._last_input if (self._last_input is not None) else input_)
+        last_input = self._last_input
+        d_input = input_ - (last_input if (last_input is not None) else input_)
 
         # Check if must map the error
         if self.error_map is not None:
@@ -130,22 +177,39 @@ class PID(object):
         # Compute the proportional term
         if not self.proportional_on_measurement:
             # Regular proportional-on-error, simply set the proportional term
-            self._proportional = self.Kp * error
+            proportional = self._Kp * error
         else:
             # Add the proportional error on measurement to error_sum
-            self._proportional -= self.Kp * self.unit * d_input
+            proportional = self._proportional - self._kpu * d_input
+
+        lower, upper = self._min_output, self._max_output
 
         # Compute integral and derivative terms
-        self._integral += (self.Ki * self.unit) * error * dt
-        self._integral = _clamp(self._integral, self.output_limits)  # Avoid integral windup
+        integral = self._integral + self._ki * error * dt
+        if upper is not None and integral > upper:  # Avoid integral windup
+            integral = upper
+        elif lower is not None and integral < lower:
+            integral = lower
 
-        self._derivative = -(self.Kd / self.unit) * d_input / dt
+        derivative = self._kd * d_input / dt
+        if self._tau_d is not None:
+            # Low-pass filter of the derivative term
+            derivative = self._derivative + (derivative - self._derivative) * dt / (self._tau_d + dt)
 
         # Compute final output
-        output = self._proportional + self._integral + self._derivative
-        output = _clamp(output, self.output_limits)
+        unsaturated = proportional + integral + derivative
+        output = unsaturated
+        if upper is not None and output > upper:
+            output = upper
+        elif lower is not None and output < lower:
+            output = lower
+
+        if self._tau_t is not None and output != unsaturated:
+            # Back-calculation: pull the integral back by the excess of the output
+            integral += (output - unsaturated) * min(dt / self._tau_t, 1)
 
         # Keep track of state
+        self._proportional, self._integral, self._derivative = proportional, integral, derivative
         self._last_output = output
         self._last_input = input_
         self._last_time = now
@@ -156,10 +220,13 @@ class PID(object):
         return (
             '{self.__class__.__name__}('
             'Kp={self.Kp!r}, Ki={self.Ki!r}, Kd={self.Kd!r}, '
-            'setpoint={self.setpoint!r}, sample_time={self.sample_time!r}, '
+            'setpoint={self.setpoint!r}, target={self.target!r}, sample_time={self.sample_time!r}, '
             'output_limits={self.output_limits!r}, auto_mode={self.auto_mode!r}, '
-            'proportional_on_measurement={self.proportional_on_measurement!r},'
-            'error_map={self.error_map!r}'
+            'proportional_on_measurement={self.proportional_on_measurement!r}, '
+            'error_map={self.error_map!r}, bumpless={self.bumpless!r}, '
+            'setpoint_ramp={self.setpoint_ramp!r}, gain_schedule={self.schedule!r}, '
+            'schedule_on={self.schedule_on!r}, derivative_tau={self.derivative_tau!r}, '
+            'tracking_time={self.tracking_time!r}'
             ')'
         ).format(self=self)
 
@@ -174,12 +241,170 @@ class PID(object):
     @property
     def tunings(self):
         """The tunings used by the controller as a tuple: (Kp, Ki, Kd)."""
-        return self.Kp, self.Ki, self.Kd
+        return self._Kp, self._Ki, self._Kd
 
     @tunings.setter
     def tunings(self, tunings):
         """Set the PID tunings."""
-        self.Kp, self.Ki, self.Kd = tunings
+        Kp = self._Kp
+        self._Kp, self._Ki, self._Kd = tunings
+        self._constants()
+        if self.bumpless and self._last_input is not None and not self.proportional_on_measurement:
+            # Keep the output unchanged: the new proportional term starts from the old one
+            self._shift_integral((Kp - self._Kp) * (self.setpoint - self._last_input))
+
+    @property
+    def Kp(self):
+        return self._Kp
+
+    @Kp.setter
+    def Kp(self, Kp):
+        self.tunings = Kp, self._Ki, self._Kd
+
+    @property
+    def Ki(self):
+        return self._Ki
+
+    @Ki.setter
+    def Ki(self, Ki):
+        self.tunings = self._Kp, Ki, self._Kd
+
+    @property
+    def Kd(self):
+        return self._Kd
+
+    @Kd.setter
+    def Kd(self, Kd):
+        self.tunings = self._Kp, self._Ki, Kd
+
+    def _constants(self):
+        """Precompute the gains used by __call__, each time the tunings change."""
+        self._kpu = self._Kp * self.unit
+        self._ki = self._Ki * self.unit
+        self._kd = -(self._Kd / self.unit)
+
+    @property
+    def derivative_tau(self):
+        """Time constant of the derivative filter in seconds, None if the derivative is not filtered."""
+        return self._derivative_tau
+
+    @derivative_tau.setter
+    def derivative_tau(self, tau):
+        self._derivative_tau = tau
+        self._tau_d = self._ticks(tau)
+
+    @property
+    def tracking_time(self):
+        """Time constant of the back-calculation anti-windup in seconds, None if not used."""
+        return self._tracking_time
+
+    @tracking_time.setter
+    def tracking_time(self, tau):
+        self._tracking_time = tau
+        self._tau_t = self._ticks(tau)
+
+    def _ticks(self, seconds):
+        """A duration in seconds in the time unit of the controller (the unit of dt)."""
+        return None if seconds is None else seconds / self.unit
+
+    def _max_step(self, dt):
+        """Largest setpoint change allowed by setpoint_ramp over *dt*."""
+        return self.setpoint_ramp * self.unit * dt
+
+    def _shift_integral(self, delta):
+        """Add *delta* to the integral term, within the output limits."""
+        self._integral = _clamp(self._integral + delta, self.output_limits)
+
+    @property
+    def target(self):
+        """The setpoint the controller is going to: the last one given to :meth:`set_setpoint`."""
+        return self.setpoint if self._target is None else self._target
+
+    def set_setpoint(self, setpoint):
+        """
+        Change the setpoint, keeping the state of the controller.
+
+        Unlike creating a new PID, the integral term and the last input are kept, so the
+        controller goes on from where it is instead of restarting cold. With a *setpoint_ramp*
+        the setpoint moves to the new value at that rate on the next calls, otherwise it is
+        applied at once.
+
+        :param setpoint: The new setpoint
+        """
+        self._target = setpoint
+        if self.setpoint_ramp is None or self._last_input is None:
+            # Not running yet: nothing to ramp from
+            self._ramp(None)
+
+    def _ramp(self, dt):
+        """Move the setpoint towards the target, by at most setpoint_ramp * dt (all the way if dt is None)."""
+        step = self._target - self.setpoint
+        if dt is not None and self.setpoint_ramp is not None:
+            max_step = self._max_step(dt)
+            step = _clamp(step, (-max_step, max_step))
+        if self.bumpless and self._last_input is not None and not self.proportional_on_measurement:
+            # Keep the output unchanged: the proportional kick goes into the integral term
+            self._shift_integral(-self._Kp * step)
+        if step == self._target - self.setpoint:
+            self.setpoint, self._target = self._target, None
+        else:
+            self.setpoint += step
+        if self._schedule is not None and self.schedule_on == 'setpoint':
+            self._apply_schedule(self.setpoint)
+
+    @property
+    def schedule(self):
+        """The gain schedule as a sorted list of (x, Kp, Ki, Kd), None if the tunings are fixed."""
+        return self._schedule
+
+    def set_schedule(self, table, on='setpoint'):
+        """
+        Set a gain schedule: the tunings are interpolated linearly between operating points.
+
+        The plant does not behave the same over the whole range (eg. a heater near ambient and at
+        the top of its range), so one set of gains can not be the best everywhere. With on='setpoint'
+        the tunings follow the setpoint given to :meth:`set_setpoint` (including its ramp), with
+        on='input' they follow the input at each update. Below the first and above the last point
+        the gains of the end point are used. With the *bumpless* option the changes of Kp leave the
+        output unchanged.
+
+        :param table: Iterable of (x, Kp, Ki, Kd), in any order. None to remove the schedule (the
+            last scheduled tunings stay).
+        :param on: 'setpoint' or 'input', what x is.
+        """
+        if table is None:
+            self._schedule = None
+            return
+        if on not in ('setpoint', 'input'):
+            raise ValueError('schedule_on must be \'setpoint\' or \'input\', not {!r}'.format(on))
+        table = sorted(tuple(row) for row in table)
+        if not table or any(len(row) != 4 for row in table):
+            raise ValueError('the gain schedule must be a non empty table of (x, Kp, Ki, Kd)')
+        self._schedule = table
+        self.schedule_on = on
+        x = self._last_input if (on == 'input' and self._last_input is not None) else self.setpoint
+        self._apply_schedule(x)
+
+    def _apply_schedule(self, x):
+        """Set the tunings interpolated at *x* from the gain schedule."""
+        table = self._schedule
+        if x <= table[0][0]:
+            gains = table[0][1:]
+        elif x >= table[-1][0]:
+            gains = table[-1][1:]
+        else:
+            i = 1
+            while table[i][0] < x:
+                i += 1
+            low, high = table[i - 1], table[i]
+            f = (x - low[0]) / (high[0] - low[0])
+            gains = (
+                low[1] + f * (high[1] - low[1]),
+                low[2] + f * (high[2] - low[2]),
+                low[3] + f * (high[3] - low[3]),
+            )
+        if gains != self.tunings:
+            self.tunings = gains
 
     @property
     def auto_mode(self):
@@ -257,3 +482,129 @@ class PID(object):
         self._last_time = self.time()
         self._last_output = None
         self._last_input = None
+
+
+class PIDFixed(PID):
+    """
+    A PID controller computed in integer arithmetic.
+
+    The input, the setpoint, the output limits and the output are integers, for example the
+    temperature in hundredths of a degree and the PWM duty. The gains are given for these units
+    (Kp=-50 per hundredth of a degree instead of -5000 per degree) and kept as fixed-point
+    integers. The fraction of the integral term below one output unit is carried over to the next
+    updates, so slow integration is not lost. A gain schedule is given in these units too: its x are
+    interpolated on the integer setpoint or input (hundredths of a degree) and its gains are per
+    input unit.
+
+    On the RP2040 (no FPU) small integers are neither allocated on the heap nor emulated in
+    software, unlike floats.
+    """
+
+    def __init__(self, *args, frac_bits=16, **kwargs):
+        """
+        Initialize a new fixed-point PID controller, see :meth:`PID.__init__`.
+
+        :param frac_bits: Number of fractional bits of the gains. Intermediate products beyond
+            30 bits stay exact but are allocated (long integers).
+        """
+        self.frac_bits = frac_bits
+        self._remainder = 0
+        super().__init__(*args, **kwargs)
+
+    @micropython.native
+    def __call__(self, input_, dt=None):
+        """Update the PID controller, see :meth:`PID.__call__`. *input_* and *dt* are integers."""
+        if not self._auto_mode:
+            return self._last_output
+
+        now = self.time()
+        if dt is None:
+            dt = utime.ticks_diff(now, self._last_time) or 1
+        elif dt <= 0:
+            raise ValueError('dt has negative value {}, must be positive'.format(dt))
+
+        if self.sample_time is not None and dt < self.sample_time and self._last_output is not None:
+            # Only update every sample_time
+            return self._last_output
+
+        # Move the setpoint towards the target of set_setpoint
+        if self._target is not None:
+            self._ramp(dt)
+
+        # Gains for the current operating point
+        if self._schedule is not None and self.schedule_on == 'input':
+            self._apply_schedule(input_)
+
+        # Compute error terms
+        error = self.setpoint - input_
+        last_input = self._last_input
+        d_input = input_ - last_input if (last_input is not None) else 0
+
+        # Check if must map the error
+        if self.error_map is not None:
+            error = self.error_map(error)
+
+        frac = self.frac_bits
+        if not self.proportional_on_measurement:
+            proportional = (self._kp * error) >> frac
+        else:
+            proportional = self._proportional - ((self._kpu * d_input) >> frac)
+
+        lower, upper = self._min_output, self._max_output
+
+        # Integral in whole output units, the fraction carried over in _remainder
+        integral = self._remainder + self._ki * error * dt
+        remainder = integral & ((1 << frac) - 1)
+        integral = self._integral + (integral >> frac)
+        if upper is not None and integral > upper:  # Avoid integral windup
+            integral, remainder = upper, 0
+        elif lower is not None and integral < lower:
+            integral, remainder = lower, 0
+
+        derivative = (self._kd * d_input // dt) >> frac
+        if self._tau_d is not None:
+            # Low-pass filter of the derivative term
+            derivative = self._derivative + (derivative - self._derivative) * dt // (self._tau_d + dt)
+
+        # Compute final output
+        unsaturated = proportional + integral + derivative
+        output = unsaturated
+        if upper is not None and output > upper:
+            output = upper
+        elif lower is not None and output < lower:
+            output = lower
+
+        if self._tau_t is not None and output != unsaturated:
+            # Back-calculation: pull the integral back by the excess of the output
+            integral += (output - unsaturated) * min(dt, self._tau_t) // self._tau_t
+
+        # Keep track of state
+        self._proportional, self._integral, self._derivative = proportional, integral, derivative
+        self._remainder = remainder
+        self._last_output = output
+        self._last_input = input_
+        self._last_time = now
+
+        return output
+
+    def _constants(self):
+        """Gains as integers with frac_bits fractional bits."""
+        one = 1 << self.frac_bits
+        self._kp = round(self._Kp * one)
+        self._kpu = round(self._Kp * self.unit * one)
+        self._ki = round(self._Ki * self.unit * one)
+        self._kd = round(-(self._Kd / self.unit) * one)
+
+    def _ticks(self, seconds):
+        return None if seconds is None else max(round(seconds / self.unit), 1)
+
+    def _max_step(self, dt):
+        # at least one input unit per update, or the setpoint would never move
+        return max(int(self.setpoint_ramp * self.unit * dt), 1)
+
+    def _shift_integral(self, delta):
+        super()._shift_integral(round(delta))
+
+    def reset(self):
+        super().reset()
+        self._remainder = 0
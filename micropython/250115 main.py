@@ -4,6 +4,9 @@ import time
 from time import sleep_ms, sleep
 from zacwire_TSic716 import ZACwire
 from PID import PID
+from telemetry import BinaryTelemetry
+from gccontrol import GCControl, stats_line
+from autotune import RelayAutotune, DEFAULT_RULE, PID_OPTIONS, load_gains, save_gains, load_schedule, schedule_command
 import re
 
 
@@ -25,6 +28,21 @@ zw = ZACwire(pin = 2, start = True,timeout=6)
 pwmPIN = pwm15
 pwmPIN.duty_u16(64_000)
 
+# Binary telemetry frames instead of text lines, toggled with "telemetry_bin" / "telemetry_text"
+telemetry = BinaryTelemetry()
+
+# Garbage collection once per control tick, at a fixed point; "stats" reports the decode and GC pauses
+gcc = GCControl()
+
+# One PID for the session: "setpoint_X" changes its setpoint in place (integral term kept, bumpless).
+# This alone settles no faster than a new PID per setpoint (see python/261018_bench_pid_setpoint.py).
+# "ramp_X" limits the rate of change of the setpoint to X °C/s (0: steps); off by default, it only
+# cuts the overshoot of small steps on a heater without dead time and slows the large ones down
+# Gains of the last "autotune_X" (pid_gains.json), the hand-tuned ones otherwise
+pid = PID(*load_gains(), setpoint=15, auto_mode=False, bumpless=True, **PID_OPTIONS)
+# "schedule_..." uploads a table of gains interpolated on the setpoint or the temperature, see autotune.schedule_command
+pid.set_schedule(*load_schedule())
+
 
 
 import sys,uselect
@@ -53,12 +71,45 @@ def myreadline():
         return None
 
 sys.stdout.write(f"PID ready\n")
+pending = None # command that ended the setpoint loop, handled here
 while True:
-    msg = myreadline()
+    msg = pending or myreadline()
+    pending = None
     if msg:
         if "hello" in msg:
             sys.stdout.write(f"PID ready\n")
 
+        elif "stats" in msg:
+            sys.stdout.write(stats_line(zw, gcc) + "\n")
+
+        elif "schedule_" in msg:
+            sys.stdout.write(schedule_command(pid, msg) + "\n")
+
+        elif "autotune_" in msg:
+            # relay experiment around the given temperature: "autotune_30" or "autotune_30_no_overshoot"
+            try:
+                found = re.search("autotune_([0-9.]+)_?([a-z_]*)",msg)
+                tuner = RelayAutotune(float(found.group(1)), found.group(2) or DEFAULT_RULE)
+            except Exception as e:
+                tuner = None
+                sys.stdout.write(f"/!\ UNPARSED Autotune: {e}\n")
+            while tuner is not None and not tuner.done:
+                T = zw.T()
+                control = tuner.step(T)
+                pwmPIN.duty_u16(control)
+                sys.stdout.write(f"autotune cycle: {tuner.cycle}, measured: {float(T)}, PWM: {control}\n")
+                msg = myreadline()
+                if msg and "stop" in msg:
+                    tuner.abort()
+                gcc.collect()
+                sleep_ms(500)
+            if tuner is not None:
+                pwmPIN.duty_u16(64_000)
+                if tuner.gains is not None:
+                    pid.tunings = tuner.gains # used from the next setpoint on, and after a restart
+                    save_gains(tuner.result)
+                sys.stdout.write(tuner.report() + "\n")
+
         elif "setpoint_" in msg:
             sys.stdout.write("RECEIVED Setpoint\n")
             sys.stdout.write(f"Message received: {msg}\n")
@@ -69,16 +120,35 @@ while True:
                 setpoint = 15
                 sys.stdout.write("/!\ UNPARSED Setpoint\n")
 
-            pid = PID(Kp=-5000, Ki=-4000, Kd=-4000, setpoint=setpoint, sample_time=500,output_limits=[4000, 64_000] , scale='ms')
+            pid.set_auto_mode(True, last_output=64_000) # starts from the heater off (same response as from full power)
+            pid.set_setpoint(setpoint)
             while True:
                 T = zw.T() 						# Get temperature
                 control = pid(T) 				# Input temperature in PID
                 pwmPIN.duty_u16(int(control)) 	# Get PID control
-                string = f"setpoint: {setpoint}, measured: {float(T)}, PWM: {float(control)}\n"
-                sys.stdout.write(string)
+                if telemetry.enabled:
+                    telemetry.send(time.ticks_ms(), setpoint, T, int(control))
+                else:
+                    string = f"setpoint: {setpoint}, measured: {float(T)}, PWM: {float(control)}\n"
+                    sys.stdout.write(string)
                 msg = myreadline()
                 if msg:
-                    if "setpoint_" in msg:
+                    if "telemetry_bin" in msg:
+                        telemetry.enabled = True
+                    elif "telemetry_text" in msg:
+                        telemetry.enabled = False
+                    elif "stats" in msg:
+                        sys.stdout.write(stats_line(zw, gcc) + "\n")
+                    elif "schedule_" in msg:
+                        sys.stdout.write(schedule_command(pid, msg) + "\n")
+                    elif "ramp_" in msg:
+                        try:
+                            ramp = float(re.search("ramp_([0-9]*.?[0-9]*)",msg).group(1))
+                            pid.setpoint_ramp = ramp if ramp > 0 else None
+                            sys.stdout.write(f"UPDATED Ramp: {ramp}\n")
+                        except:
+                            sys.stdout.write("/!\ UNPARSED Ramp\n")
+                    elif "setpoint_" in msg:
                         sys.stdout.write("RECEIVED Setpoint\n")
                         sys.stdout.write(f"Message received: {msg}\n")
                         try:
@@ -88,19 +158,28 @@ while True:
                             setpoint = 15
                             sys.stdout.write("/!\ UNPARSED Setpoint\n")
                         
-                        pid = PID(Kp=-5000, Ki=-4000, Kd=-4000, setpoint=setpoint, sample_time=500,output_limits=[4000, 64_000] , scale='ms')
+                        pid.set_setpoint(setpoint)
                         sys.stdout.write("UPDATED Setpoint\n")
                     elif "hello" in msg:
                         sys.stdout.write(f"PID ready\n")
+                        pid.auto_mode = False
+                        break
+
+                    elif "autotune_" in msg:
+                        # the relay drives the heater instead of the PID: leave the setpoint loop and run it above
+                        pid.auto_mode = False
+                        pending = msg
                         break
                         
                     elif "stop" in msg:
                         VALUE = 64_000
                         pwmPIN.duty_u16(VALUE)
                         sys.stdout.write(f"STOPING\n PWM set to: {VALUE}\n")
+                        pid.auto_mode = False
                         break
                 
                 else:
+                    gcc.collect() # the pause falls here, before the idle time
                     sleep_ms(500)     
     else:
         time.sleep(1)
@@ -1,7 +1,8 @@
 from array import array
 from machine import Pin
 from micropython import schedule
-import rp2, gc
+from time import ticks_ms, ticks_us, ticks_diff
+import rp2
 
 
 class ZACwireNotRunning(Exception):
@@ -11,6 +12,30 @@ class ZACwireWrongParity(Exception):
 	pass
 
 
+@micropython.viper
+def median_replace(srt: ptr32, n: int, old: int, new: int):
+	# srt: the n values of the window, sorted. Replace one `old` by `new`
+	# and keep it sorted, in place: O(log n) search, O(n) shifts, no allocation.
+	lo = 0
+	hi = n - 1
+	while lo < hi:
+		mid = (lo + hi) >> 1
+		if srt[mid] < old:
+			lo = mid + 1
+		else:
+			hi = mid
+	i = lo
+	if new > old:
+		while i < n - 1 and srt[i + 1] < new:
+			srt[i] = srt[i + 1]
+			i += 1
+	else:
+		while i > 0 and srt[i - 1] > new:
+			srt[i] = srt[i - 1]
+			i -= 1
+	srt[i] = new
+
+
 @rp2.asm_pio(autopush = True, push_thresh = 32)
 def count_pulse_len():
     set(x, 0)             #    x = 0
@@ -39,6 +64,45 @@ def detect_long_pulse():
     wait(0, pin, 0)                     #    wait for pin to go low
 
 
+# One packed frame per reading. The start bit of a packet is low half of the
+# bit period (Tstrobe); a 1 is low a quarter, a 0 three quarters. Each bit is
+# sampled Tstrobe after its falling edge, Tstrobe being measured on the first
+# start bit of the frame, and the 20 pulses of the frame (2 packets of start
+# bit, 8 bits and parity) are pushed as one 20-bit word, first pulse in bit 19.
+# The first start bit is pushed as 0, the second one is sampled but meaningless.
+@rp2.asm_pio(in_shiftdir = rp2.PIO.SHIFT_LEFT, autopush = True, push_thresh = 20, pull_thresh = 19,
+             fifo_join = rp2.PIO.JOIN_RX)
+def read_frame():
+    label('sync')                       # <── wait for a gap between frames ──────┐
+    set(x, 31)                          #    ~1 ms high at 1 MHz (33 cycles x 32) │
+    wait(1, pin, 0)                     #                                         │
+    label('high')                       # <───────────────────────────┐           │
+    jmp(pin, 'still_high')              # ── if pin high ──┐          │           │
+    jmp('sync')                         # ── else: not a gap ─────────┼───────────┘
+    label('still_high')                 # <──────────────────┘        │
+    jmp(x_dec, 'high') [31]             # ── if x>0: x -= 1 ──────────┘
+    wait(0, pin, 0)                     #    falling edge of the start bit
+    mov(x, invert(null))                #    x = 0xFFFFFFFF
+    label('start_low')                  # <── time the start bit, 3 cycles per count ┐
+    jmp(x_dec, 'start_next')            #    x -= 1                                  │
+    label('start_next')                 #                                            │
+    jmp(pin, 'start_done')              # ── if pin high: done ──┐                   │
+    jmp('start_low')                    # ────────────────────────┼───────────────────┘
+    label('start_done')                 # <───────────────────────┘
+    mov(y, invert(x))                   #    y = Tstrobe in counts
+    in_(null, 1)                        #    first start bit
+    mov(osr, null)                      #    OSR used as a counter of the 19 bits left
+    label('bit')                        # <── each pulse ──────────────────────────┐
+    wait(1, pin, 0)                     #                                          │
+    wait(0, pin, 0)                     #    falling edge                          │
+    mov(x, y)                           #                                          │
+    label('delay')                      # <───────────────┐                        │
+    jmp(x_dec, 'delay') [2]             # ── Tstrobe ─────┘                        │
+    in_(pins, 1)                        #    high: 1, still low: 0 (autopush at 20)│
+    out(null, 1)                        #                                          │
+    jmp(not_osre, 'bit')                # ── 19 bits ────────────────────────────┘
+
+
 class ZACwire():
 
 	def __init__(self, pin, sm = (0,1), start = False, filter = 1, timeout = 4):
@@ -49,6 +113,7 @@ class ZACwire():
 		          - sm[1] is used for initiating DMA transfers.
 		start   : whether to start the state machines right away
 		filter  : width of the window over which a median filter is applied
+		          (odd; the median is updated in place per reading, so 15-31 is cheap)
 		timeout : max number of error readings before raising an exception
 		"""
 		
@@ -58,18 +123,23 @@ class ZACwire():
 		self.bitlen = 20
 		self.timeout_counter = 0
 		self.timeout_limit = timeout
+		self.decode_us = 0      # duration of the last decode, us
+		self.decode_max_us = 0  # longest decode since start / reset_stats(), us
+		self.decodes = 0
+		self.last_frame = ticks_ms() # last good frame, or start
 		self.filter = filter
 		self.pin = Pin(pin, Pin.IN)	
 
 		self.buf = array('l', [0]*self.buflen)
 		self.savedbuf = array('l', [0]*self.buflen)
 		self.bits = array('i', [0]*self.bitlen)
-		self.rawT = array('f', [0] * filter)
+		self.rawT = array('i', [0] * filter)    # ring buffer of the last readings, next write at rawpos
+		self.sortedT = array('i', [0] * filter) # same readings kept sorted: the median is sortedT[filter // 2]
+		self.rawpos = 0
 
 		self._buf = memoryview(self.buf)
 		self._savedbuf = memoryview(self.savedbuf)
 		self._bits = memoryview(self.bits)
-		self._rawT = memoryview(self.rawT)
 
 		self.sm0 = rp2.StateMachine(sm[0], count_pulse_len,   in_base = self.pin, jmp_pin = self.pin, freq = 3_000_000)
 		self.sm1 = rp2.StateMachine(sm[1], detect_long_pulse, in_base = self.pin, jmp_pin = self.pin, freq = 100_000)
@@ -94,12 +164,24 @@ class ZACwire():
 	@micropython.native
 	def T(self):
 		if self.sm0.active():
-			return sorted(self.rawT)[self.filter // 2] / 16383 * (60 + 10) - 10
+			return self.sortedT[self.filter // 2] / 16383 * (60 + 10) - 10
 		raise ZACwireNotRunning
 		
 	@micropython.viper
 	def decode(self, _: int) -> int:
-		gc.collect()
+		# Scheduled from cb_irq1 for every frame: nothing is allocated here, the
+		# garbage collection is done at a controlled point of the main loop.
+		t0 = int(ticks_us())
+		self.decode_frame()
+		dt = int(ticks_diff(ticks_us(), t0))
+		self.decode_us = dt
+		if dt > int(self.decode_max_us):
+			self.decode_max_us = dt
+		self.decodes = int(self.decodes) + 1
+		return 0
+
+	@micropython.viper
+	def decode_frame(self) -> int:
 		bits = self._bits
 		buf2 = self._savedbuf
 		threshold = int(buf2[0])
@@ -172,19 +254,132 @@ class ZACwire():
 			)
 				
 		self.timeout_counter = 0
-		rawT = self._rawT
-		n = int(len(self._rawT)) - 1
-		_ = int(0)
-		while _ < n:
-			rawT[_] = rawT[_+1]
-			_ = _ + 1
+		self.last_frame = ticks_ms()
+		rawT = ptr32(self.rawT)
+		n = int(self.filter)
+		pos = int(self.rawpos)
+		old = rawT[pos]
+		rawT[pos] = t
+		pos += 1
+		self.rawpos = pos if pos < n else 0
+		median_replace(self.sortedT, n, old, t)
+
+	def age(self):
+		# ms since the last good frame (or the start): a probe unplugged sends no frame at all
+		return ticks_diff(ticks_ms(), self.last_frame)
 
-		rawT[-1] = int(t)
+	def reset_stats(self):
+		self.decode_max_us = 0
+		self.decodes = 0
 
 	def start(self):
+		self.last_frame = ticks_ms()
 		self.sm0.active(1)
 		self.sm1.active(1)
 
 	def stop(self):
 		self.sm0.active(0)
 		self.sm1.active(0)
+
+
+class ZACwireFrame():
+	"""
+	TSic reader with the read_frame PIO program: one state machine, no IRQ,
+	the CPU handles one FIFO word per reading (the joined RX FIFO buffers 8
+	readings, ~0.8 s), decoded when the temperature is read. Same interface
+	as ZACwire.
+	"""
+
+	def __init__(self, pin, sm = 0, start = False, filter = 1, timeout = 4):
+		"""
+		pin     : which pin to read
+		sm      : which state machine to use
+		start   : whether to start the state machine right away
+		filter  : width of the window over which a median filter is applied
+		          (odd; the median is updated in place per reading, so 15-31 is cheap)
+		timeout : max number of consecutive error readings before raising an exception
+		"""
+		self.errorcount = 0
+		self.timeout_counter = 0
+		self.timeout_limit = timeout
+		self.decode_us = 0
+		self.decode_max_us = 0
+		self.decodes = 0
+		self.last_frame = ticks_ms() # last good frame, or start
+		self.filter = filter
+		self.pin = Pin(pin, Pin.IN)
+		self.rawT = array('i', [0] * filter)
+		self.sortedT = array('i', [0] * filter)
+		self.rawpos = 0
+
+		self.sm = rp2.StateMachine(sm, read_frame, in_base = self.pin, jmp_pin = self.pin, freq = 1_000_000)
+		if start:
+			self.sm.active(1)
+
+	@micropython.native
+	def update(self):
+		# decode the frames received since the last call
+		sm = self.sm
+		while sm.rx_fifo():
+			self.decode(sm.get())
+
+	@micropython.native
+	def T(self):
+		if self.sm.active():
+			self.update()
+			return self.sortedT[self.filter // 2] / 16383 * (60 + 10) - 10
+		raise ZACwireNotRunning
+
+	@micropython.viper
+	def decode(self, word: int) -> int:
+		t0 = int(ticks_us())
+		# pulse k of the frame is bit 19 - k: high packet in pulses 3-9, low packet in 11-19
+		hi = (word >> 10) & 0x7F
+		lo = word & 0x1FF
+		ones_hi = 0
+		ones_lo = 0
+		i = 0
+		while i < 9:
+			ones_hi += (hi >> i) & 1
+			ones_lo += (lo >> i) & 1
+			i += 1
+		if (ones_hi & 1) or (ones_lo & 1): # even parity, parity bits included
+			self.errorcount = int(self.errorcount) + 1
+			self.timeout_counter = int(self.timeout_counter) + 1
+			if int(self.timeout_counter) >= int(self.timeout_limit):
+				raise ZACwireWrongParity
+			return 0
+		t = ((hi >> 1) << 8) | (lo >> 1)
+
+		self.timeout_counter = 0
+		self.last_frame = ticks_ms()
+		rawT = ptr32(self.rawT)
+		n = int(self.filter)
+		pos = int(self.rawpos)
+		old = rawT[pos]
+		rawT[pos] = t
+		pos += 1
+		self.rawpos = pos if pos < n else 0
+		median_replace(self.sortedT, n, old, t)
+
+		dt = int(ticks_diff(ticks_us(), t0))
+		self.decode_us = dt
+		if dt > int(self.decode_max_us):
+			self.decode_max_us = dt
+		self.decodes = int(self.decodes) + 1
+		return 0
+
+	def age(self):
+		# ms since the last good frame (or the start), frames are decoded by T()
+		return ticks_diff(ticks_ms(), self.last_frame)
+
+	def reset_stats(self):
+		self.decode_max_us = 0
+		self.decodes = 0
+
+	def start(self):
+		self.last_frame = ticks_ms()
+		self.sm.active(1)
+
+	def stop(self):
+		self.sm.active(0)
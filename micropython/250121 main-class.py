@@ -12,6 +12,9 @@ import micropython
 import sys
 from zacwire_TSic716 import ZACwire
 from PID import PID
+from telemetry import BinaryTelemetry
+from gccontrol import GCControl, stats_line
+from autotune import RelayAutotune, DEFAULT_RULE, PID_OPTIONS, load_gains, save_gains, load_schedule, schedule_command
 import re
 
 
@@ -47,11 +50,20 @@ class Pico:
         self.pinPWM.duty_u16(64_000) # set duty cycle (higher fully dimmed)
         
         self.setpoint = 20 # set initial setpoint for PID, degrees
-        self.pid = PID(Kp=-5000, Ki=-4000, Kd=-4000, setpoint=self.setpoint, sample_time=500,output_limits=[4000, 64_000] , scale='ms')
+        # one PID for the session, "setpoint_X" changes its setpoint in place (bumpless)
+        # gains of the last "autotune_X" (pid_gains.json), the hand-tuned ones otherwise
+        self.pid = PID(*load_gains(), setpoint=self.setpoint, bumpless=True, **PID_OPTIONS)
+        # gain schedule uploaded with "schedule_...", see autotune.schedule_command
+        self.pid.set_schedule(*load_schedule())
+        self.autotune = None # RelayAutotune driving the heater instead of the PID while running
 
         
         self.zw = ZACwire(pin = 2, start = True,timeout=6) # initialize TSic16 on pin
         
+        self.telemetry = BinaryTelemetry() # binary frames each control tick, off until "telemetry_bin"
+        
+        self.gcc = GCControl() # garbage collection once per loop, at a fixed point
+        
 
         
         
@@ -74,17 +86,47 @@ class Pico:
                 latest_input_line = self.input_line_this_tick
                 if "hello" == latest_input_line:
                     print("Hello PID here")
+                elif "schedule_" in latest_input_line:
+                    print(schedule_command(self.pid, latest_input_line))
+                elif "autotune_" in latest_input_line:
+                    # relay experiment around the given temperature: "autotune_30" or "autotune_30_no_overshoot"
+                    try:
+                        found = re.search("autotune_([0-9.]+)_?([a-z_]*)",latest_input_line)
+                        self.autotune = RelayAutotune(float(found.group(1)), found.group(2) or DEFAULT_RULE)
+                        print(f"Autotune started around {found.group(1)}")
+                    except Exception as e:
+                        print(f"Can not parse autotune ({e}), message was: {latest_input_line}")
                 elif "setpoint_" in latest_input_line:
                     print("Received setpoint")
+                    if self.autotune is not None:
+                        self.autotune.abort()
                     try:
                         value = re.search("setpoint_([0-9]*.[0-9]*)",latest_input_line).group(1)
                         self.setpoint = float(value)
-                        self.pid = PID(Kp=-5000, Ki=-4000, Kd=-4000, setpoint=self.setpoint, sample_time=500,output_limits=[4000, 64_000] , scale='ms')
+                        self.pid.set_setpoint(self.setpoint)
                         print(f"Setpoint updated to: {value}")
                     except:
                         print(f"Can not parse setpoint, message was: {latest_input_line}")
+                elif "ramp_" in latest_input_line:
+                    # rate of change of the setpoint, degrees per second, 0 for steps
+                    try:
+                        value = float(re.search("ramp_([0-9]*.?[0-9]*)",latest_input_line).group(1))
+                        self.pid.setpoint_ramp = value if value > 0 else None
+                        print(f"Ramp updated to: {value}")
+                    except:
+                        print(f"Can not parse ramp, message was: {latest_input_line}")
                 elif "query" == latest_input_line:
                      print(f"Setpoint: {self.setpoint}, Measured temp: {T}, PID feedback: {control}")
+                elif "telemetry_bin" == latest_input_line:
+                    self.telemetry.enabled = True
+                elif "telemetry_text" == latest_input_line:
+                    self.telemetry.enabled = False
+                elif "stats" == latest_input_line:
+                    print(stats_line(self.zw, self.gcc))
+                elif "stats_reset" == latest_input_line:
+                    self.zw.reset_stats()
+                    self.gcc.reset_stats()
+                    print("Stats reset")
 
             # quit program to avoid locking serial up if specified
             if "stop" in latest_input_line:
@@ -94,12 +136,34 @@ class Pico:
 
             # simple loop speed control
             T = self.zw.T() # read temperature
-            control = int(self.pid(T)) # get PID feedback control
+            if self.autotune is None:
+                control = int(self.pid(T)) # get PID feedback control
+            else:
+                control = self.autotune.step(T) # relay output
+                if self.autotune.done:
+                    self.end_autotune(control)
             self.pinPWM.duty_u16(control) # update PWM pin
+            if self.telemetry.enabled:
+                self.telemetry.send(time.ticks_ms(), self.setpoint, T, control)
             
+            self.gcc.collect() # the pause falls here, before the idle time
             time.sleep_ms(100)
 
 
+    def end_autotune(self, control):
+        """
+        Store the gains of a finished autotune, report it and give the heater back to the PID.
+        """
+        if self.autotune.gains is not None:
+            self.pid.tunings = self.autotune.gains
+            save_gains(self.autotune.result)
+        print(self.autotune.report())
+        self.autotune = None
+        # manual -> auto: the PID starts from the last relay output
+        self.pid.auto_mode = False
+        self.pid.set_auto_mode(True, last_output=control)
+
+
     def read_serial_input(self):
         """
         Buffers serial input.
@@ -0,0 +1,200 @@
+import json
+import math
+from time import ticks_ms, ticks_diff
+
+# Gains of the PID: the hand-tuned ones until an autotune has stored its own in GAINS_FILE,
+# with the gain schedule uploaded over serial if any
+GAINS_FILE = "pid_gains.json"
+DEFAULT_GAINS = (-5000, -4000, -4000)  # Kp, Ki, Kd; negative: a lower PWM duty heats more
+PID_OPTIONS = dict(sample_time=500, output_limits=[4000, 64_000], scale='ms')
+
+PWM_OFF, PWM_FULL = 64_000, 4_000
+
+# Tuning rules from the ultimate gain Ku and period Pu: (Kp / Ku, Ti / Pu, Td / Pu),
+# from the fastest settling with overshoot to the slowest without
+RULES = {
+    "ziegler_nichols": (0.6, 0.5, 0.125),
+    "some_overshoot": (0.33, 0.5, 0.33),
+    "no_overshoot": (0.2, 0.5, 0.33),
+}
+DEFAULT_RULE = "some_overshoot"
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_gains(path = GAINS_FILE):
+    """(Kp, Ki, Kd) stored by the last autotune, DEFAULT_GAINS if there is none."""
+    stored = _load(path)
+    try:
+        return stored["Kp"], stored["Ki"], stored["Kd"]
+    except KeyError:
+        return DEFAULT_GAINS
+
+
+def save_gains(result, path = GAINS_FILE):
+    """Update the stored entries: result of an autotune (Kp, Ki, Kd used from the next start on), schedule."""
+    stored = _load(path)
+    stored.update(result)
+    with open(path, "w") as f:
+        json.dump(stored, f)
+
+
+def load_schedule(path = GAINS_FILE):
+    """(table, on) of the stored gain schedule, arguments of PID.set_schedule; table None if there is none."""
+    stored = _load(path)
+    return stored.get("schedule"), stored.get("schedule_on", "setpoint")
+
+
+def parse_schedule(text):
+    """Gain schedule table from "x:Kp:Ki:Kd,x:Kp:Ki:Kd,...", as a list of (x, Kp, Ki, Kd)."""
+    return [tuple(float(value) for value in point.split(":")) for point in text.split(",") if point]
+
+
+def schedule_command(pid, msg):
+    """
+    Apply a gain schedule command to the PID, store it and return the answer line.
+
+        schedule_setpoint_15:-6000:-5000:-3000,35:-4000:-3000:-5000   gains interpolated on the setpoint
+        schedule_input_15:-6000:-5000:-3000,35:-4000:-3000:-5000      on the measured temperature
+        schedule_off                                                  fixed gains again
+    """
+    try:
+        body = msg[msg.index("schedule_") + len("schedule_"):].strip()
+        if body.startswith("off"):
+            pid.set_schedule(None)
+            save_gains({"schedule": None})
+            return "Schedule cleared"
+        on, table = body.split("_", 1)
+        pid.set_schedule(parse_schedule(table), on)
+        save_gains({"schedule": pid.schedule, "schedule_on": on})
+        return f"Schedule updated: {len(pid.schedule)} points on {on}"
+    except Exception as e:
+        return f"Can not parse schedule ({e}), message was: {msg}"
+
+
+class RelayAutotune:
+    """
+    Relay (Astrom-Hagglund) experiment on the heater.
+
+    The heater is switched between bias - amplitude and bias + amplitude (PWM duty) each time the
+    temperature crosses the setpoint +/- hysteresis, which makes the temperature oscillate at the
+    ultimate period Pu of the loop. From the oscillation amplitude a and the relay amplitude d (half
+    the duty swing actually applied, once clamped to the PWM range) the ultimate gain is
+    Ku = 4 d / (pi sqrt(a^2 - hysteresis^2)), and the gains follow from one of RULES.
+
+    Called once per loop iteration instead of the PID, step() returns the duty to apply:
+
+        tuner = RelayAutotune(30)
+        while not tuner.done:
+            pwm.duty_u16(tuner.step(zw.T()))
+            sleep_ms(500)
+        print(tuner.report())
+    """
+
+    def __init__(self, setpoint, rule = DEFAULT_RULE, hysteresis = 0.1, bias = 34_000, amplitude = 30_000,
+                 cycles = 4, timeout_s = 3600):
+        """
+        setpoint   : temperature the oscillation is centred on
+        rule       : key of RULES, the settling target of the gains
+        hysteresis : relay hysteresis, degrees (above the sensor noise)
+        bias       : PWM duty at the centre of the relay
+        amplitude  : relay amplitude d, PWM duty
+        cycles     : oscillation periods measured, after a first one left out (transient)
+        timeout_s  : the experiment fails if not finished after this time
+        """
+        if rule not in RULES:
+            raise ValueError(f"unknown rule {rule}, one of {', '.join(RULES)}")
+        self.setpoint = setpoint
+        self.rule = rule
+        self.hysteresis = hysteresis
+        self.amplitude = amplitude
+        self.pwm_heat = max(bias - amplitude, PWM_FULL)
+        self.pwm_cool = min(bias + amplitude, PWM_OFF)
+        self.cycles = cycles
+        self.timeout_ms = timeout_s * 1000
+        self.start = ticks_ms()
+        self.heating = True
+        self.switches = []  # ticks_ms of the switches to heating
+        self.high, self.low = -1000.0, 1000.0  # extremes of the current half periods
+        self.periods, self.amplitudes = [], []
+        self.done = False
+        self.error = None
+        self.result = None
+
+    @property
+    def cycle(self):
+        """Number of complete oscillation periods so far."""
+        return max(len(self.switches) - 1, 0)
+
+    def step(self, T, now = None):
+        """Relay output (PWM duty) for the temperature T."""
+        if self.done:
+            return PWM_OFF
+        now = ticks_ms() if now is None else now
+        if ticks_diff(now, self.start) > self.timeout_ms:
+            self.abort(f"no oscillation after {self.timeout_ms // 1000} s")
+            return PWM_OFF
+
+        if self.heating:
+            self.low = min(self.low, T)
+            if T > self.setpoint + self.hysteresis:
+                self.heating = False
+                self.high = T
+        else:
+            self.high = max(self.high, T)
+            if T < self.setpoint - self.hysteresis:
+                self.heating = True
+                self._period(now)
+                self.low = T
+        return self.pwm_heat if self.heating else self.pwm_cool
+
+    def _period(self, now):
+        # a period ends at each switch to heating: the extremes of its two half periods are known
+        if self.switches:
+            self.periods.append(ticks_diff(now, self.switches[-1]) / 1000)
+            self.amplitudes.append((self.high - self.low) / 2)
+        self.switches.append(now)
+        if len(self.periods) > self.cycles:
+            self._finish()
+
+    def _finish(self):
+        periods, amplitudes = self.periods[1:], self.amplitudes[1:]  # the first period is a transient
+        Pu = sum(periods) / len(periods)
+        a = sum(amplitudes) / len(amplitudes)
+        if a <= self.hysteresis:
+            self.abort("oscillation within the hysteresis, increase the amplitude")
+            return
+        d = (self.pwm_cool - self.pwm_heat) / 2  # the relay amplitude applied, bias +/- amplitude clamped
+        Ku = 4 * d / (math.pi * math.sqrt(a * a - self.hysteresis * self.hysteresis))
+        kp, ti, td = RULES[self.rule]
+        Kp = -kp * Ku  # negative: the heater power increases when the PWM duty decreases
+        self.result = {
+            "Ku": Ku, "Pu": Pu, "a": a, "rule": self.rule,
+            "Kp": Kp, "Ki": Kp / (ti * Pu), "Kd": Kp * td * Pu,  # Ki per second, Kd in seconds (PID scale)
+        }
+        self.done = True
+
+    def abort(self, error = "aborted"):
+        self.error = error
+        self.done = True
+
+    @property
+    def gains(self):
+        """(Kp, Ki, Kd) identified, None if the experiment failed or is not finished."""
+        if self.result is None:
+            return None
+        return self.result["Kp"], self.result["Ki"], self.result["Kd"]
+
+    def report(self):
+        """One line with the identified ultimate gain and period and the gains, or the error."""
+        if self.result is None:
+            return f"Autotune failed: {self.error}"
+        r = self.result
+        return (f"Autotune: Ku: {r['Ku']:.1f}, Pu: {r['Pu']:.1f}, a: {r['a']:.3f}, "
+                f"Kp: {r['Kp']:.1f}, Ki: {r['Ki']:.1f}, Kd: {r['Kd']:.1f}, rule: {r['rule']}")
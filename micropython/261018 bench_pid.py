@@ -0,0 +1,102 @@
+import gc
+import utime
+from PID import PID, PIDFixed, _clamp
+
+# Update rate of the PID on the device: mpremote run "261018 bench_pid.py" (PID.py on the board)
+#
+# The controllers are called with a fixed dt so that every call computes a new output. The float
+# PID must give exactly the outputs of the former implementation (reference_call), PIDFixed the
+# same outputs within a few PWM units.
+
+GAINS = dict(Kp=-5000, Ki=-4000, Kd=-4000, sample_time=500, output_limits=[4000, 64_000], scale='ms')
+FIXED_GAINS = dict(Kp=-50, Ki=-40, Kd=-40, sample_time=500, output_limits=[4000, 64_000], scale='ms')  # per 0.01 °C
+SETPOINT = 30
+N = 2000
+DT = 500
+
+
+def reference_call(self, input_, dt=None):
+    """PID.__call__ before the precomputed gains and the inline clamps."""
+    if not self.auto_mode:
+        return self._last_output
+
+    now = self.time()
+    if dt is None:
+        dt = utime.ticks_diff(now,self._last_time) if (utime.ticks_diff(now,self._last_time)) else 1e-16
+    elif dt <= 0:
+        raise ValueError('dt has negative value {}, must be positive'.format(dt))
+
+    if self.sample_time is not None and dt < self.sample_time and self._last_output is not None:
+        return self._last_output
+
+    if self._target is not None:
+        self._ramp(dt)
+
+    error = self.setpoint - input_
+    d_input = input_ - (self._last_input if (self._last_input is not None) else input_)
+
+    if self.error_map is not None:
+        error = self.error_map(error)
+
+    if not self.proportional_on_measurement:
+        self._proportional = self.Kp * error
+    else:
+        self._proportional -= self.Kp * self.unit * d_input
+
+    self._integral += (self.Ki * self.unit) * error * dt
+    self._integral = _clamp(self._integral, self.output_limits)
+
+    self._derivative = -(self.Kd / self.unit) * d_input / dt
+
+    output = self._proportional + self._integral + self._derivative
+    output = _clamp(output, self.output_limits)
+
+    self._last_output = output
+    self._last_input = input_
+    self._last_time = now
+
+    return output
+
+
+class ReferencePID(PID):
+    __call__ = reference_call
+
+
+def readings(n = N):
+    """Temperatures around the setpoint as the TSic716 gives them (0.01 °C steps), in °C."""
+    return [SETPOINT - 2 + ((i * 37) % 400) / 100 for i in range(n)]
+
+
+def outputs(pid, inputs, dt = DT):
+    return [pid(x, dt) for x in inputs]
+
+
+def calls_per_s(pid, inputs, dt = DT, ticks_us = utime.ticks_us):
+    gc.collect()
+    t0 = ticks_us()
+    for x in inputs:
+        pid(x, dt)
+    return len(inputs) * 1e6 / max(utime.ticks_diff(ticks_us(), t0), 1)
+
+
+def run(ticks_us = utime.ticks_us):
+    temperatures = readings()
+    centidegrees = [round(T * 100) for T in temperatures]
+
+    reference = outputs(ReferencePID(setpoint = SETPOINT, **GAINS), temperatures)
+    same = outputs(PID(setpoint = SETPOINT, **GAINS), temperatures) == reference
+    fixed = outputs(PIDFixed(setpoint = SETPOINT * 100, **FIXED_GAINS), centidegrees)
+    deviation = max(abs(a - b) for a, b in zip(fixed, reference))
+    print(f"PID outputs identical to the reference: {same}, PIDFixed max deviation: {deviation:.1f} PWM")
+
+    for name, pid, inputs in (
+        ("reference", ReferencePID(setpoint = SETPOINT, **GAINS), temperatures),
+        ("PID", PID(setpoint = SETPOINT, **GAINS), temperatures),
+        ("PIDFixed", PIDFixed(setpoint = SETPOINT * 100, **FIXED_GAINS), centidegrees),
+    ):
+        print(f"{name}: {calls_per_s(pid, inputs, ticks_us = ticks_us):.0f} calls/s")
+    return same, deviation
+
+
+if __name__ == "__main__":
+    run()
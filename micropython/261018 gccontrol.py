@@ -0,0 +1,40 @@
+import gc
+from time import ticks_us, ticks_diff
+
+
+class GCControl:
+    """
+    Garbage collection at a controlled point of the main loop, with its pause measured.
+
+    Call collect() once per loop iteration where a pause does not matter (after
+    the PWM update, before sleeping). The gc.threshold() is only a backstop: an
+    automatic collection happens if an iteration allocates more than a fraction
+    of the free heap.
+    """
+
+    def __init__(self, threshold_fraction=4):
+        gc.collect()
+        gc.threshold(gc.mem_free() // threshold_fraction)
+        self.last_us = 0
+        self.max_us = 0
+        self.count = 0
+
+    def collect(self):
+        t0 = ticks_us()
+        gc.collect()
+        dt = ticks_diff(ticks_us(), t0)
+        self.last_us = dt
+        if dt > self.max_us:
+            self.max_us = dt
+        self.count += 1
+
+    def reset_stats(self):
+        self.max_us = 0
+        self.count = 0
+
+
+def stats_line(zw, gcc):
+    """One line with the decode and GC timings, answer of the "stats" command."""
+    return (f"Stats: decode_us: {zw.decode_us}, decode_max_us: {zw.decode_max_us}, decodes: {zw.decodes}, "
+            f"gc_us: {gcc.last_us}, gc_max_us: {gcc.max_us}, gcs: {gcc.count}, "
+            f"errors: {zw.errorcount}, mem_free: {gc.mem_free()}")
@@ -0,0 +1,49 @@
+import struct
+import sys
+import micropython
+
+# Binary telemetry frame, little endian, 14 bytes:
+#   sync      u8   0xA5
+#   seq       u8   frame counter, wraps at 256
+#   ticks     u32  time.ticks_ms() of the control tick
+#   setpoint  i16  setpoint, 0.01 degrees
+#   measured  i16  measured temperature, 0.01 degrees
+#   pwm       u16  PWM duty sent to the heater
+#   crc       u16  CRC-16/CCITT-FALSE of the 12 bytes before
+SYNC = 0xA5
+FRAME = "<BBIhhH"
+FRAME_SIZE = 14
+
+
+@micropython.viper
+def crc16(buf: ptr8, n: int) -> int:
+    crc = 0xFFFF
+    for i in range(n):
+        crc ^= buf[i] << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+
+class BinaryTelemetry:
+    """
+    Writes one fixed size frame per control tick instead of a formatted line.
+    The frame buffer is allocated once, nothing is allocated per frame apart
+    from the float to int conversions.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.buf = bytearray(FRAME_SIZE)
+        self.seq = 0
+        self.enabled = False
+
+    def send(self, ticks, setpoint, measured, pwm):
+        buf = self.buf
+        struct.pack_into(FRAME, buf, 0, SYNC, self.seq, ticks, round(setpoint * 100), round(measured * 100), pwm)
+        struct.pack_into("<H", buf, FRAME_SIZE - 2, crc16(buf, FRAME_SIZE - 2))
+        self.stream.write(buf)
+        self.seq = (self.seq + 1) & 0xFF
@@ -0,0 +1,109 @@
+import rp2
+from zacwire_TSic716 import ZACwire, ZACwireFrame, count_pulse_len, detect_long_pulse, read_frame
+
+# RP2040: 2 PIO blocks of 4 state machines and 32 instruction words each
+PIO_BLOCKS = 2
+SM_PER_BLOCK = 4
+PIO_MEMORY = 32
+
+# per reader type: programs loaded in each PIO block used, state machines per sensor
+MODES = {
+    "frame": ((read_frame,), 1),                           # ZACwireFrame, up to 8 sensors
+    "pair": ((count_pulse_len, detect_long_pulse), 2),     # ZACwire, up to 4 sensors
+}
+
+NEVER = (1 << 29) - 1  # timeout given to the readers, a small int: a failing probe is reported, not raised
+
+
+class ZACwireManager:
+    """
+    Several TSic716 probes read at full rate on one board.
+
+    State machines are allocated in order (PIO0 then PIO1), and the programs are
+    loaded once per PIO block used and shared by all the sensors of that block.
+
+    Usage:
+        sensors = ZACwireManager({"sample": 2, "block": 3, "ambient": 4}, filter=15)
+        T_sample, T_block, T_ambient = sensors.temperatures()
+    """
+
+    def __init__(self, pins, mode = "frame", start = True, filter = 1, timeout = 6, max_age = 2000, blocks = (0, 1)):
+        """
+        pins    : dict name -> pin, or list of pins (named by their pin number)
+        mode    : "frame" (one state machine per sensor, see read_frame) or
+                  "pair" (two state machines per sensor, the IRQ based ZACwire)
+        start   : whether to start the state machines right away
+        filter  : width of the median filter of each sensor
+        timeout : consecutive error readings after which a sensor reads None
+        max_age : ms without a good frame after which a sensor reads None (a frame every ~100 ms;
+                  an unplugged probe sends none, its error count does not grow)
+        blocks  : PIO blocks the manager may use
+        """
+        if not isinstance(pins, dict):
+            pins = {str(pin): pin for pin in pins}
+        self.names = list(pins)
+        self.mode = mode
+        self.timeout = timeout
+        self.max_age = max_age
+        programs, sm_per_sensor = MODES[mode]
+
+        per_block = SM_PER_BLOCK // sm_per_sensor
+        if len(pins) > per_block * len(blocks):
+            raise ValueError(f"{len(pins)} sensors, at most {per_block * len(blocks)} in {mode} mode on PIO {blocks}")
+        size = sum(len(program[0]) for program in programs)
+        if size > PIO_MEMORY:
+            raise ValueError(f"{mode} programs need {size} instruction words, a PIO has {PIO_MEMORY}")
+
+        self.blocks = blocks[:(len(pins) + per_block - 1) // per_block]
+        for block in self.blocks:
+            for program in programs:
+                rp2.PIO(block).add_program(program)  # once per block, shared by its state machines
+        self.programs = programs
+
+        self.sensors = []
+        for i, name in enumerate(self.names):
+            block = self.blocks[i // per_block]
+            sm = block * SM_PER_BLOCK + (i % per_block) * sm_per_sensor
+            if mode == "frame":
+                sensor = ZACwireFrame(pins[name], sm = sm, start = False, filter = filter, timeout = NEVER)
+            else:
+                sensor = ZACwire(pins[name], sm = (sm, sm + 1), start = False, filter = filter, timeout = NEVER)
+            self.sensors.append(sensor)
+        if start:
+            self.start()
+
+    def temperatures(self):
+        """Temperatures of all sensors, in the order of `names`; None for a failing sensor."""
+        values = []
+        for sensor in self.sensors:
+            T = sensor.T()  # decodes the pending frames first
+            failing = sensor.timeout_counter >= self.timeout or sensor.age() > self.max_age
+            values.append(None if failing else T)
+        return values
+
+    def errors(self):
+        """Parity errors of each sensor since start."""
+        return [sensor.errorcount for sensor in self.sensors]
+
+    def status_line(self):
+        """One line with the temperature and the errors of each sensor."""
+        parts = []
+        for name, T, sensor in zip(self.names, self.temperatures(), self.sensors):
+            value = "failing" if T is None else f"{T:.2f}"
+            parts.append(f"{name}: {value} (errors {sensor.errorcount}, decode_max_us {sensor.decode_max_us})")
+        return "Sensors: " + ", ".join(parts)
+
+    def start(self):
+        for sensor in self.sensors:
+            sensor.start()
+
+    def stop(self):
+        for sensor in self.sensors:
+            sensor.stop()
+
+    def close(self):
+        """Stop the sensors and free the PIO instruction memory."""
+        self.stop()
+        for block in self.blocks:
+            for program in self.programs:
+                rp2.PIO(block).remove_program(program)
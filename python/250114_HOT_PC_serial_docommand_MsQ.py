@@ -5,112 +5,34 @@ Created on Fri Nov 15 15:31:48 2024
 @author: carac001
 """
 
-import numpy as np
-import json
-from glob import glob
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-from scipy.stats import ttest_ind, ttest_ind_from_stats
-
 from datetime import datetime
 import re
-import pandas as pd 
-import seaborn as sns
-from scipy.ndimage import median_filter
-from time import localtime, strftime
-import matplotlib.pylab as pl
-import matplotlib.gridspec as gridspec
-import matplotlib.patches as mpatches
-import matplotlib.lines as mlines
-import os, webbrowser, glob
-import serial
-import sys
-import time
-import itertools
+import os
+# the analysis modules (numpy, matplotlib, pandas) are imported in plot_runs(),
+# the device functions only need the serial layer
+from hot_serial import open_session, find_device, parse_msq_response, MsQSession, PIDSession
+from hot_storage import load_run
+from hot_catalog import CATALOG_PATH, RunCatalog
 
 today = datetime.today().strftime('%Y%m%d')[2:]
 
 
-def serial_ports():
-    """ Lists serial port names
-
-        :raises EnvironmentError:
-            On unsupported or unknown platforms
-        :returns:
-            A list of the serial ports available on the system
-    """
-    if sys.platform.startswith('win'):
-        ports = ['COM%s' % (i + 1) for i in range(256)]
-    elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-        # this excludes your current terminal "/dev/tty"
-        ports = glob.glob('/dev/tty[A-Za-z]*')
-    elif sys.platform.startswith('darwin'):
-        ports = glob.glob('/dev/tty.*')
-    else:
-        raise EnvironmentError('Unsupported platform')
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException):
-            pass
-    return result
-
 def findMsQ():
-    for port in serial_ports():
-        with serial.Serial(port, baudrate=115200, timeout = 1) as ser:
-            ser.write("hello".encode())
-            answer = ser.readline().decode()
-            # print(port, answer)
-            if answer == "MultispeQ Ready\n":
-                return port
-            else:
-                pass 
+    # cached / USB id lookup first, then all ports probed concurrently
+    return find_device("MultispeQ", timeout=1)
             
 def findPID():
-    TRIALS = 10 # number of read trials, other 
-    for port in serial_ports():
-        with serial.Serial(port, baudrate=115200, timeout = 1) as ser:
-           ser.write("\"hello\n\n\"".encode())
-           answer = ser.readline()
-           for i in range(TRIALS):
-               if b"" != answer:
-                   # print(port, answer)
-                   if b'PID ready\r\n' == answer:
-                       return port
-                   else:
-                       answer = ser.readline()
+    return find_device("PID_legacy", timeout=1)
 
 def do_MsQcommand(PORT,string):
-    with serial.Serial(PORT, baudrate=115200, timeout = 1) as ser:
-        ser.setRTS(False)
-        ser.write(f"{string}".encode())
-        response = ser.readline().decode()
-        return response
+    # sessions keep one connection per device open for the whole run
+    return open_session(PORT, MsQSession).command(string)
 
 def do_PIDcommand(PORT,string):
-    with serial.Serial(PORT, baudrate=115200, timeout = 1) as ser:
-        ser.setRTS(False)
-        ser.write(f"\"{string}\"\n\n".encode())
-        response = ser.readline().decode()
-        return response
+    return open_session(PORT, PIDSession, quoted=True).command(string)
     
 def do_MsQprotocol(PORT,string):
-    with serial.Serial(PORT, baudrate=115200, timeout = 1) as ser:
-        ser.setRTS(False)
-        ser.write(f"{string}".encode())
-        
-        response = []
-        while True:
-            bt = ser.readline().decode()
-            response += bt
-            # print(bt)
-            if re.match(".*}[A-Z,0-9]{8}",bt):
-                break
-        return response
+    return open_session(PORT, MsQSession).protocol(string)
     
 def parse_response(response):
     a = ''.join(map(str, response)).replace("\n","")
@@ -121,51 +43,60 @@ def parse_response(response):
     return a
 
 def response_json(response):
-    import json
-    s = ''.join(map(str, response)).replace("\n","")[:-8]
-    j = json.loads(s)
-    return j
+    # JSON of the answer without the checksum trailer
+    return parse_msq_response(response)
 
 ###############################################################################
 
-import matplotlib as mpl
-import matplotlib.cm as cm
-   
-norm = mpl.colors.Normalize(vmin=20, vmax=30)
-cmap = cm.viridis
-m = cm.ScalarMappable(norm=norm, cmap=cmap)
+OUTDIR = f"../../../Data/multispeq/{today}/" # output directory
+CATALOG = CATALOG_PATH # catalogue of all the runs, ../../../Data/hot_runs.sqlite unless HOT_CATALOG is set (see hot_catalog)
 
 
+def plot_runs(outdir=OUTDIR, catalog_path=CATALOG, last=8):
+    # fluorescence traces and Fo, Fm, Fv/Fm of the last runs of the day, as a DataFrame
+    import numpy as np
+    import pandas as pd
+    import matplotlib as mpl
+    import matplotlib.cm as cm
+    import matplotlib.pyplot as plt
 
-OUTDIR = f"../../../Data/multispeq/{today}/" # output directory
+    norm = mpl.colors.Normalize(vmin=20, vmax=30)
+    cmap = cm.viridis
+    m = cm.ScalarMappable(norm=norm, cmap=cmap)
 
-result = []
-for filename in os.listdir(OUTDIR)[-8:]:
-    with open(os.path.join(OUTDIR,filename)) as f:
-        data = json.load(f)
+    catalog = RunCatalog(catalog_path)
+    catalog.index_files(outdir) # files saved before the catalogue, only the new ones are read
+    result = []
+    for run in catalog.query(instrument="MultispeQ", date_from=today, date_to=today, last=last):
+        filename = os.path.basename(run.path)
+        data = load_run(run.path) # JSON or converted file (see hot_storage)
+            
+        y = np.array(data["sample"][0]["set"][0]["data_raw"])
+        x = np.arange(len(y))
+        fo = np.round(np.mean(y[:20]),3)
+        fm = np.round(np.mean(y[1500:1520]),3)
+        fv = fm-fo
+        fvfm = np.round(fv/fm,3)
+        temp = run.setpoint
+        result.append([filename,temp,fo,fm,fvfm])
+        plt.plot(x,y,c=m.to_rgba(temp),label=f"{temp}°C")
+        plt.ylim([0,100])
         
-    y = np.array(data["sample"][0]["set"][0]["data_raw"])
-    x = np.arange(len(y))
-    fo = np.round(np.mean(y[:20]),3)
-    fm = np.round(np.mean(y[1500:1520]),3)
-    fv = fm-fo
-    fvfm = np.round(fv/fm,3)
-    temp = float(re.search(".*_setpoint([0-9]{2})_.*",filename).group(1))
-    result.append([filename,temp,fo,fm,fvfm])
-    plt.plot(x,y,c=m.to_rgba(temp),label=f"{temp}°C")
-    plt.ylim([0,100])
-    
-    # plt.title(f"{filename}")
+        # plt.title(f"{filename}")
+
+    plt.xlim([0,300])
+    handles, labels = plt.gca().get_legend_handles_labels()
+    by_label = dict(zip(labels, handles))
+    plt.legend(by_label.values(), by_label.keys())
+    plt.ylabel("Rel. Fluo. Yield")
+    plt.xlabel("Pulse number")
+    plt.show()
+
+    return pd.DataFrame(result,columns=["filename","temp","fo","fm","fvfm"])
 
-plt.xlim([0,300])
-handles, labels = plt.gca().get_legend_handles_labels()
-by_label = dict(zip(labels, handles))
-plt.legend(by_label.values(), by_label.keys())
-plt.ylabel("Rel. Fluo. Yield")
-plt.xlabel("Pulse number")
-plt.show()
 
-df = pd.DataFrame(result,columns=["filename","temp","fo","fm","fvfm"])
+if __name__ == "__main__":
+    df = plot_runs()
 
 ###############################################################################
 
@@ -5,63 +5,25 @@ Created on Fri Nov 15 15:31:48 2024
 @author: carac001
 """
 
-import numpy as np
-import json
-from glob import glob
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-from scipy.stats import ttest_ind, ttest_ind_from_stats
-
 from datetime import datetime
-import re
-import pandas as pd 
-import seaborn as sns
-from scipy.ndimage import median_filter
-from time import localtime, strftime
-import matplotlib.pylab as pl
-import matplotlib.gridspec as gridspec
-import matplotlib.patches as mpatches
-import matplotlib.lines as mlines
-import os, webbrowser, glob
+import os
 import serial
-import sys
-import time
-import itertools
-from tqdm import tqdm
+import asyncio
+# matplotlib, scipy, pandas... are imported where they are used: the acquisition
+# only needs the serial layer (see 261018_bench_startup.py)
+from hot_serial import open_session, close_sessions, find_device, AmbitSession, PIDSession
+from hot_acquisition import SweepOrchestrator
+from hot_ambit import parse_command_blocks, Arrun1Parser, gen_cmd_arr_line, calc_arr_param
+from hot_schedule import ThermalModel, plan_sweep, predict_duration, format_duration
+from hot_storage import save_run
+from hot_catalog import CATALOG_PATH, RunCatalog
+from hot_plotting import FilePlotter, LivePlotter
 
 
 
 today = datetime.today().strftime('%Y%m%d')[2:]
 
 
-def serial_ports():
-    """ Lists serial port names
-
-        :raises EnvironmentError:
-            On unsupported or unknown platforms
-        :returns:
-            A list of the serial ports available on the system
-    """
-    if sys.platform.startswith('win'):
-        ports = ['COM%s' % (i + 1) for i in range(256)]
-    elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-        # this excludes your current terminal "/dev/tty"
-        ports = glob.glob('/dev/tty[A-Za-z]*')
-    elif sys.platform.startswith('darwin'):
-        ports = glob.glob('/dev/tty.*')
-    else:
-        raise EnvironmentError('Unsupported platform')
-
-    result = []
-    for port in ports:
-        try:
-            s = serial.Serial(port)
-            s.close()
-            result.append(port)
-        except (OSError, serial.SerialException):
-            pass
-    return result
-
 def ensure_path_exists(path: str) -> None:
     """
     Ensures that the given directory path exists.
@@ -76,292 +38,49 @@ def ensure_path_exists(path: str) -> None:
         print(f"{path} exist")
 
 
-def findDevice(question="hello", answer="", flush=True, timeout=1):
+def findDevice(name, question=None, answer=None, timeout=1):
     """
     Attempts to find a device on any available serial port by sending 
     a 'question' string and looking for an 'answer' substring in the response.
-    If no matching device is found on any port, implicitly return None
-
-    :param question: The message to send to the device (default: "hello").
-    :param answer: The substring we expect in the device's response (default: "").
-    :param flush: Whether to flush the serial buffer before sending the question (default: True).
-    :param timeout: The read timeout for the serial port in seconds (default: 1).
+    The port found is cached (see hot_serial.find_device): the next run checks the
+    cached USB serial number / port first, and otherwise all ports are probed concurrently.
+    If no matching device is found on any port, return None
+
+    :param name: Name of the device, key of hot_serial.DEVICES and of the cache (eg. "PID", "Ambit").
+    :param question: The message to send to the device (default: from hot_serial.DEVICES).
+    :param answer: The substring we expect in the device's response (default: from hot_serial.DEVICES).
+    :param timeout: Max time to wait for the answer on each port, in seconds (default: 1).
     :return: The port where the expected 'answer' is found, or None if not found.
     """
-    for port in serial_ports():     # Iterate through each potential serial port returned by 'serial_ports()'
-        with serial.Serial(port, baudrate=115200, timeout=timeout) as ser:         # Open the serial port using a context manager to ensure it closes automatically
-
-            # If flush is True, clear any existing data in the buffer 
-            # and give a short delay to stabilize
-            if flush:
-                ser.flush()
-                time.sleep(0.5)
-        
-            ser.write(question.encode()) # Encode and write the 'question' to the serial port
-            time.sleep(0.5) # Allow some time for the device to respond
-            
-            msg = ser.readline().decode() # Read one line of response from the serial port, then decode it
-            
-            # If the expected 'answer' substring is in the device response, 
-            # print and return the port
-            print(msg)
-            if answer in msg:
-                print(f"Found device at: {port}, answer: {msg}")
-                return port
+    return find_device(name, question=question, answer=answer, timeout=timeout)
        
 
-def gen_cmd_arr_line(num: int, freq: int, actinic: int) -> list:
-    """
-    Generate a single command-array entry of 8 parameters.
-        
-    :param num: Total number of measurement points (10-2_000).
-    :param freq: Frequency measurement points (1-200).
-    :param actinic: Actinic light setting (0-255).
-    :return: List of 8 integer values representing the command.
-    """
-    return [
-        2,              # Fixed flag or identifier
-        0,              # Another fixed flag or placeholder
-        num // 256,     # High byte of 'num'
-        num % 256,      # Low byte of 'num'
-        freq // 256,    # High byte of 'freq'
-        freq % 256,     # Low byte of 'freq'
-        actinic,        # Actinic light parameter
-        1               # Fixed flag or terminator
-    ]
-
-def calc_arr_param(cmd: list, persist: bool = False):
-    """
-    Reshape a flat command list into a 2D array, construct a command string,
-    and calculate measurement timelines and actinic-array values.
-
-    :param cmd: A 1D list of length 8*N (multiple commands concatenated).
-    :param persist: A flag indicating whether the command persists after completion.
-    :return: Tuple (cmd_str, mea_tml, mea_act)
-        - cmd_str: Formatted command string (e.g., for sending over serial).
-        - mea_tml: NumPy array of timestamps (scaled by 0.854).
-        - mea_act: List of actinic values (one per timestamp).
-    """
-    # Reshape 'cmd' into an N x 8 array
-    cmd_arr = np.reshape(cmd, (-1, 8))
-    arr_length = cmd_arr.shape[0]
-
-    # Create a comma-separated command string:
-    # e.g., "arrun1,N,persist,<entire cmd list>,\n"
-    cmd_str = f"arrun1,{arr_length},{persist},{str(cmd)[1:-1]},\n"
-    cmd_str = cmd_str.replace(" ", "")  # Remove spaces for a cleaner command
-
-    # Parse the reshaped array into usable parameters
-    num_pts = cmd_arr[:, 2] * 256 + cmd_arr[:, 3]  # Number of points (high/low bytes)
-    act_arr = cmd_arr[:, 6]                       # Actinic setting
-    mea_feq = 1 / (cmd_arr[:, 4] * 256 + cmd_arr[:, 5])  # Measurement frequency (1 / freq)
-
-    # Build up the measurement timeline and actinic values
-    _t = 0
-    mea_tml = []
-    mea_act = []
-
-    # For each command segment, create a timeline and corresponding actinic values
-    for _n, _f, _a in zip(num_pts, mea_feq, act_arr):
-        segment_times = (np.arange(_n) * _f) + _t
-        mea_tml.extend(segment_times)       # Accumulate times
-        mea_act.extend([_a] * _n)           # Repeat actinic value _n times
-        _t = segment_times[-1]              # Update the offset for the next segment
-
-    # Scale the entire timeline by 0.854
-    mea_tml = np.array(mea_tml) * 0.854
-
-    return cmd_str, mea_tml, mea_act
-
-def send_read_comand(PORT,string,baudrate=115200, timeout=10):
+def send_read_comand(PORT,string,baudrate=115200, timeout=10, on_line=None):
     """
-    Function to open serial, get in master mode with "hello" comand and send comand.
+    Send comand on the persistent Ambit session (see hot_serial.AmbitSession).
     Read will stop when no more line to be read.
     Args:
         port: str, port name
         baudrate: int, baudrate
         timeout: int, timeout in seconds
+        on_line: callable, called with each line as soon as it is read (eg. Arrun1Parser.feed)
     Returns:
         list, received data
     """
 
-    with serial.Serial(PORT, baudrate = baudrate, timeout = timeout) as ser:
-        ser.setRTS(False)
-        ser.flush() # Flush 
-        time.sleep(0.7)
-        ser.write("hello\n".encode())
-        time.sleep(0.5)
-        ser.write(f"{string}\n".encode())
+    # The session is opened (and put in master mode with "hello") only once per run
+    session = open_session(PORT, AmbitSession, baudrate=baudrate)
+    session.ser.timeout = timeout
+    try:
+        lines = session.run(string, on_line=on_line)
+    except serial.SerialException:
         lines = []
-        try:
-            while True:
-                line = ser.readline() # Attempt to read one line
-                if not line:    # If nothing was read (empty line), we assume there's no more data for now
-                    break
-                lines.append(line.decode('utf-8', errors='replace').rstrip()) # Convert bytes to string and strip trailing whitespace
-        except:
-            pass
     return lines
 
 
 
-def parse_command_blocks(lines, cmd_prefix="cmd:"):
-    """
-    Parse a list of lines and group them by commands that match `cmd_prefix`.
-
-    The function identifies lines containing commands (e.g., 'cmd: something')
-    and collects all subsequent lines into that command's "block" until the
-    next command (or end of list).
-
-    :param lines: List of strings to parse.
-    :param cmd_prefix: The prefix that indicates a new command. Defaults to 'cmd:'.
-    :return: A dictionary mapping { command_name: [list_of_lines_until_next_command] }
-             If the same command appears multiple times, each occurrence will
-             overwrite previous data unless modified to handle duplicates.
-    """
-    command_dict = {}
-    current_cmd = None
-    current_data = []
-
-    for line in lines:
-        # Try to find a line that includes 'cmd:' (possibly with extra characters).
-        # The regex captures whatever follows 'cmd:' up to the first whitespace 
-        # or end of string. E.g., 'cmd: hello' => group(1) = 'hello'.
-        match = re.search(r'cmd:\s*([^\s]+)', line)
-
-        if match:
-            # If we have a "current_cmd", store its accumulated data first
-            if current_cmd is not None:
-                command_dict[current_cmd] = current_data
-
-            # Extract the new command from the current line
-            current_cmd = match.group(1)
-            current_data = []  # Start a fresh list for data following this command
-        else:
-            # If this line does not declare a new command, and we've already seen a command,
-            # then add the line to the current command's block
-            if current_cmd is not None:
-                current_data.append(line)
-
-    # At the end, if there is a command in progress, save its data
-    if current_cmd is not None:
-        command_dict[current_cmd] = current_data
-
-    return command_dict
-
-
-def parse_arrun1(command_dict):
-    """
-    From a parsed dictionary (use parse_command_block() ), locate the block after 'cmd: arrun1'
-    and extract numeric values of T, F, S, R, Sun, and L for each
-    matching line, returning them in a dictionary of lists.
-
-    Example return structure:
-    {
-      'T':   [31.0, 31.0, 31.0],
-      'F':   [0.0759, 0.0748, 0.0762],
-      'S':   [506, 499, 509],
-      'R':   [6667, 6669, 6678],
-      'Sun': [380, 382, 380],
-      'L':   [484, 486, 487]
-    }
-
-    :param lines: A list of text lines (e.g., from a serial device).
-    :return: A dict of lists, one list per key: 'T', 'F', 'S', 'R', 'Sun', 'L'.
-             If 'cmd: arrun1' or matching lines are not found, returns
-             empty lists for each key.
-    """
-    # 1) Extract lines that belong to "arrun1"
-    arrun1_lines = command_dict.get("arrun1", [])
-
-    # 2) Prepare a regex to capture the six fields of interest
-    pattern = re.compile(
-        r"T:([^,]+),F:([^,]+),S:([^,]+),R:([^,]+),Sun:([^,]+),L:([^,]+)"
-    )
-
-    # 4) Initialize an output dict with empty lists for each key
-    result = {"T": [],"F": [],"S": [],"R": [],"Sun": [],"L": [] }
-
-    for line in arrun1_lines:
-        match = pattern.search(line)
-        if match:
-            # Convert T, F to float and S, R, Sun, L to int
-            try:
-                t_val = float(match.group(1))
-                f_val = float(match.group(2))
-                s_val = int(match.group(3))
-                r_val = int(match.group(4))
-                sun_val = int(match.group(5))
-                l_val = int(match.group(6))
-
-                # Append to the lists
-                result["T"].append(t_val)
-                result["F"].append(f_val)
-                result["S"].append(s_val)
-                result["R"].append(r_val)
-                result["Sun"].append(sun_val)
-                result["L"].append(l_val)
-            except ValueError:
-                # If conversion fails (malformed line), ignore or handle it
-                print(f"PARSING ERROR parse_arrun1_dict, {match}")
-                pass
-
-    return result
-
-
-def plot_two_values(r_data,title=""):
-    
-    fig, ax1 = plt.subplots()
-    
-    color_f = 'tab:blue'
-    ax1.set_xlabel('Measurement Index')
-    ax1.set_ylabel('Fluo', color=color_f)
-    line1 = ax1.plot(
-        np.arange(len(r_data["F"])), 
-        r_data["F"], 
-        color=color_f, 
-        label="Fluo"
-    )
-    # Match y-axis tick label color to the line color
-    ax1.tick_params(axis='y', labelcolor=color_f)
-    ax1.set_ylim([0.1,0.15])
-    
-    # 3) Create a secondary y-axis sharing the same x-axis
-    ax2 = ax1.twinx()
-    
-    # 4) Plot the second data series on the secondary y-axis
-    color_r = 'tab:red'
-    ax2.set_ylabel('Reflectance', color=color_r)
-    line2 = ax2.plot(
-        np.arange(len(r_data["R"])), 
-        r_data["R"], 
-        color=color_r, 
-        label="Reflectance"
-    )
-    ax2.tick_params(axis='y', labelcolor=color_r)
-    ax2.set_ylim([6300,6900])
-    
-    # (Optional) Combine legends from both axes
-    # Matplotlib won't automatically merge them if you use separate axes, so do this:
-    lines = line1 + line2
-    labels = [l.get_label() for l in lines]
-    ax1.legend(lines, labels, loc="best")
-    
-    
-    plt.title(title)
-    fig.tight_layout()  # Helps prevent overlapping labels on most backends
-    plt.show() 
-
-
-
-
-
-
-
-
-
-PORT_PID = findDevice(question="hello\n",answer="Hello PID here",flush=False,timeout=2)
-PORT_AMB = findDevice(question="hello",answer="ESP-ROM:esp",flush=True,timeout=2)
+PORT_PID = findDevice("PID",question="hello\n",answer="Hello PID here",timeout=2)
+PORT_AMB = findDevice("Ambit",question="hello",answer="ESP-ROM:esp",timeout=2)
 
 assert PORT_AMB != None
 assert PORT_PID != None
@@ -369,10 +88,18 @@ assert PORT_PID != None
 
 
 RANGE_TEMP = [20,25,30,35,30,25,20,35,20]   # range of temperature 
-STABILIZE =  60                 # wait time after reaching setpoint, seconds 
+# Reorder RANGE_TEMP to minimize the predicted sweep duration (see hot_schedule). Off by default: a list of
+# numbers has no approach direction, reordering it groups the repeats and loses the up/down sweep. To keep
+# the directions, give the steps as hot_schedule.Step(setpoint, direction) or hysteresis(setpoints)
+OPTIMIZE_ORDER = False
+STABILIZE =  60                 # wait time after reaching setpoint, seconds (used if STABILITY is None)
+STABILITY = dict(window=60, mean_tol=0.1, std_tol=0.05, slope_tol=0.05, max_wait=30*60) # adaptive stabilization criteria, see hot_stabilization
 OUTDIR = f"../../../Data/ambit/{today}/" # output directory
-SAVE = True # True for saving json with data
+SAVE = True # True for saving the data
+STORAGE = "npz" # file format of the data: "npz", "hdf5" or "parquet" (see hot_storage)
+CATALOG = CATALOG_PATH # catalogue of all the runs, ../../../Data/hot_runs.sqlite unless HOT_CATALOG is set (see hot_catalog)
 INPUT = True # True for adding sample
+PLOT = "file" # "file": one png per run in OUTDIR/figures, "live": one window updated per run, None: no plot
 myinput = "" # create string for sample
 
 cmd = []
@@ -386,85 +113,88 @@ cmd_str, timeline, act_arr = calc_arr_param(cmd, 0)
 
 if SAVE:
     ensure_path_exists(OUTDIR)
+catalog = RunCatalog(CATALOG)
 if INPUT:
     myinput = input("\nInsert type of sample (eg. unicode, blank...)\n")
     
    
-for TEMP_VALUE in RANGE_TEMP:  
-    setpoint_command = f"setpoint_{TEMP_VALUE}" # Construct the command to set the device's temperature setpoint
-    with serial.Serial(PORT_PID, baudrate=115200, timeout=1) as ser: # Open a serial connection to the PID controller
-        print(f"Setting setpoint to {TEMP_VALUE}")  # Let the user know we are changing the setpoint
-        ser.write(f"{setpoint_command}\n".encode()) # Send the setpoint command, followed by a newline to conform to typical serial protocols
-        time.sleep(1) # Wait briefly to allow the device time to process the command
-        msg = ser.readline().decode().strip()       # (Optional) Read and print the immediate response after setting the setpoint
-        print(f"Initial response: {msg}")
-        
-        while True:   # Continuously poll the device to see if the measured temperature has reached our setpoint
-            ser.write("query\n".encode())          # Send a "query" command to the device to get the current status
-            msg = ser.readline().decode().strip()  # Read the response line, decode it to string, and strip whitespace
-            print(f"Query response: {msg}")
-            if msg:
-                try:
-                    # Parse the setpoint, measured temperature, and PID feedback using regular expressions
-                    setpoint_match = re.search(r"Setpoint:\s*([0-9]*\.[0-9]*),", msg)
-                    measured_match = re.search(r"Measured temp:\s*([0-9]*\.[0-9]*)", msg)
-                    pwm_match = re.search(r"PID feedback:\s*([0-9]*)", msg)
-                    # Extract each value if the above searches are successful, store as float and int
-                    setpoint = float(setpoint_match.group(1))
-                    measured = float(measured_match.group(1))
-                    pwm = int(pwm_match.group(1))  
-                    print(f"READING => Setpoint: {setpoint}, Measured: {measured}, PWM: {pwm}")
-                    # If the measured temperature is close enough to the setpoint, break out of the loop
-                    if abs(measured - setpoint) < 0.5:
-                        print("Setpoint reached, stabilizing.")
-                        for _ in tqdm(range(STABILIZE), desc="Loading"):
-                            time.sleep(1)
-                        print("Temperature is stable. READY to proceed.")
-                        
-                        break
-                except (AttributeError, ValueError):
-                    print(f"FAILED to parse the response: {msg}") # If the regex did not match or casting failed, print an error message
-                    # # Short delay before trying again
-                    time.sleep(0.5)
-            else:
-                # If no meaningful response is received, just log it and continue looping
-                print(f"UNPARSABLE or empty message: {msg}")
-            
-            # Small delay to avoid spamming the device with too many queries
-            time.sleep(0.5)   
-            
-        
-        print("\n\nMeasuring temperature")
-        t_serial = send_read_comand(PORT_AMB,"temp",timeout=1)
-        t_parsed = parse_command_blocks(t_serial) 
-        t_obj, t_board, _ = t_parsed["temp"][0].split("\t") # extract t object, t board
-        print("Running protocol")
-        r_serial = send_read_comand(PORT_AMB,cmd_str,timeout=1)
-        r_parsed = parse_command_blocks(r_serial)
-        r_data = parse_arrun1(r_parsed)
-        
-        # setup results dictionary
-        metadata = {} # setup results dictionary
-        metadata["datetime"] = today
-        metadata["time"] = datetime.now().strftime("%H:%M:%S")
-        metadata["sample"] = myinput
-        metadata["t_setpoint"] = setpoint
-        metadata["t_stabilization"] = STABILIZE
-        metadata["t_obj"] = t_obj
-        metadata["t_board"] = t_board
-        metadata["cmd_str"] = cmd_str
-        results = metadata | r_data
-        
-        if SAVE:
-            FIDX = "{:04d}".format(len(os.listdir(OUTDIR)))
-            filename = f"{today}_{FIDX}_Ambit.json"
-            print(f"Saving as {OUTDIR+filename}")
-            with open(OUTDIR+filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=4)
-            
-        
-        plot_two_values(r_data,title=TEMP_VALUE)
-        # print(data)
+pid = open_session(PORT_PID, PIDSession) # One connection to the PID controller for the whole sweep
+
+# Thermal model fitted on the PID telemetry of the previous runs, default model if none
+history = catalog.paths(instrument="Ambit", last=50)
+try:
+    model = ThermalModel.from_results(history)
+except (ValueError, KeyError, OSError): # too few runs, or a file unreadable
+    model = ThermalModel()
+print(f"Thermal model: {model}")
+reading = pid.query()
+T_START = reading[1] if reading is not None else RANGE_TEMP[0]
+print(f"Predicted sweep duration: {format_duration(predict_duration(RANGE_TEMP, model, T_START))}")
+if OPTIMIZE_ORDER:
+    order, predicted = plan_sweep(RANGE_TEMP, model, T_START)
+    RANGE_TEMP = [step.setpoint for step in order]
+    print(f"Optimized order: {RANGE_TEMP}, predicted sweep duration: {format_duration(predicted)}")
+
+
+def measure_ambit(reading):
+    """
+    Measure the Ambit temperature and run the protocol, called once the setpoint is stable.
+    PID telemetry keeps running in the orchestrator while this runs.
+
+    :param reading: Latest PID reading (hot_acquisition.Reading).
+    :return: Results dictionary (metadata and arrun1 data).
+    """
+    print("\n\nMeasuring temperature")
+    t_serial = send_read_comand(PORT_AMB,"temp",timeout=1)
+    t_parsed = parse_command_blocks(t_serial) 
+    t_obj, t_board, _ = t_parsed["temp"][0].split("\t") # extract t object, t board
+    print("Running protocol")
+    parser = Arrun1Parser(capacity=len(timeline)) # lines are parsed while they arrive
+    send_read_comand(PORT_AMB,cmd_str,timeout=1,on_line=parser.feed)
+    r_data = parser.result()
+    for idx, line in parser.errors:
+        print(f"PARSING ERROR arrun1 line {idx}: {line}")
+    
+    # setup results dictionary
+    metadata = {} # setup results dictionary
+    metadata["datetime"] = today
+    metadata["time"] = datetime.now().strftime("%H:%M:%S")
+    metadata["sample"] = myinput
+    metadata["t_setpoint"] = reading.setpoint
+    metadata["t_measured"] = reading.measured
+    metadata["t_stabilization"] = STABILIZE if STABILITY is None else "adaptive" # actual time in "t_settling"
+    metadata["t_obj"] = t_obj
+    metadata["t_board"] = t_board
+    metadata["cmd_str"] = cmd_str
+    return metadata | r_data
+
+
+def save_results(results):
+    FIDX = "{:04d}".format(catalog.next_index(today, "Ambit", OUTDIR)) # above the files already in OUTDIR too
+    filename = f"{today}_{FIDX}_Ambit"
+    path = save_run(OUTDIR+filename, results, fmt=STORAGE) # typed arrays + metadata, see hot_storage
+    catalog.add(path, results, "Ambit", idx=int(FIDX))
+    print(f"Saved as {path}")
+
+
+# Figures are rendered in a background process (see hot_plotting), never in the acquisition path
+plotter = {"file": lambda: FilePlotter(os.path.join(OUTDIR, "figures")), "live": LivePlotter, None: lambda: None}[PLOT]()
+
+# PID telemetry, Ambit measurement, saving and plotting run as separate asyncio tasks
+orchestrator = SweepOrchestrator(
+    pid,
+    measure_ambit,
+    save = save_results if SAVE else None,
+    plot = plotter.submit if plotter is not None else None,
+    stabilize = STABILIZE,
+    stabilization = STABILITY,
+    )
+asyncio.run(orchestrator.run(RANGE_TEMP))
+
+close_sessions() # close the ports and print the time spent per command
+catalog.close()
+if plotter is not None:
+    plotter.close()
     
    
     
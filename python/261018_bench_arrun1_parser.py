@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Benchmark of the arrun1 parsing: parse_command_blocks() + parse_arrun1()
+against the streaming Arrun1Parser, on synthetic Ambit output. Both must give
+the same columns, on well-formed output and on the MALFORMED blocks, where the
+streaming parser must also report the rejected lines.
+
+Run from this folder: python 261018_bench_arrun1_parser.py
+"""
+
+import random
+import time
+
+import numpy as np
+
+from hot_ambit import parse_command_blocks, parse_arrun1, parse_arrun1_stream, Arrun1Parser
+
+
+# arrun1 blocks with malformed lines -> indices of the lines to reject
+MALFORMED = [
+    (["cmd: arrun1", "T:31.0,F:0.0759,S:506,R:6667,Sun:380,L:484",
+      "T:31.0,F:0.0759,S:5.7,R:6667,Sun:380,L:484",  # not an integer
+      "T:31.0,F:0.0759,S:506,R:6667,Sun:380,L:484"], [2]),
+    (["cmd: arrun1", "T:31.0,F:0.0759,S:506,R:6667,Sun:380",  # no L, the next line has two
+      "T:32.0,F:0.0760,S:507,R:6668,Sun:381,L:485,L:999",
+      "T:33.0,F:0.0761,S:508,R:6669,Sun:382,L:486"], [1]),
+]
+
+
+def synthetic_output(n_points: int, seed: int = 0) -> list:
+    """Lines as returned by send_read_comand for an arrun1 protocol of n_points."""
+    rng = random.Random(seed)
+    lines = ["ESP-ROM:esp32s3-20210327", "cmd: arrun1"]
+    for _ in range(n_points):
+        lines.append(
+            f"T:{rng.uniform(20, 40):.1f},F:{rng.uniform(0.07, 0.08):.4f},S:{rng.randint(490, 520)},"
+            f"R:{rng.randint(6600, 6700)},Sun:{rng.randint(370, 390)},L:{rng.randint(480, 490)}"
+        )
+    return lines
+
+
+def best_of(func, repeat: int = 7) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def check_malformed():
+    for lines, rejected in MALFORMED:
+        ref = parse_arrun1(parse_command_blocks(lines))
+        new, errors = parse_arrun1_stream(lines)
+        assert all(np.array_equal(ref[key], new[key]) for key in ref), (ref, new)
+        assert [i for i, _ in errors] == rejected, errors
+
+
+def main():
+    check_malformed()
+    print(f"{'points':>8} {'current (ms)':>14} {'streaming (ms)':>15} {'speedup':>8}")
+    for n_points in (60, 600, 2000, 6000, 20000):
+        lines = synthetic_output(n_points)
+
+        def current():
+            return parse_arrun1(parse_command_blocks(lines))
+
+        def streaming():
+            parser = Arrun1Parser(capacity=n_points)
+            for line in lines:  # one line at a time, as read from the port
+                parser.feed(line)
+            return parser.result()
+
+        ref, new = current(), streaming()
+        assert all(np.array_equal(ref[key], new[key]) for key in ref)
+        t_cur, t_new = best_of(current), best_of(streaming)
+        print(f"{n_points:>8d} {1e3 * t_cur:>14.2f} {1e3 * t_new:>15.2f} {t_cur / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+End-to-end sweep on the emulated devices: discovery, PID polling, Ambit
+temp and arrun1 with streaming parsing, timed per step, without hardware.
+
+The PID and Ambit emulators of hot_emulator are started on pseudo-terminals
+and found with find_device through HOT_PORTS (with a separate device cache);
+the sweep runs with the SweepOrchestrator and the measurement of the Ambit
+script. The heater and the protocol run --time-scale times faster than real
+time; the stabilization wait and the polling period are scaled the same way.
+The discovery time, the time per setpoint and the timing report of the
+sessions are printed.
+
+Run from this folder: python 261018_bench_emulated_sweep.py [--time-scale 50] [--latency 0.005] [--setpoints 25 30 22]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import hot_emulator
+from hot_acquisition import SweepOrchestrator
+from hot_ambit import Arrun1Parser, compile_protocol
+from hot_serial import AmbitSession, PIDSession, close_sessions, find_device, open_session
+
+
+SEGMENTS = [(20, 10, 0), (20, 10, 200), (20, 10, 0)]  # protocol of the Ambit script
+STABILIZE = 60  # s of simulated time after reaching the setpoint
+POLL = 0.5  # s of simulated time between two PID queries
+
+
+def measure_ambit(port, protocol):
+    """measure() of the Ambit script: temp, then arrun1 parsed while the lines arrive."""
+    def measure(reading):
+        session = open_session(port, AmbitSession)
+        session.ser.timeout = 1
+        t_obj, t_board, _ = session.run("temp")[1].split("\t")
+        parser = Arrun1Parser(capacity=len(protocol.timeline))
+        session.run(protocol.cmd_str, on_line=parser.feed)
+        data = parser.result()
+        if parser.errors or len(data["F"]) != len(protocol.timeline):
+            print(f"arrun1: {len(data['F'])} points of {len(protocol.timeline)}, {len(parser.errors)} errors")
+        return {"t_setpoint": reading.setpoint, "t_obj": t_obj, "t_board": t_board, **data}
+    return measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--time-scale", type=float, default=50.0, help="simulated seconds per second")
+    parser.add_argument("--latency", type=float, default=0.005, help="delay of each answer of the devices (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay of each answer, max (s)")
+    parser.add_argument("--noise", type=float, default=0.01, help="sensor noise (°C)")
+    parser.add_argument("--setpoints", nargs="+", type=float, default=[25, 30, 22])
+    args = parser.parse_args()
+
+    emulators = hot_emulator.start(("PID", "Ambit"), time_scale=args.time_scale, latency=args.latency,
+                                   jitter=args.jitter, noise=args.noise)
+    os.environ["HOT_PORTS"] = hot_emulator.environment(emulators)["HOT_PORTS"]
+    cache = os.path.join(tempfile.mkdtemp(), "devices.json")
+    try:
+        t0 = time.perf_counter()
+        port_pid = find_device("PID", timeout=2, cache_path=cache)
+        port_ambit = find_device("Ambit", timeout=2, cache_path=cache)
+        t_discovery = time.perf_counter() - t0
+        if port_pid is None or port_ambit is None:
+            raise SystemExit("emulated devices not found")
+        pid = open_session(port_pid, PIDSession)
+        open_session(port_ambit, AmbitSession)
+
+        orchestrator = SweepOrchestrator(pid, measure_ambit(port_ambit, compile_protocol(SEGMENTS)),
+                                         stabilize=STABILIZE / args.time_scale, poll=POLL / args.time_scale,
+                                         verbose=False)
+        t0 = time.perf_counter()
+        asyncio.run(orchestrator.run(args.setpoints))
+        t_sweep = time.perf_counter() - t0
+
+        print(f"\nTime scale {args.time_scale:g}, latency {args.latency} s, jitter {args.jitter} s")
+        print(f"discovery {t_discovery:.2f} s, sweep {t_sweep:.1f} s ({t_sweep * args.time_scale / 60:.1f} min "
+              f"of simulated heater time)")
+        print(f"{'setpoint':>9} {'reach (s)':>10} {'settling (s)':>13} {'measure (s)':>12} {'total (s)':>10}")
+        for timing in orchestrator.timings:
+            print(f"{timing['setpoint']:>9g} {timing['t_reach']:>10.2f} {timing['t_settling']:>13.2f} "
+                  f"{timing['t_measure']:>12.2f} {timing['t_total']:>10.2f}")
+        close_sessions()
+    finally:
+        for emulator in emulators.values():
+            emulator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+MultispeQ protocol benchmark: read and parse throughput of the host on the
+answer of the emulated MultispeQ, line by line (former) or in blocks.
+
+The MsQEmulator of hot_emulator answers the phi2 protocol of the MultispeQ
+script (an autogain set and a set of --pulses pulses) on a pseudo-terminal.
+The former path reads it with command_lines() until the checksum trailer and
+parses it as response_json() did; the current one with MsQSession.protocol()
+(blocks of what the port has received) and parse_msq_response(). Read time,
+parse time and throughput are reported, with the lines of both paths checked
+to parse to the same JSON. With --line-rate the emulator paces its lines like
+a slow device, which bounds both paths.
+
+Run from this folder: python 261018_bench_msq_protocol.py [--pulses 60 2000 60] [--line-length 2048] [--line-rate 500]
+"""
+
+import argparse
+import json
+import time
+
+from hot_emulator import MsQEmulator
+from hot_serial import MSQ_CHECKSUM_PATTERN, MsQSession, parse_msq_response
+
+
+def protocol(pulses) -> str:
+    """phi2 protocol of the MultispeQ script, with `pulses` pulses in its three phases."""
+    return json.dumps([{
+        "v_arrays": [[100, 1000, 10000], [100, 100, 100], [0, 0, 0]], "share": 1, "set_repeats": 1,
+        "_protocol_set_": [
+            {"autogain": [[1, 1, 1, 10, 500]], "do_once": 1},
+            {"label": "phi2", "nonpulsed_lights": [[2], [2], [2]], "nonpulsed_lights_brightness": [[0], [-2000], [0]],
+             "pulsed_lights": [[1], [1], [1]], "detectors": [[1], [1], [1]], "pulses": pulses,
+             "pulse_distance": [250000, 750, 250000], "pulsed_lights_brightness": [[-200], [-200], [-200]],
+             "pulse_length": [[10], [10], [10]], "protocol_averages": 1, "protocol_repeats": 1,
+             "environmental": [["light_intensity"], ["contactless_temp"], ["thp"], ["thp2"]]},
+        ],
+    }], separators=(",", ":"))
+
+
+def former(session, string):
+    lines = session.command_lines(string, until=MSQ_CHECKSUM_PATTERN, name="protocol")
+    t_read = time.perf_counter()
+    return lines, t_read, json.loads(''.join(map(str, lines)).replace("\n", "")[:-8])
+
+
+def current(session, string):
+    lines = session.protocol(string)
+    t_read = time.perf_counter()
+    return lines, t_read, parse_msq_response(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--pulses", nargs=3, type=int, default=[60, 2000, 60], help="pulses of the three phases")
+    parser.add_argument("--line-length", type=int, default=2048, help="characters per line of the answer")
+    parser.add_argument("--line-rate", type=float, help="lines per second of the emulator, unlimited if not given")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    string = protocol(args.pulses)
+    print(f"pulses {args.pulses}, line length {args.line_length}, "
+          f"line rate {args.line_rate or 'unlimited'}, best of {args.repeat}")
+    print(f"{'path':<10}{'kB':>8}{'lines':>7}{'read (ms)':>11}{'parse (ms)':>12}{'MB/s':>8}")
+    with MsQEmulator(line_length=args.line_length, line_rate=args.line_rate) as emulator:
+        session = MsQSession(emulator.port, timeout=2)
+        if session.command("hello") != "MultispeQ Ready":
+            raise SystemExit("no answer from the emulator")
+        for name, run in (("former", former), ("blocks", current)):
+            best = None
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                lines, t_read, answer = run(session, string)
+                t_parse = time.perf_counter()
+                if len(answer["sample"][0]["set"][1]["data_raw"]) != sum(args.pulses):
+                    raise SystemExit(f"{name}: incomplete answer")
+                if parse_msq_response(lines) != json.loads(''.join(lines).replace("\n", "")[:-8]):
+                    raise SystemExit(f"{name}: the two parsers differ")
+                if best is None or t_parse - t0 < best[1] + best[2]:
+                    best = (lines, t_read - t0, t_parse - t_read)
+            lines, read, parse = best
+            size = sum(len(line) + 2 for line in lines)  # CRLF
+            print(f"{name:<10}{size / 1e3:>8.1f}{len(lines):>7d}{1e3 * read:>11.2f}{1e3 * parse:>12.2f}"
+                  f"{size / (read + parse) / 1e6:>8.2f}")
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+PID update benchmark under CPython: calls per second of the firmware PID.
+
+Runs the device benchmark ("261018 bench_pid.py") with the MicroPython
+modules stubbed by hot_pid_sim: the float PID is checked against the former
+implementation (identical outputs), PIDFixed against it within a few PWM
+units, and the calls per second of the three are measured. On the device
+the same file is run with:
+
+    mpremote cp "../micropython/250115 PID.py" :PID.py + run "../micropython/261018 bench_pid.py"
+
+Run from this folder: python 261018_bench_pid_call.py [--repeat 5]
+"""
+
+import argparse
+import os
+import time
+
+from hot_pid_sim import FIRMWARE_DIR, VirtualClock, load_firmware, load_pid
+
+
+TICKS_PERIOD = 1 << 30
+
+
+def ticks_us():
+    """Real time for the timing, the controllers themselves are given a fixed dt."""
+    return int(time.perf_counter() * 1e6) % TICKS_PERIOD
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    clock = VirtualClock()
+    bench = load_firmware(clock, os.path.join(FIRMWARE_DIR, "261018 bench_pid.py"), "bench_pid",
+                          {"PID": load_pid(clock)})
+    for _ in range(args.repeat):
+        same, deviation = bench.run(ticks_us=ticks_us)
+        if not same:
+            raise SystemExit("PID outputs differ from the reference implementation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Derivative filter and anti-windup benchmark: settling time and PWM noise of
+the PID firmware with and without derivative_tau / tracking_time.
+
+The firmware PID drives the simulated heater of hot_pid_sim through a
+simulated TSic716 (quantization and Gaussian noise). For each gain set and
+option set, the settling time and overshoot of a small and of a saturating
+step are reported, and the PWM noise: standard deviation of the PWM change
+between two updates while holding the setpoint.
+
+Run from this folder: python 261018_bench_pid_filter.py [--noise 0.01] [--derivative-tau 5] [--tracking-time 1]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from hot_pid_sim import (FIRMWARE_DIR, HeaterPlant, TSicSensor, VirtualClock, load_firmware, load_pid, overshoot,
+                         settling_time, simulate)
+
+
+_firmware = load_firmware(VirtualClock(), os.path.join(FIRMWARE_DIR, "261018 autotune.py"), "autotune")
+GAIN_SETS = {
+    "firmware gains": _firmware.DEFAULT_GAINS,
+    # slower integral and stronger derivative, as given by the relay autotune
+    "PI, Ti 22 s": (-16000, -730, 0),
+    "PID, Ti 22 s, Td 14 s": (-16000, -730, -231000),
+}
+STEPS = [(25, 30), (22, 36)]  # the second one saturates the heater
+WARMUP = 600  # s at the initial setpoint before the step
+HOLD = 300  # s of the PWM noise measurement, at the end of the run
+
+
+def run(gains, options, start, end, sensor_kwargs, duration, band):
+    clock = VirtualClock()
+    PID = load_pid(clock).PID
+    pid = PID(*gains, setpoint=start, bumpless=True, **_firmware.PID_OPTIONS, **options)
+    trace = simulate(pid, HeaterPlant(T0=start), clock, WARMUP + duration, steps={WARMUP: end},
+                     sensor=TSicSensor(**sensor_kwargs))
+    held = trace["pwm"][trace["t"] >= trace["t"][-1] - HOLD]
+    return settling_time(trace, WARMUP, end, band), overshoot(trace, WARMUP, start, end), np.std(np.diff(held))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--noise", type=float, default=0.01, help="sensor noise, standard deviation (°C)")
+    parser.add_argument("--derivative-tau", type=float, default=5.0, help="derivative filter time constant (s)")
+    parser.add_argument("--tracking-time", type=float, default=1.0, help="anti-windup time constant (s)")
+    parser.add_argument("--band", type=float, default=0.2, help="settling band (°C)")
+    parser.add_argument("--duration", type=float, default=900, help="simulated time after the step (s)")
+    args = parser.parse_args()
+
+    cases = {
+        "clamped integral (former)": {},
+        f"derivative_tau {args.derivative_tau:g} s": {"derivative_tau": args.derivative_tau},
+        f"tracking_time {args.tracking_time:g} s": {"tracking_time": args.tracking_time},
+        "both": {"derivative_tau": args.derivative_tau, "tracking_time": args.tracking_time},
+    }
+    header = "".join(f"{f'{a}->{b} °C':>18}" for a, b in STEPS)
+    print(f"settling time (s) / overshoot (°C), band ±{args.band} °C; PWM noise at {STEPS[0][1]} °C, "
+          f"sensor noise {args.noise} °C")
+    for gain_name, gains in GAIN_SETS.items():
+        print(f"\n{gain_name} {gains}")
+        print(f"{'':<30}{header}{'PWM noise':>12}")
+        for name, options in cases.items():
+            cells, noise = [], None
+            for start, end in STEPS:
+                t, over, pwm_noise = run(gains, options, start, end, {"noise": args.noise}, args.duration, args.band)
+                cells.append(f"{t:>10.1f} / {over:<5.2f}")
+                noise = pwm_noise if noise is None else noise
+            print(f"{name:<30}{''.join(cells)}{noise:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
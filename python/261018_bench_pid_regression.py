@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Controller regression benchmark: the firmware PID, unmodified, on a
+first-order-plus-dead-time model of the heater fitted from our logs.
+
+The PID file (one or several versions, eg. extracted with git show) runs
+under CPython with utime stubbed by hot_pid_sim, reads the heater through a
+simulated TSic716 and goes through a setpoint sweep, starting settled at the
+first setpoint. The heater model is hot_schedule.ThermalModel: its defaults
+(the default plant of hot_pid_sim, shared with the other PID benchmarks and
+the emulator), given with --model, or fitted with its dead time on the "pid_log" of results
+files (--results, or the last runs of the catalogue with --catalog). For each
+step the settling time, overshoot and integrated absolute error (IAE) are
+reported, and the compute time of the PID call per step.
+
+--save writes the metrics to a JSON file; --baseline compares to such a file
+and exits with an error if a step settles slower, no longer settles,
+overshoots more or has a larger IAE than the baseline beyond the tolerances.
+A step that did not settle in the baseline either (on the default plant the
+default gains of the firmware keep oscillating by about 1 °C, its dead time
+is too long for their Kd) is compared on its IAE and overshoot. Run it before
+and after each change of "250115 PID.py":
+
+    python 261018_bench_pid_regression.py --save pid_baseline.json
+    (change the firmware)
+    python 261018_bench_pid_regression.py --baseline pid_baseline.json
+
+Run from this folder: python 261018_bench_pid_regression.py [--pid PID.py ...] [--results ../../../Data/*.json] [--baseline pid_baseline.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from hot_catalog import RunCatalog
+from hot_pid_sim import (FIRMWARE_DIR, PID_PATH, HeaterPlant, TSicSensor, VirtualClock, iae, load_firmware, load_pid,
+                         overshoot, settling_time, simulate)
+from hot_schedule import ThermalModel
+
+
+_firmware = load_firmware(VirtualClock(), os.path.join(FIRMWARE_DIR, "261018 autotune.py"), "autotune")
+SETPOINTS = [25, 30, 35, 28, 22, 40]  # sweep, from the first setpoint, settled
+WARMUP = 600  # s at the first setpoint before the sweep
+
+
+def parse_option(text):
+    """'key=value' of a PID option, value as JSON (eg. derivative_tau=5, bumpless=true)."""
+    key, value = text.split("=", 1)
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def change_setpoint(pid, setpoint):
+    # versions before set_setpoint: assign the attribute
+    if hasattr(pid, "set_setpoint"):
+        pid.set_setpoint(setpoint)
+    else:
+        pid.setpoint = setpoint
+    return pid
+
+
+def run(path, gains, options, model, setpoints, hold, period, noise, band):
+    """
+    Sweep of `setpoints` with the PID of `path`.
+
+    :return: Dict 'steps' (list of dicts 'from', 'to', 'settling', 'overshoot', 'iae') and
+        'compute_us' (dict 'mean', 'p99', 'max' of the PID call per step).
+    """
+    clock = VirtualClock()
+    PID = load_pid(clock, path).PID
+    pid = PID(*gains, setpoint=setpoints[0], **options)
+    steps = {WARMUP + i * hold: setpoint for i, setpoint in enumerate(setpoints[1:])}
+    trace = simulate(pid, HeaterPlant.from_model(model, T0=setpoints[0]), clock, WARMUP + hold * (len(setpoints) - 1),
+                     period, steps=steps, change=change_setpoint, sensor=TSicSensor(noise))
+    metrics = []
+    for (t, end), start in zip(steps.items(), setpoints):
+        window = {key: values[trace["t"] < t + hold] for key, values in trace.items()}
+        metrics.append({"from": start, "to": end, "settling": settling_time(window, t, end, band),
+                        "overshoot": overshoot(window, t, start, end), "iae": iae(trace, t, t + hold)})
+    compute = trace["compute"] * 1e6
+    return {"steps": metrics,
+            "compute_us": {"mean": float(compute.mean()), "p99": float(np.percentile(compute, 99)),
+                           "max": float(compute.max())}}
+
+
+def regressions(result, baseline, tolerance, overshoot_tolerance):
+    """
+    Lines describing the steps of `result` worse than in `baseline`.
+
+    A step settled in the baseline must settle, within the tolerance; the settling time of a step
+    that did not (settling inf) is not compared, its IAE and overshoot are.
+    """
+    lines = []
+    for new, old in zip(result["steps"], baseline["steps"]):
+        step = f"{new['from']:g}->{new['to']:g} °C"
+        if math.isinf(new["settling"]) and not math.isinf(old["settling"]):
+            lines.append(f"{step}: not settled (baseline {old['settling']:.1f})")
+        elif new["settling"] > old["settling"] * (1 + tolerance):
+            lines.append(f"{step}: settling {new['settling']:.1f} (baseline {old['settling']:.1f})")
+        if new["iae"] > old["iae"] * (1 + tolerance):
+            lines.append(f"{step}: iae {new['iae']:.1f} (baseline {old['iae']:.1f})")
+        if new["overshoot"] > old["overshoot"] + overshoot_tolerance:
+            lines.append(f"{step}: overshoot {new['overshoot']:.2f} °C (baseline {old['overshoot']:.2f} °C)")
+    return lines
+
+
+def print_result(name, result, baseline=None):
+    print(f"\n{name}")
+    print(f"{'step':<14}{'settling (s)':>14}{'overshoot (°C)':>16}{'IAE (°C.s)':>12}")
+    old_steps = baseline["steps"] if baseline else [None] * len(result["steps"])
+    for step, old in zip(result["steps"], old_steps):
+        label = f"{step['from']:g}->{step['to']:g} °C"
+        line = f"{label:<14}{step['settling']:>14.1f}{step['overshoot']:>16.2f}{step['iae']:>12.1f}"
+        if old:
+            line += f"    baseline {old['settling']:.1f} / {old['overshoot']:.2f} / {old['iae']:.1f}"
+        print(line)
+    compute = result["compute_us"]
+    line = f"compute per step: mean {compute['mean']:.1f} µs, p99 {compute['p99']:.1f} µs, max {compute['max']:.1f} µs"
+    if baseline:
+        line += f" (baseline mean {baseline['compute_us']['mean']:.1f} µs)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--pid", nargs="+", default=[PID_PATH], help="PID firmware file(s)")
+    parser.add_argument("--gains", nargs=3, type=float, default=_firmware.DEFAULT_GAINS, metavar=("KP", "KI", "KD"))
+    parser.add_argument("--option", action="append", type=parse_option, default=[], metavar="KEY=VALUE",
+                        help="PID option, in addition to the ones of the firmware (repeatable)")
+    parser.add_argument("--model", nargs=4, type=float, metavar=("TAU", "GAIN", "T_AMB", "DEAD_TIME"),
+                        help="heater model: time constant (s), heating rate at full power (°C/s), ambient (°C), "
+                             "dead time (s); ThermalModel defaults if neither this nor --results/--catalog")
+    parser.add_argument("--results", nargs="+", help="results files to fit the heater model on")
+    parser.add_argument("--catalog", help="catalogue of the runs, the model is fitted on the last --last ones")
+    parser.add_argument("--last", type=int, default=50)
+    parser.add_argument("--max-dead-time", type=float, default=60.0, help="range of the dead time fit (s)")
+    parser.add_argument("--setpoints", nargs="+", type=float, default=SETPOINTS)
+    parser.add_argument("--hold", type=float, default=900, help="simulated time per setpoint (s)")
+    parser.add_argument("--period", type=float, default=0.5, help="loop period of the firmware (s)")
+    parser.add_argument("--noise", type=float, default=0.01, help="sensor noise, standard deviation (°C)")
+    parser.add_argument("--band", type=float, default=0.2, help="settling band (°C)")
+    parser.add_argument("--save", help="JSON file to write the metrics to")
+    parser.add_argument("--baseline", help="JSON file written by --save to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="relative tolerance on settling time and IAE")
+    parser.add_argument("--overshoot-tolerance", type=float, default=0.05, help="°C")
+    args = parser.parse_args()
+
+    if args.model:
+        model = ThermalModel(*args.model)
+    elif args.results or args.catalog:
+        paths = args.results or RunCatalog(args.catalog).paths(last=args.last)
+        model = ThermalModel.from_results(paths, max_dead_time=args.max_dead_time)
+    else:
+        model = ThermalModel()
+    options = {**_firmware.PID_OPTIONS, **dict(args.option)}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    print(f"Heater: {model}; gains {tuple(args.gains)}, options {options}")
+    print(f"Sweep {args.setpoints} °C, {args.hold:g} s per setpoint, band ±{args.band} °C, "
+          f"sensor noise {args.noise} °C")
+    results, failed = {}, []
+    for path in args.pid:
+        name = os.path.basename(path)
+        results[name] = run(path, args.gains, options, model, args.setpoints, args.hold, args.period, args.noise,
+                            args.band)
+        # compare to the entry of the same file, or to the only one of the baseline
+        old = None
+        if baseline:
+            old = baseline.get(name) or (next(iter(baseline.values())) if len(baseline) == 1 else None)
+        print_result(name, results[name], old)
+        if old:
+            failed += [f"{name}: {line}" for line in
+                       regressions(results[name], old, args.tolerance, args.overshoot_tolerance)]
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"model": vars(model), "gains": list(args.gains), "options": options,
+                       "setpoints": args.setpoints, "hold": args.hold, "results": results}, f, indent=1)
+        print(f"\nMetrics saved to {args.save}")
+    if failed:
+        print("\nRegressions:\n" + "\n".join(failed))
+        sys.exit(1)
+    elif baseline:
+        print("\nNo regression")
+
+
+if __name__ == "__main__":
+    main()
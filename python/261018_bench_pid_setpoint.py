@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Setpoint change benchmark: settling time of the PID firmware after a step,
+with a new PID per setpoint (former firmware) or the same PID updated in place.
+
+The firmware PID runs on the default heater of hot_pid_sim, first held at
+the initial setpoint long enough to be settled, then given the new setpoint.
+Settling time (within --band of the setpoint), overshoot and integrated
+absolute error (IAE, over --duration) are reported for each step. The start
+from idle is measured too: the heater off at ambient, then a first setpoint,
+with a new PID (former firmware) or the PID of main.py switched to auto mode
+from the heater off (set_auto_mode(True, last_output=64_000)).
+
+Run from this folder: python 261018_bench_pid_setpoint.py [--ramp 0.1] [--tau 300] [--dead-time 10]
+"""
+
+import argparse
+import os
+
+from hot_pid_sim import (FIRMWARE_DIR, PWM_OFF, HeaterPlant, VirtualClock, iae, load_firmware, load_pid, overshoot,
+                         settling_time, simulate)
+
+
+# default gains and options of the firmware
+_firmware = load_firmware(VirtualClock(), os.path.join(FIRMWARE_DIR, "261018 autotune.py"), "autotune")
+GAINS = dict(zip(("Kp", "Ki", "Kd"), _firmware.DEFAULT_GAINS), **_firmware.PID_OPTIONS)
+STEPS = [(25, 30), (30, 25), (25, 26), (20, 35)]
+IDLE_SETPOINTS = [25, 30, 40]  # first setpoint, from the heater off at ambient
+WARMUP = 600  # s at the initial setpoint before the step
+
+
+def cases(ramp):
+    """name -> (PID options, recreate on setpoint change)"""
+    return {
+        "new PID per setpoint": ({}, True),
+        "set_setpoint": ({}, False),
+        "set_setpoint, bumpless": ({"bumpless": True}, False),
+        f"set_setpoint, ramp {ramp} °C/s": ({"setpoint_ramp": ramp}, False),
+        f"set_setpoint, bumpless, ramp {ramp} °C/s": ({"bumpless": True, "setpoint_ramp": ramp}, False),
+    }
+
+
+def idle_cases():
+    """name -> (PID options, new PID at the first setpoint)"""
+    return {
+        "new PID (integral at full power)": ({}, True),
+        "auto mode from the heater off": ({"bumpless": True}, False),
+    }
+
+
+def run(start, end, options, recreate, plant_kwargs, duration, band):
+    clock = VirtualClock()
+    PID = load_pid(clock).PID
+    pid = PID(setpoint=start, **GAINS, **options)
+    change = (lambda pid, setpoint: PID(setpoint=setpoint, **GAINS, **options)) if recreate else None
+    trace = simulate(pid, HeaterPlant(T0=start, **plant_kwargs), clock, WARMUP + duration, steps={WARMUP: end},
+                     change=change)
+    return (settling_time(trace, WARMUP, end, band), overshoot(trace, WARMUP, start, end),
+            iae(trace, WARMUP, WARMUP + duration))
+
+
+def run_idle(end, options, recreate, plant_kwargs, duration, band):
+    clock = VirtualClock()
+    PID = load_pid(clock).PID
+    if recreate:
+        pid = PID(setpoint=end, **GAINS, **options)
+    else:
+        # as main.py: created at boot in manual mode, in auto mode from the heater off at "setpoint_X"
+        pid = PID(setpoint=15, auto_mode=False, **GAINS, **options)
+        pid.set_auto_mode(True, last_output=PWM_OFF)
+        pid.set_setpoint(end)
+    plant = HeaterPlant(**plant_kwargs)  # at ambient, heater off
+    trace = simulate(pid, plant, clock, duration)
+    return settling_time(trace, 0, end, band), overshoot(trace, 0, plant.ambient, end), iae(trace, 0, duration)
+
+
+def print_table(title, columns, rows):
+    print(f"\n{title}")
+    print(f"{'':<42}" + "".join(f"{column:>26}" for column in columns))
+    for name, cells in rows:
+        print(f"{name:<42}" + "".join(f"{t:>10.1f} / {over:>4.2f} / {error:>6.0f}" for t, over, error in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--ramp", type=float, default=0.1, help="setpoint ramp of the ramp cases (°C/s)")
+    parser.add_argument("--band", type=float, default=0.2, help="settling band (°C)")
+    parser.add_argument("--duration", type=float, default=900, help="simulated time after the step (s)")
+    parser.add_argument("--ambient", type=float, help="°C, the heater of hot_pid_sim is the default for all four")
+    parser.add_argument("--gain", type=float, help="temperature rise at full power (°C)")
+    parser.add_argument("--tau", type=float, help="time constant of the heater (s)")
+    parser.add_argument("--dead-time", type=float, help="dead time of the heater (s)")
+    args = parser.parse_args()
+    plant = {key: value for key, value in (("ambient", args.ambient), ("gain", args.gain), ("tau", args.tau),
+                                           ("dead_time", args.dead_time)) if value is not None}
+
+    heater = HeaterPlant(**plant)
+    print(f"Heater: ambient {heater.ambient:g} °C, rise {heater.gain:g} °C, tau {heater.tau:g} s, "
+          f"dead time {heater.dead_time:g} s; settling time (s) / overshoot (°C) / IAE (°C.s), band ±{args.band} °C")
+    rows = [(name, [run(start, end, options, recreate, plant, args.duration, args.band) for start, end in STEPS])
+            for name, (options, recreate) in cases(args.ramp).items()]
+    print_table("Setpoint change, from settled", [f"{a}->{b} °C" for a, b in STEPS], rows)
+    rows = [(name, [run_idle(end, options, recreate, plant, args.duration, args.band) for end in IDLE_SETPOINTS])
+            for name, (options, recreate) in idle_cases().items()]
+    print_table("Start from idle", [f"off->{end} °C" for end in IDLE_SETPOINTS], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Startup benchmark: import time and memory of the modules a script loads
+before it can talk to the devices.
+
+Each case is imported in a fresh interpreter, several times; the median wall
+time of the imports and the peak RSS of the interpreter are reported. Cases
+with a missing module are reported as such.
+
+Run from this folder: python 261018_bench_startup.py [--repeat 5]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+CASES = {
+    # imports at the top of the PC scripts before the serial layer was split out
+    "former script header": [
+        "numpy", "json", "glob", "matplotlib.pyplot", "scipy.optimize", "scipy.stats", "datetime", "re",
+        "pandas", "seaborn", "scipy.ndimage", "time", "matplotlib.pylab", "matplotlib.gridspec",
+        "matplotlib.patches", "matplotlib.lines", "os", "webbrowser", "serial", "sys", "itertools", "tqdm",
+    ],
+    "Ambit script header": [
+        "numpy", "json", "datetime", "re", "os", "glob", "serial", "sys", "time", "itertools", "asyncio",
+        "hot_serial", "hot_acquisition", "hot_ambit", "hot_schedule", "hot_storage", "hot_catalog",
+    ],
+    "MsQ script header": [
+        "json", "datetime", "re", "os", "glob", "serial", "sys", "time", "itertools", "hot_serial", "hot_storage",
+        "hot_catalog",
+    ],
+    "hot_serial": ["hot_serial"],
+}
+
+CHILD = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+try:
+    for name in sys.argv[1:]:
+        importlib.import_module(name)
+except ImportError as e:
+    print(json.dumps({"missing": str(e)}))
+    sys.exit()
+elapsed = time.perf_counter() - t0
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 ** 2)
+except ImportError:  # Windows
+    rss = None
+heavy = sorted(m for m in ("numpy", "scipy", "pandas", "matplotlib", "seaborn", "tqdm") if m in sys.modules)
+print(json.dumps({"time": elapsed, "rss": rss, "heavy": heavy}))
+"""
+
+
+def measure(modules, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", CHILD, *modules], capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if "missing" in result:
+            return result
+        runs.append(result)
+    return {
+        "time": statistics.median(r["time"] for r in runs),
+        "rss": max((r["rss"] for r in runs if r["rss"] is not None), default=None),
+        "heavy": runs[0]["heavy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<22} {'import (ms)':>12} {'peak RSS (MB)':>14}  scientific modules loaded")
+    for case, modules in CASES.items():
+        result = measure(modules, args.repeat)
+        if "missing" in result:
+            print(f"{case:<22} {'-':>12} {'-':>14}  not measured: {result['missing']}")
+            continue
+        rss = f"{result['rss']:.0f}" if result["rss"] is not None else "n/a"
+        print(f"{case:<22} {1e3 * result['time']:>12.0f} {rss:>14}  {', '.join(result['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+asyncio orchestration of a setpoint sweep.
+
+PID telemetry, the measurement, saving and plotting run as independent tasks:
+the blocking serial calls run in worker threads (one lock per device), so the
+PID is still logged while the Ambit/MultispeQ measures, and saving/plotting of
+one setpoint overlaps with heating to the next one. The wait before measuring is
+fixed, or adaptive with hot_stabilization.StabilizationDetector.
+"""
+
+import asyncio
+import time
+from collections import namedtuple
+
+from hot_stabilization import StabilizationDetector
+
+
+Reading = namedtuple("Reading", ["time", "setpoint", "measured", "pwm"])
+
+
+class Telemetry:
+    """Log of the PID readings, with waiting on a condition of the latest one."""
+
+    def __init__(self):
+        self.readings = []
+        self._changed = asyncio.Condition()
+
+    @property
+    def latest(self):
+        return self.readings[-1] if self.readings else None
+
+    async def append(self, reading: Reading):
+        async with self._changed:
+            self.readings.append(reading)
+            self._changed.notify_all()
+
+    async def wait_until(self, predicate) -> Reading:
+        """Wait for a reading for which predicate(reading) is True and return it."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.latest is not None and predicate(self.latest))
+            return self.latest
+
+    def since(self, t0: float) -> dict:
+        """Readings taken after time t0, as a dict of lists (time relative to t0)."""
+        log = {"t": [], "setpoint": [], "measured": [], "pwm": []}
+        for r in self.readings:
+            if r.time >= t0:
+                log["t"].append(round(r.time - t0, 3))
+                log["setpoint"].append(r.setpoint)
+                log["measured"].append(r.measured)
+                log["pwm"].append(r.pwm)
+        return log
+
+
+class SweepOrchestrator:
+    """
+    Run a list of setpoints: set, wait until reached, stabilize, measure.
+
+    measure, save and plot are plain (blocking) callables:
+        - measure(reading) -> dict, called in a worker thread once the setpoint is stable.
+        - save(results), called in a worker thread, in order.
+        - plot(results), called in the event loop thread (GUI backends need it),
+          it should not block (eg. plt.show(block=False)).
+    """
+
+    def __init__(self, pid, measure, save=None, plot=None, stabilize: float = 60,
+                 tolerance: float = 0.5, poll: float = 0.5, verbose: bool = True, stabilization: dict = None):
+        """
+        :param pid: Open hot_serial.PIDSession.
+        :param measure: Callable doing the measurement, returns a results dict.
+        :param save: Callable saving a results dict, or None.
+        :param plot: Callable plotting a results dict, or None.
+        :param stabilize: Wait time after reaching the setpoint, seconds (fixed mode).
+        :param tolerance: Max |measured - setpoint| to consider the setpoint reached, degrees (fixed mode).
+        :param poll: Period of the PID telemetry, seconds.
+        :param verbose: Print every PID reading.
+        :param stabilization: Options of hot_stabilization.StabilizationDetector. When given,
+            the measurement starts as soon as the detector declares the temperature stable,
+            instead of after reaching the setpoint plus a fixed `stabilize` wait.
+        """
+        self.pid = pid
+        self.measure = measure
+        self.save = save
+        self.plot = plot
+        self.stabilize = stabilize
+        self.tolerance = tolerance
+        self.poll = poll
+        self.verbose = verbose
+        self.stabilization = stabilization
+        self.telemetry = None
+        self.timings = []  # one dict of durations per setpoint
+
+    async def run(self, setpoints) -> list:
+        """Run the sweep and return the list of results dicts."""
+        self.telemetry = Telemetry()
+        self._pid_lock = asyncio.Lock()
+        save_queue, plot_queue = asyncio.Queue(), asyncio.Queue()
+
+        tasks = [asyncio.create_task(self._telemetry_loop())]
+        if self.save is not None:
+            tasks.append(asyncio.create_task(self._worker(save_queue, self.save, thread=True)))
+        if self.plot is not None:
+            tasks.append(asyncio.create_task(self._worker(plot_queue, self.plot, thread=False)))
+
+        all_results = []
+        try:
+            for value in setpoints:
+                results = await self._step(value)
+                all_results.append(results)
+                if self.save is not None:
+                    save_queue.put_nowait(results)
+                if self.plot is not None:
+                    plot_queue.put_nowait(results)
+            await save_queue.join()
+            await plot_queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return all_results
+
+    async def pid_call(self, func, *args):
+        """Run a blocking PIDSession method in a thread, one at a time."""
+        async with self._pid_lock:
+            return await asyncio.to_thread(func, *args)
+
+    async def _telemetry_loop(self):
+        while True:
+            reading = await self.pid_call(self.pid.query)
+            if reading is not None:
+                reading = Reading(time.time(), *reading)
+                await self.telemetry.append(reading)
+                if self.verbose:
+                    print(f"READING => Setpoint: {reading.setpoint}, Measured: {reading.measured}, PWM: {reading.pwm}")
+            else:
+                print("UNPARSABLE or empty query response")
+            await asyncio.sleep(self.poll)
+
+    async def _worker(self, queue: asyncio.Queue, func, thread: bool):
+        while True:
+            item = await queue.get()
+            try:
+                if thread:
+                    await asyncio.to_thread(func, item)
+                else:
+                    func(item)
+            except Exception as e:  # a failed save/plot must not stop the sweep
+                print(f"{getattr(func, '__name__', func)} failed: {e!r}")
+            finally:
+                queue.task_done()
+
+    def reached(self, value):
+        """Predicate: the reading is for setpoint `value` and within tolerance."""
+        def predicate(r):
+            return abs(r.setpoint - value) < 1e-6 and abs(r.measured - r.setpoint) < self.tolerance
+        return predicate
+
+    async def _step(self, value) -> dict:
+        t_start = time.time()
+        print(f"Setting setpoint to {value}")
+        msg = await self.pid_call(self.pid.setpoint, value)
+        print(f"Initial response: {msg}")
+
+        if self.stabilization is None:
+            reading = await self.telemetry.wait_until(self.reached(value))
+            t_reached = time.time()
+            print("Setpoint reached, stabilizing.")
+            await asyncio.sleep(self.stabilize)
+            t_settling = time.time() - t_start
+            stabilization = {"mode": "fixed", "stabilize": self.stabilize, "tolerance": self.tolerance}
+        else:
+            detector = StabilizationDetector(value, **self.stabilization)
+            detector.reset(t_start=t_start)
+
+            def settled(r):
+                return r.time >= t_start and abs(r.setpoint - value) < 1e-6 and detector.update(r.time, r.measured)
+
+            reading = await self.telemetry.wait_until(settled)
+            t_reached = time.time()
+            t_settling = detector.settling_time
+            stabilization = {"mode": "adaptive", "timed_out": detector.timed_out, **self.stabilization}
+            if detector.timed_out:
+                print(f"Stabilization criteria not met after {t_settling:.0f} s, proceeding anyway.")
+        print("Temperature is stable. READY to proceed.")
+
+        t_measure = time.time()
+        results = await asyncio.to_thread(self.measure, self.telemetry.latest or reading)
+        t_end = time.time()
+
+        results["pid_log"] = self.telemetry.since(t_start)  # telemetry kept running during the measurement
+        results["t_settling"] = round(t_settling, 3)
+        results["stabilization"] = stabilization
+        timing = {
+            "setpoint": value,
+            "t_reach": round(t_reached - t_start, 3),
+            "t_settling": round(t_settling, 3),
+            "t_measure": round(t_end - t_measure, 3),
+            "t_total": round(t_end - t_start, 3),
+        }
+        self.timings.append(timing)
+        results["timings"] = timing
+        print(f"Setpoint {value}: settled in {timing['t_settling']} s, measured in {timing['t_measure']} s")
+        return results
+
+
+def run_sweep(setpoints, pid, measure, **kwargs) -> list:
+    """Blocking helper: build a SweepOrchestrator and run it with asyncio.run()."""
+    return asyncio.run(SweepOrchestrator(pid, measure, **kwargs).run(setpoints))
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Parsing of the Ambit serial output.
+
+parse_command_blocks() / parse_arrun1() work on the complete list of lines.
+Arrun1Parser consumes the lines one by one as they are read from the port
+and converts them in batches with NumPy into preallocated typed columns.
+
+compile_protocol() builds the arrun1 command string and the expected
+measurement timeline from (num, freq, actinic) segments.
+"""
+
+import re
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+
+def parse_command_blocks(lines, cmd_prefix="cmd:"):
+    """
+    Parse a list of lines and group them by commands that match `cmd_prefix`.
+
+    The function identifies lines containing commands (e.g., 'cmd: something')
+    and collects all subsequent lines into that command's "block" until the
+    next command (or end of list).
+
+    :param lines: List of strings to parse.
+    :param cmd_prefix: The prefix that indicates a new command. Defaults to 'cmd:'.
+    :return: A dictionary mapping { command_name: [list_of_lines_until_next_command] }
+             If the same command appears multiple times, each occurrence will
+             overwrite previous data unless modified to handle duplicates.
+    """
+    command_dict = {}
+    current_cmd = None
+    current_data = []
+
+    for line in lines:
+        # Try to find a line that includes 'cmd:' (possibly with extra characters).
+        # The regex captures whatever follows 'cmd:' up to the first whitespace 
+        # or end of string. E.g., 'cmd: hello' => group(1) = 'hello'.
+        match = re.search(r'cmd:\s*([^\s]+)', line)
+
+        if match:
+            # If we have a "current_cmd", store its accumulated data first
+            if current_cmd is not None:
+                command_dict[current_cmd] = current_data
+
+            # Extract the new command from the current line
+            current_cmd = match.group(1)
+            current_data = []  # Start a fresh list for data following this command
+        else:
+            # If this line does not declare a new command, and we've already seen a command,
+            # then add the line to the current command's block
+            if current_cmd is not None:
+                current_data.append(line)
+
+    # At the end, if there is a command in progress, save its data
+    if current_cmd is not None:
+        command_dict[current_cmd] = current_data
+
+    return command_dict
+
+
+def parse_arrun1(command_dict):
+    """
+    From a parsed dictionary (use parse_command_block() ), locate the block after 'cmd: arrun1'
+    and extract numeric values of T, F, S, R, Sun, and L for each
+    matching line, returning them in a dictionary of lists.
+
+    Example return structure:
+    {
+      'T':   [31.0, 31.0, 31.0],
+      'F':   [0.0759, 0.0748, 0.0762],
+      'S':   [506, 499, 509],
+      'R':   [6667, 6669, 6678],
+      'Sun': [380, 382, 380],
+      'L':   [484, 486, 487]
+    }
+
+    :param lines: A list of text lines (e.g., from a serial device).
+    :return: A dict of lists, one list per key: 'T', 'F', 'S', 'R', 'Sun', 'L'.
+             If 'cmd: arrun1' or matching lines are not found, returns
+             empty lists for each key.
+    """
+    # 1) Extract lines that belong to "arrun1"
+    arrun1_lines = command_dict.get("arrun1", [])
+
+    # 2) Prepare a regex to capture the six fields of interest
+    pattern = re.compile(
+        r"T:([^,]+),F:([^,]+),S:([^,]+),R:([^,]+),Sun:([^,]+),L:([^,]+)"
+    )
+
+    # 4) Initialize an output dict with empty lists for each key
+    result = {"T": [],"F": [],"S": [],"R": [],"Sun": [],"L": [] }
+
+    for line in arrun1_lines:
+        match = pattern.search(line)
+        if match:
+            # Convert T, F to float and S, R, Sun, L to int
+            try:
+                t_val = float(match.group(1))
+                f_val = float(match.group(2))
+                s_val = int(match.group(3))
+                r_val = int(match.group(4))
+                sun_val = int(match.group(5))
+                l_val = int(match.group(6))
+
+                # Append to the lists
+                result["T"].append(t_val)
+                result["F"].append(f_val)
+                result["S"].append(s_val)
+                result["R"].append(r_val)
+                result["Sun"].append(sun_val)
+                result["L"].append(l_val)
+            except ValueError:
+                # If conversion fails (malformed line), ignore or handle it
+                print(f"PARSING ERROR parse_arrun1_dict, {match}")
+                pass
+
+    return result
+
+
+ARRUN1_FIELDS = ("T", "F", "S", "R", "Sun", "L")
+ARRUN1_DTYPES = (np.float64, np.float64, np.int32, np.int32, np.int32, np.int32)
+ARRUN1_PATTERN = re.compile(r"T:([^,]+),F:([^,]+),S:([^,]+),R:([^,]+),Sun:([^,]+),L:([^,]+)")
+CMD_PATTERN = re.compile(r'cmd:\s*([^\s]+)')
+# Deleting the keys leaves 'value,value,...' that np.fromstring converts in one call
+_STRIP_KEYS = str.maketrans("", "", "TFSRunL:")
+# Deleting the numbers leaves the keys, the same on every well-formed line
+_STRIP_VALUES = str.maketrans("", "", "0123456789.-+eE")
+_ARRUN1_KEYS = "T:,F:,S:,R:,Sun:,L:"
+
+
+class Arrun1Parser:
+    """
+    Streaming parser of the 'T:..,F:..,S:..,R:..,Sun:..,L:..' lines of an arrun1 block.
+
+    Lines are fed as they arrive (feed(), eg. as the on_line callback of
+    AmbitSession.run), buffered, and converted every `batch` lines into
+    preallocated NumPy columns. Lines that can not be parsed are reported
+    in `errors` as (line index, line) instead of being printed.
+
+    Usage:
+        parser = Arrun1Parser(capacity=len(timeline))
+        for line in lines:
+            parser.feed(line)
+        data = parser.result()   # {'T': array, 'F': array, ...}
+    """
+
+    def __init__(self, capacity: int = 2048, block: str = "arrun1", batch: int = 256):
+        """
+        :param capacity: Initial number of rows of the columns (grown if needed).
+        :param block: Only lines after 'cmd: <block>' (until the next 'cmd:') are parsed,
+            None to parse every line.
+        :param batch: Number of lines converted at once.
+        """
+        self.block = block
+        self.batch = batch
+        self._cols = [np.empty(capacity, dtype=dtype) for dtype in ARRUN1_DTYPES]
+        self.n = 0            # number of rows parsed
+        self.index = 0        # index of the next line fed
+        self.errors = []      # [(line index, line)] of the unparsable lines of the block
+        self._active = block is None
+        self._pending = []
+        self._pending_start = 0
+
+    def feed(self, line: str):
+        """Consume one line."""
+        if "cmd:" in line:
+            self._flush()
+            match = CMD_PATTERN.search(line)
+            self._active = self.block is None or (match is not None and match.group(1) == self.block)
+        elif self._active and line:
+            if not self._pending:
+                self._pending_start = self.index
+            self._pending.append(line)
+            if len(self._pending) >= self.batch:
+                self._flush()
+        self.index += 1
+
+    def feed_lines(self, lines):
+        for line in lines:
+            self.feed(line)
+        return self
+
+    def _flush(self):
+        lines = self._pending
+        if not lines:
+            return
+        self._pending = []
+        text = ",".join(lines)
+        values = None
+        # every line has the six keys, in order, and nothing else
+        if text.translate(_STRIP_VALUES) == ",".join([_ARRUN1_KEYS] * len(lines)):
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("error")  # np.fromstring only warns on unparsable text
+                    values = np.fromstring(text.translate(_STRIP_KEYS), sep=",")
+            except (ValueError, DeprecationWarning):
+                values = None
+        if values is not None and values.size == 6 * len(lines):
+            values = values.reshape(-1, 6)
+            # S, R, Sun and L must be integers, as int() requires line by line
+            if np.array_equal(values[:, 2:], values[:, 2:].astype(np.int32)):
+                self._store(values)
+                return
+        # Slow path, only for a batch with a malformed line: one line at a time
+        rows = []
+        for i, line in enumerate(lines):
+            row = _parse_arrun1_line(line)
+            if row is None:
+                self.errors.append((self._pending_start + i, line))
+            else:
+                rows.append(row)
+        if rows:
+            self._store(np.array(rows, dtype=np.float64))
+
+    def _store(self, values: np.ndarray):
+        n, m = self.n, values.shape[0]
+        if n + m > self._cols[0].size:
+            size = max(2 * self._cols[0].size, n + m)
+            self._cols = [np.resize(col, size) for col in self._cols]
+        for col, j in zip(self._cols, range(6)):
+            col[n:n + m] = values[:, j]
+        self.n = n + m
+
+    def result(self) -> dict:
+        """Flush the buffered lines and return {field: array} of the rows parsed so far."""
+        self._flush()
+        return {key: col[:self.n] for key, col in zip(ARRUN1_FIELDS, self._cols)}
+
+
+def _parse_arrun1_line(line: str):
+    match = ARRUN1_PATTERN.search(line)
+    if match is None:
+        return None
+    try:
+        t_val, f_val = float(match.group(1)), float(match.group(2))
+        return [t_val, f_val] + [int(g) for g in match.groups()[2:]]
+    except ValueError:
+        return None
+
+
+def parse_arrun1_stream(lines, capacity: int = 2048):
+    """
+    Same result as parse_arrun1(parse_command_blocks(lines)) but as typed NumPy
+    arrays, with the unparsable lines returned instead of printed.
+
+    :return: Tuple (data dict of arrays, errors list of (line index, line)).
+    """
+    parser = Arrun1Parser(capacity=capacity).feed_lines(lines)
+    return parser.result(), parser.errors
+
+
+# Ranges of the arrun1 segment parameters (num and freq are sent as two bytes)
+NUM_RANGE = (10, 2_000)
+FREQ_RANGE = (1, 200)
+ACTINIC_RANGE = (0, 255)
+TIME_SCALE = 0.854  # measured duration of one period of the arrun1 timeline
+CMD_LINE_SIZE = 8
+
+Protocol = namedtuple("Protocol", ["cmd_str", "timeline", "actinic", "segments"])
+Protocol.__doc__ = """
+Compiled arrun1 protocol.
+
+cmd_str  : command string to send to the Ambit
+timeline : float64 array, time of each measurement point (scaled by TIME_SCALE)
+actinic  : uint8 array, actinic setting of each measurement point
+segments : int32 array (N, 3) of the (num, freq, actinic) segments
+"""
+
+
+def _check_segments(segments: np.ndarray):
+    for j, (name, (low, high)) in enumerate(zip(("num", "freq", "actinic"), (NUM_RANGE, FREQ_RANGE, ACTINIC_RANGE))):
+        bad = (segments[:, j] < low) | (segments[:, j] > high)
+        if np.any(bad):
+            i = int(np.argmax(bad))
+            raise ValueError(f"segment {i}: {name}={segments[i, j]} out of range [{low}, {high}]")
+
+
+def gen_cmd_arr_line(num: int, freq: int, actinic: int) -> list:
+    """
+    Generate a single command-array entry of 8 parameters.
+        
+    :param num: Total number of measurement points (10-2_000).
+    :param freq: Frequency measurement points (1-200).
+    :param actinic: Actinic light setting (0-255).
+    :return: List of 8 integer values representing the command.
+    :raises ValueError: If a parameter is out of range.
+    """
+    _check_segments(np.array([[num, freq, actinic]]))
+    return [
+        2,              # Fixed flag or identifier
+        0,              # Another fixed flag or placeholder
+        num // 256,     # High byte of 'num'
+        num % 256,      # Low byte of 'num'
+        freq // 256,    # High byte of 'freq'
+        freq % 256,     # Low byte of 'freq'
+        actinic,        # Actinic light parameter
+        1               # Fixed flag or terminator
+    ]
+
+
+def compile_protocol(segments, persist: bool = False) -> Protocol:
+    """
+    Compile arrun1 segments into the command string and the expected timeline.
+
+    Each segment measures `num` points at `freq`; a segment starts at the time of
+    the last point of the previous one. The timeline is built without a Python
+    loop: per point offsets are the cumulative durations of the previous segments,
+    repeated `num` times.
+
+    :param segments: Sequence of (num, freq, actinic), or an (N, 3) integer array.
+    :param persist: A flag indicating whether the command persists after completion.
+    :return: Protocol(cmd_str, timeline, actinic, segments).
+    :raises ValueError: If a parameter is out of range.
+    """
+    segments = np.asarray(segments, dtype=np.int32).reshape(-1, 3)
+    _check_segments(segments)
+    num, freq, actinic = segments.T
+
+    cmd = np.empty((segments.shape[0], CMD_LINE_SIZE), dtype=np.int32)
+    cmd[:, 0], cmd[:, 1], cmd[:, 7] = 2, 0, 1
+    cmd[:, 2], cmd[:, 3] = np.divmod(num, 256)
+    cmd[:, 4], cmd[:, 5] = np.divmod(freq, 256)
+    cmd[:, 6] = actinic
+    cmd_str = f"arrun1,{segments.shape[0]},{persist},{','.join(map(str, cmd.ravel().tolist()))},\n"
+
+    period = 1 / freq
+    # start of each segment: time of the last point of the previous one
+    start = np.concatenate([[0.0], np.cumsum((num[:-1] - 1) * period[:-1])])
+    first = np.concatenate([[0], np.cumsum(num[:-1])])
+    index = np.arange(num.sum()) - np.repeat(first, num)  # point index within its segment
+    timeline = (index * np.repeat(period, num) + np.repeat(start, num)) * TIME_SCALE
+    return Protocol(cmd_str, timeline, np.repeat(actinic, num).astype(np.uint8), segments)
+
+
+def calc_arr_param(cmd: list, persist: bool = False):
+    """
+    Reshape a flat command list (of gen_cmd_arr_line() entries) into segments and compile them.
+
+    :param cmd: A 1D list of length 8*N (multiple commands concatenated).
+    :param persist: A flag indicating whether the command persists after completion.
+    :return: Tuple (cmd_str, mea_tml, mea_act)
+        - cmd_str: Formatted command string (e.g., for sending over serial).
+        - mea_tml: float64 array of timestamps (scaled by 0.854).
+        - mea_act: uint8 array of actinic values (one per timestamp).
+    """
+    cmd_arr = np.reshape(cmd, (-1, CMD_LINE_SIZE))
+    segments = np.column_stack([
+        cmd_arr[:, 2] * 256 + cmd_arr[:, 3],    # Number of points (high/low bytes)
+        cmd_arr[:, 4] * 256 + cmd_arr[:, 5],    # Frequency (high/low bytes)
+        cmd_arr[:, 6],                          # Actinic setting
+    ])
+    protocol = compile_protocol(segments, persist)
+    return protocol.cmd_str, protocol.timeline, protocol.actinic
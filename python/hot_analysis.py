@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Batch analysis of the fluorescence traces of many runs.
+
+The results files of any number of date folders (YYMMDD) are decoded in a
+process pool, their traces ("data_raw" of the MultispeQ by default) stacked
+in one 2D array (padded with NaN), and the fluorescence parameters computed
+for all the traces at once:
+
+    fo = mean(trace[fo window]),  fm = mean(trace[fm window]),
+    fv = fm - fo,                 fvfm = fv / fm
+
+The result is one table, one row per run. From the command line:
+
+    python hot_analysis.py ../../../Data/multispeq --from 250101 --fo 0 20 --fm 1500 1520 -o fvfm.csv
+"""
+
+import csv
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+import numpy as np
+
+
+TRACE = "sample/0/set/0/data_raw"
+WINDOWS = {"fo": (0, 20), "fm": (1500, 1520)}
+PATTERNS = ("*_HOT_setpoint*", "*_Ambit*")
+EXTENSIONS = (".npz", ".h5", ".parquet", ".json")  # preferred first when a run has several files
+DATE_DIR = re.compile(r"\d{6}")
+SETPOINT_PATTERN = re.compile(r"_setpoint([0-9]+(?:\.[0-9]+)?)")
+COLUMNS = ["path", "date", "setpoint", "n_points", "fo", "fm", "fv", "fvfm"]
+
+
+def find_files(root: str, date_from: str = None, date_to: str = None, patterns=PATTERNS) -> list:
+    """
+    Results files of the date folders of `root`.
+
+    :param root: Folder of the date folders (YYMMDD), eg. "../../../Data/multispeq".
+    :param date_from: First date folder included, "YYMMDD".
+    :param date_to: Last date folder included, "YYMMDD".
+    :param patterns: File name patterns, without extension.
+    :return: Sorted paths, one file per run (columnar formats preferred to JSON).
+    """
+    runs = {}
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir() or not DATE_DIR.fullmatch(entry.name):
+            continue
+        if (date_from and entry.name < date_from) or (date_to and entry.name > date_to):
+            continue
+        for pattern in patterns:
+            for path in glob(os.path.join(entry.path, pattern)):
+                stem, ext = os.path.splitext(path)
+                if ext not in EXTENSIONS:
+                    continue
+                if stem not in runs or EXTENSIONS.index(ext) < EXTENSIONS.index(os.path.splitext(runs[stem])[1]):
+                    runs[stem] = path
+    return sorted(runs.values())
+
+
+def _get(data, trace: str):
+    for key in trace.split("/"):
+        data = data[int(key)] if isinstance(data, list) else data[key]
+    return data
+
+
+def load_trace(path: str, trace: str = TRACE):
+    """
+    Decode one results file (run in the worker processes).
+
+    :return: Tuple (info dict with "path", "date", "setpoint", trace as a float64 array or None).
+    """
+    from hot_storage import load_run
+
+    name = os.path.basename(path)
+    info = {"path": path, "date": os.path.basename(os.path.dirname(path)), "setpoint": np.nan}
+    try:
+        data = load_run(path)
+        values = np.asarray(_get(data, trace), dtype=np.float64).ravel()
+    except (KeyError, IndexError, TypeError, ValueError, OSError) as e:
+        print(f"{path}: no trace {trace!r} ({e!r})")
+        return info, None
+    if isinstance(data, dict) and isinstance(data.get("t_setpoint"), (int, float)):
+        info["setpoint"] = float(data["t_setpoint"])
+    elif SETPOINT_PATTERN.search(name):
+        info["setpoint"] = float(SETPOINT_PATTERN.search(name).group(1))
+    return info, values
+
+
+def load_traces(paths, trace: str = TRACE, workers: int = None):
+    """
+    Decode the files in a process pool and stack their traces.
+
+    :param workers: Number of processes, os.cpu_count() if None, 1 to decode in this process.
+    :return: Tuple (infos, traces): list of info dicts, 2D float64 array (runs x points)
+        padded with NaN. Files without the trace are left out.
+    """
+    paths = list(paths)
+    if workers == 1 or len(paths) < 2:
+        decoded = [load_trace(path, trace) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+            decoded = list(pool.map(load_trace, paths, [trace] * len(paths), chunksize=chunksize))
+    decoded = [(info, values) for info, values in decoded if values is not None]
+    traces = np.full((len(decoded), max((v.size for _, v in decoded), default=0)), np.nan)
+    for row, (_, values) in zip(traces, decoded):
+        row[:values.size] = values
+    return [info for info, _ in decoded], traces
+
+
+def fluorescence_params(traces: np.ndarray, fo=WINDOWS["fo"], fm=WINDOWS["fm"]) -> dict:
+    """
+    Fluorescence parameters of every trace at once.
+
+    :param traces: 2D array, one trace per row (NaN padded).
+    :param fo: (start, stop) indices of the Fo window.
+    :param fm: (start, stop) indices of the Fm window.
+    :return: Dict of arrays 'fo', 'fm', 'fv', 'fvfm' (NaN for traces shorter than a window).
+    """
+    traces = np.atleast_2d(traces)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # mean of the window, NaN if any point of it is missing
+        f_o = traces[:, fo[0]:fo[1]].mean(axis=1) if traces.shape[1] >= fo[1] else np.full(traces.shape[0], np.nan)
+        f_m = traces[:, fm[0]:fm[1]].mean(axis=1) if traces.shape[1] >= fm[1] else np.full(traces.shape[0], np.nan)
+        f_v = f_m - f_o
+        return {"fo": f_o, "fm": f_m, "fv": f_v, "fvfm": f_v / f_m}
+
+
+def analyse(paths, trace: str = TRACE, fo=WINDOWS["fo"], fm=WINDOWS["fm"], workers: int = None) -> dict:
+    """
+    Table of the fluorescence parameters of the runs.
+
+    :return: Dict column -> array (see COLUMNS), one row per run; pandas.DataFrame(table) for a DataFrame.
+    """
+    infos, traces = load_traces(paths, trace, workers)
+    table = {
+        "path": np.array([info["path"] for info in infos], dtype=object),
+        "date": np.array([info["date"] for info in infos], dtype=object),
+        "setpoint": np.array([info["setpoint"] for info in infos], dtype=np.float64),
+        "n_points": np.count_nonzero(~np.isnan(traces), axis=1),
+    }
+    table.update(fluorescence_params(traces, fo, fm))
+    return table
+
+
+def write_csv(table: dict, path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(table[key] for key in COLUMNS)))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Fo, Fm, Fv/Fm of all the runs of the date folders of ROOT.")
+    parser.add_argument("root")
+    parser.add_argument("--from", dest="date_from", help="first date folder, YYMMDD")
+    parser.add_argument("--to", dest="date_to", help="last date folder, YYMMDD")
+    parser.add_argument("--trace", default=TRACE, help=f"path of the trace in the results (default {TRACE})")
+    parser.add_argument("--fo", type=int, nargs=2, default=WINDOWS["fo"], metavar=("START", "STOP"))
+    parser.add_argument("--fm", type=int, nargs=2, default=WINDOWS["fm"], metavar=("START", "STOP"))
+    parser.add_argument("--workers", type=int, default=None, help="decoding processes (default: all cores)")
+    parser.add_argument("-o", "--output", default="fluorescence.csv")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    files = find_files(args.root, args.date_from, args.date_to)
+    table = analyse(files, args.trace, args.fo, args.fm, args.workers)
+    write_csv(table, args.output)
+    print(f"{table['path'].size} runs of {len(files)} files in {time.perf_counter() - t0:.1f} s -> {args.output}")
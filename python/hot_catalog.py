@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Catalogue of the measurement runs, in SQLite.
+
+One row is appended per saved run (date, sample, setpoint, measured
+temperatures, cmd_str, file path, timings). The file index of a day is taken
+from the catalogue instead of counting the files of the folder, and the runs
+to analyse are selected with indexed queries (date range, setpoint, sample)
+instead of listing folders and parsing the temperature from the file names.
+
+Runs saved before the catalogue are added with index_files(), or:
+
+    python hot_catalog.py DATA_DIR [--catalog PATH]
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from glob import glob
+
+
+CATALOG_PATH = os.environ.get("HOT_CATALOG", os.path.join("..", "..", "..", "Data", "hot_runs.sqlite"))
+
+COLUMNS = [
+    "id", "date", "time", "instrument", "idx", "sample", "setpoint", "measured", "t_obj", "t_board",
+    "cmd_str", "path", "t_reach", "t_settling", "t_measure", "t_total", "added",
+]
+Run = namedtuple("Run", COLUMNS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,         -- YYYY-MM-DD
+    time TEXT,                  -- HH:MM:SS
+    instrument TEXT NOT NULL,   -- "Ambit", "MultispeQ"
+    idx INTEGER NOT NULL,       -- file index of the day
+    sample TEXT,
+    setpoint REAL,
+    measured REAL,              -- PID temperature at the start of the measurement
+    t_obj REAL,
+    t_board REAL,
+    cmd_str TEXT,
+    path TEXT NOT NULL UNIQUE,
+    t_reach REAL,
+    t_settling REAL,
+    t_measure REAL,
+    t_total REAL,
+    added REAL NOT NULL         -- time.time() of the insertion
+);
+CREATE INDEX IF NOT EXISTS runs_date ON runs (instrument, date, idx);
+CREATE INDEX IF NOT EXISTS runs_setpoint ON runs (setpoint, date);
+CREATE INDEX IF NOT EXISTS runs_sample ON runs (sample, date);
+"""
+
+SETPOINT_PATTERN = re.compile(r"_setpoint([0-9]+(?:\.[0-9]+)?)")
+DATE_PATTERN = re.compile(r"(?:^|[\\/])(\d{6})_(\d+)_")
+
+
+def iso_date(value) -> str:
+    """YYYY-MM-DD from a date, a datetime, "YYMMDD" (as `today` in the scripts) or "YYYY-MM-DD"."""
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    value = str(value)
+    if re.fullmatch(r"\d{6}", value):
+        return datetime.strptime(value, "%y%m%d").strftime("%Y-%m-%d")
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RunCatalog:
+    """
+    Append-only catalogue of the runs.
+
+    Usage:
+        catalog = RunCatalog(CATALOG_PATH)
+        idx = catalog.next_index(today, "Ambit", OUTDIR)
+        path = save_run(f"{OUTDIR}{today}_{idx:04d}_Ambit", results)
+        catalog.add(path, results, "Ambit", idx=idx)
+        runs = catalog.query(instrument="Ambit", setpoint=(20, 30), last=8)
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # results are saved from a worker thread of the orchestrator
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:  # not while a worker thread is adding a run
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def next_index(self, day, instrument: str, directory: str = None) -> int:
+        """
+        File index for the next run of `instrument` on `day`.
+
+        :param directory: Folder the run is saved in: the index is also above the ones of the files
+            of `day` already there ("YYMMDD_IDX_..."), catalogued or not (eg. with a new catalogue).
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(idx) FROM runs WHERE instrument = ? AND date = ?", (instrument, iso_date(day))
+            ).fetchone()
+        idx = 0 if row[0] is None else row[0] + 1
+        if directory is not None and os.path.isdir(directory):
+            prefix = datetime.strptime(iso_date(day), "%Y-%m-%d").strftime("%y%m%d")
+            for name in os.listdir(directory):
+                match = DATE_PATTERN.search(name)
+                if match and match.group(1) == prefix:
+                    idx = max(idx, int(match.group(2)) + 1)
+        return idx
+
+    def add(self, path: str, results: dict, instrument: str, idx: int = None, day=None) -> int:
+        """
+        Append a run.
+
+        :param path: Path of the saved results file.
+        :param results: Results dict of the run (metadata of the measurement script, "timings"
+            of the orchestrator); missing fields are left empty.
+        :param instrument: "Ambit", "MultispeQ"...
+        :param idx: File index of the day, next_index() if None.
+        :param day: Date of the run, results["datetime"] or today if None.
+        :return: id of the new row.
+        """
+        day = iso_date(day or results.get("datetime") or date.today())
+        if idx is None:
+            idx = self.next_index(day, instrument)
+        timings = results.get("timings") or {}
+        row = {
+            "date": day,
+            "time": results.get("time"),
+            "instrument": instrument,
+            "idx": idx,
+            "sample": results.get("sample"),
+            "setpoint": _number(results.get("t_setpoint")),
+            "measured": _number(results.get("t_measured")),
+            "t_obj": _number(results.get("t_obj")),
+            "t_board": _number(results.get("t_board")),
+            "cmd_str": results.get("cmd_str"),
+            "path": os.path.abspath(path),
+            "t_reach": _number(timings.get("t_reach")),
+            "t_settling": _number(results.get("t_settling", timings.get("t_settling"))),
+            "t_measure": _number(timings.get("t_measure")),
+            "t_total": _number(timings.get("t_total")),
+            "added": time.time(),
+        }
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})", tuple(row.values())
+            )
+        return cursor.lastrowid
+
+    def query(self, instrument: str = None, date_from=None, date_to=None, setpoint=None, sample: str = None,
+              last: int = None) -> list:
+        """
+        Select runs, in (date, idx) order.
+
+        :param instrument: Only the runs of this instrument.
+        :param date_from: First day included (date or "YYMMDD"/"YYYY-MM-DD").
+        :param date_to: Last day included.
+        :param setpoint: A setpoint, a list of setpoints, or a (min, max) tuple (inclusive).
+        :param sample: Only the runs of this sample label.
+        :param last: Only the last `last` runs matching.
+        :return: List of Run.
+        """
+        where, args = [], []
+        if instrument is not None:
+            where.append("instrument = ?")
+            args.append(instrument)
+        if date_from is not None:
+            where.append("date >= ?")
+            args.append(iso_date(date_from))
+        if date_to is not None:
+            where.append("date <= ?")
+            args.append(iso_date(date_to))
+        if isinstance(setpoint, tuple):
+            where.append("setpoint BETWEEN ? AND ?")
+            args.extend(setpoint)
+        elif isinstance(setpoint, list):
+            where.append(f"setpoint IN ({', '.join('?' * len(setpoint))})")
+            args.extend(setpoint)
+        elif setpoint is not None:
+            where.append("setpoint = ?")
+            args.append(setpoint)
+        if sample is not None:
+            where.append("sample = ?")
+            args.append(sample)
+        sql = "SELECT * FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if last is None:
+            sql += " ORDER BY date, idx, id"
+        else:
+            sql = f"SELECT * FROM ({sql} ORDER BY date DESC, idx DESC, id DESC LIMIT ?) ORDER BY date, idx, id"
+            args.append(last)
+        with self._lock:
+            return [Run(*row) for row in self.conn.execute(sql, args)]
+
+    def paths(self, **kwargs) -> list:
+        """File paths of query(**kwargs)."""
+        return [run.path for run in self.query(**kwargs)]
+
+    def move(self, old: str, new: str) -> int:
+        """
+        Point the run saved at `old` to `new` (eg. a JSON file converted by hot_storage).
+
+        :return: Number of runs updated (0 if `old` is not catalogued).
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.execute("UPDATE runs SET path = ? WHERE path = ?",
+                                       (os.path.abspath(new), os.path.abspath(old)))
+        return cursor.rowcount
+
+    def index_files(self, directory: str, patterns=("*_Ambit.*", "*_HOT_setpoint*.*")) -> int:
+        """
+        Add the results files of `directory` (and subfolders) not catalogued yet.
+
+        The date and index are taken from the file name ("YYMMDD_IDX_..."), the setpoint
+        from "_setpointXX" in the name when the file has no "t_setpoint". A run saved both
+        as legacy JSON and converted (hot_storage) is catalogued once, with the converted
+        file. Files that can not be read are skipped.
+
+        :return: Number of runs added.
+        """
+        from hot_storage import load_run
+
+        with self._lock:
+            known = {os.path.splitext(row[0])[0]: row[0] for row in self.conn.execute("SELECT path FROM runs")}
+        found = {p for pattern in patterns for p in glob(os.path.join(directory, "**", pattern), recursive=True)}
+        runs = {}  # path without extension -> file, the converted one rather than the JSON
+        for path in sorted(found):
+            stem = os.path.splitext(os.path.abspath(path))[0]
+            if stem not in runs or runs[stem].endswith(".json"):
+                runs[stem] = path
+        added = 0
+        for stem, path in sorted(runs.items()):
+            if stem in known:
+                if known[stem].endswith(".json") and not path.endswith(".json"):
+                    self.move(known[stem], path)
+                continue
+            name = DATE_PATTERN.search(path)
+            try:
+                results = load_run(path)
+            except Exception as e:  # one unreadable file must not stop the indexing
+                print(f"Skipped {path}: {e!r}")
+                continue
+            if not isinstance(results, dict) or "sample" in results and not isinstance(results["sample"], str):
+                results = {}  # MultispeQ device JSON: no metadata of the script
+            if "t_setpoint" not in results and SETPOINT_PATTERN.search(os.path.basename(path)):
+                results["t_setpoint"] = SETPOINT_PATTERN.search(os.path.basename(path)).group(1)
+            instrument = "Ambit" if "_Ambit." in os.path.basename(path) else "MultispeQ"
+            self.add(path, results, instrument, idx=int(name.group(2)) if name else None,
+                     day=name.group(1) if name else None)
+            added += 1
+        return added
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add the existing results files to the run catalogue.")
+    parser.add_argument("directory")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    args = parser.parse_args()
+    with RunCatalog(args.catalog) as catalog:
+        print(f"{catalog.index_files(args.directory)} runs added, {len(catalog)} in {args.catalog}")
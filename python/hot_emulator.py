@@ -0,0 +1,513 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Emulated HOT setup devices on pseudo-terminals, for runs without the hardware.
+
+Each emulator opens a pty whose port (eg. /dev/pts/5) the scripts open like
+the serial port of the real device, and answers with its protocol:
+
+    PIDEmulator    the Pico running 250121 main-class.py: hello, setpoint_X,
+                   ramp_X, query, stop; the firmware PID ("250115 PID.py",
+                   through hot_pid_sim) drives a simulated heater read by a
+                   noisy TSic716
+    AmbitEmulator  the ESP32 Ambit: boot banner, temp, arrun1 (the points are
+                   streamed at the pace of the protocol timeline)
+    MsQEmulator    the MultispeQ: hello, and the JSON answer (autogain,
+                   data_raw of every pulse, environmental values) with its
+                   checksum trailer to a _protocol_set_ protocol, at a
+                   configurable line rate
+
+The answers are delayed by a configurable latency (plus jitter), and the time
+of the heater and of the protocols can be accelerated (time_scale), so that a
+sweep runs end to end in a fraction of its real duration.
+
+The ptys are not listed by pyserial: find_device() sees them through the
+HOT_PORTS environment variable (see hot_serial.serial_ports). POSIX only.
+
+Usage:
+    python hot_emulator.py --devices PID Ambit --time-scale 20
+    (in another shell, with the exported variables printed)
+    python 250121_HOT_PC_serial_docommand_Ambit.py
+"""
+
+import heapq
+import json
+import math
+import os
+import random
+import re
+import select
+import threading
+import time
+import zlib
+
+from hot_ambit import calc_arr_param
+from hot_pid_sim import FIRMWARE_DIR, PWM_OFF, HeaterPlant, TSicSensor, VirtualClock, load_firmware, load_pid
+from hot_schedule import ThermalModel
+
+
+class PtyDevice:
+    """
+    Device answering on a pseudo-terminal.
+
+    A command ends at a newline, when complete() says so, or when nothing more has arrived
+    for `idle` seconds (the probes of find_device send "hello" without terminator).
+    Subclasses answer in handle() and may run a periodic task in tick(), both from the
+    thread of the device.
+    """
+
+    name = "device"
+    tick_period = None  # seconds between two tick() calls, None for no periodic task
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, idle: float = 0.05, seed: int = 0):
+        """
+        :param latency: Delay of the first line of each answer, seconds.
+        :param jitter: Random extra delay of each answer, uniform in [0, jitter] seconds.
+        :param idle: Silence ending a command without terminator, seconds.
+        :param seed: Seed of the random delays and of the noise of the subclasses.
+        """
+        self.latency, self.jitter, self.idle = latency, jitter, idle
+        self.rng = random.Random(seed)
+        self.port = None
+        self.commands = 0  # commands received
+        self._fd = self._slave = None
+        self._queue = []  # heap of (due, sequence number, bytes) of the answers to write
+        self._sequence = 0
+        self._unsent = b""
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.port!r})"
+
+    def open(self):
+        """Create the pty and start answering on it."""
+        import tty  # POSIX only
+
+        if self._thread is not None:
+            return self
+        self._fd, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no echo, no newline translation
+        os.set_blocking(self._fd, False)
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._serve, name=f"{self.name} emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        for fd in (self._fd, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._slave = None
+
+    def handle(self, command: str):
+        """Answer to `command` (decoded, stripped): list of lines, or None. Override per device."""
+        return None
+
+    def complete(self, buffer: bytes) -> bool:
+        """True if `buffer` (received, without terminator) is a whole command. Override per device."""
+        return False
+
+    def tick(self):
+        """Periodic task, every tick_period seconds. Override per device."""
+
+    def send(self, lines, offsets=None):
+        """
+        Queue answer lines, written after the latency (and jitter).
+
+        :param lines: Lines, without line ending (CRLF is added, as printed by the boards).
+        :param offsets: Further delay of each line (s), eg. to stream a measurement at its pace.
+        """
+        start = time.monotonic() + self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        for i, line in enumerate(lines):
+            due = start + (offsets[i] if offsets is not None else 0.0)
+            heapq.heappush(self._queue, (due, self._sequence, f"{line}\r\n".encode()))
+            self._sequence += 1
+
+    def _dispatch(self, data: bytes):
+        command = data.decode("utf-8", errors="replace").strip()
+        if not command:
+            return
+        self.commands += 1
+        lines = self.handle(command)
+        if lines:
+            self.send(lines)
+
+    def _serve(self):
+        buffer, last = b"", 0.0
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            timeout = 0.1
+            if self._queue or self._unsent:
+                timeout = min(timeout, max(self._queue[0][0] - now, 0.0) if self._queue else 0.005)
+            if self.tick_period is not None:
+                timeout = min(timeout, max(next_tick - now, 0.0))
+            if buffer:
+                timeout = min(timeout, max(last + self.idle - now, 0.0))
+            if select.select([self._fd], [], [], timeout)[0]:
+                try:
+                    data = os.read(self._fd, 65536)
+                except (BlockingIOError, OSError):
+                    data = b""
+                if data:
+                    buffer += data
+                    last = time.monotonic()
+                    # complete lines first, the rest waits for more data or the idle time
+                    *lines, buffer = re.split(rb"[\r\n]", buffer)
+                    for line in lines:
+                        self._dispatch(line)
+                    if buffer and self.complete(buffer):
+                        self._dispatch(buffer)
+                        buffer = b""
+            now = time.monotonic()
+            if buffer and now - last >= self.idle:
+                self._dispatch(buffer)
+                buffer = b""
+            if self.tick_period is not None:
+                if now - next_tick > 1.0:  # can not keep up with the time scale: run late instead of in bursts
+                    next_tick = now
+                while now >= next_tick:
+                    self.tick()
+                    next_tick += self.tick_period
+            self._write(now)
+
+    def _write(self, now: float):
+        out = [self._unsent]
+        while self._queue and self._queue[0][0] <= now:
+            out.append(heapq.heappop(self._queue)[2])
+        data = b"".join(out)
+        if not data:
+            return
+        try:
+            written = os.write(self._fd, data)
+        except BlockingIOError:  # the pty buffer is full until the port is read
+            written = 0
+        self._unsent = data[written:]
+
+
+class PIDEmulator(PtyDevice):
+    """
+    Pico running 250121 main-class.py.
+
+    The firmware PID, with the gains and options of the firmware, drives a HeaterPlant
+    (first order plus dead time) through a TSicSensor, once per loop period of the firmware.
+    After "stop" the device is silent, as the firmware exits to the REPL.
+    """
+
+    name = "PID"
+
+    def __init__(self, model: ThermalModel = None, setpoint: float = 20, T0: float = None, noise: float = 0.01,
+                 time_scale: float = 1.0, period: float = 0.1, gains=None, **kwargs):
+        """
+        :param model: Heater model, eg. ThermalModel.from_results(paths, max_dead_time=60); default ThermalModel().
+        :param setpoint: Setpoint at start, as the firmware (20).
+        :param T0: Temperature at start, the ambient of the model if None.
+        :param noise: Standard deviation of the sensor noise (°C).
+        :param time_scale: Simulated seconds per second: the heater and the PID run faster by this factor.
+        :param period: Loop period of the firmware (s of simulated time).
+        :param gains: (Kp, Ki, Kd), the default gains of the firmware if None.
+        :param kwargs: Of PtyDevice (latency, jitter, idle, seed).
+        """
+        super().__init__(**kwargs)
+        self.clock = VirtualClock()
+        firmware = load_firmware(self.clock, os.path.join(FIRMWARE_DIR, "261018 autotune.py"), "autotune")
+        PID = load_pid(self.clock).PID
+        self.pid = PID(*(gains or firmware.DEFAULT_GAINS), setpoint=setpoint, bumpless=True, **firmware.PID_OPTIONS)
+        self.plant = HeaterPlant.from_model(model or ThermalModel(), T0)
+        self.sensor = TSicSensor(noise, seed=self.rng.randrange(1 << 30))
+        self.period = period
+        self.tick_period = period / time_scale
+        self.setpoint = setpoint
+        self.T = self.sensor(self.plant.T)
+        self.control = PWM_OFF
+        self.running = True
+
+    @property
+    def temperature(self) -> float:
+        """Temperature of the heater (not the reading), eg. of the sample measured by the Ambit."""
+        return self.plant.T
+
+    def tick(self):
+        # one iteration of the main loop: read T, PID, PWM, sleep
+        self.T = self.sensor(self.plant.T)
+        if self.running:
+            self.control = int(self.pid(self.T))
+        self.clock.advance(self.period)
+        self.plant.step(self.control, self.period)
+
+    def handle(self, command):
+        if not self.running:
+            return None
+        if command == "hello":
+            return ["Hello PID here"]
+        if "setpoint_" in command:
+            try:
+                value = re.search("setpoint_([0-9]*.[0-9]*)", command).group(1)
+                self.setpoint = float(value)
+                self.pid.set_setpoint(self.setpoint)
+                return ["Received setpoint", f"Setpoint updated to: {value}"]
+            except (AttributeError, ValueError):
+                return ["Received setpoint", f"Can not parse setpoint, message was: {command}"]
+        if "ramp_" in command:
+            try:
+                value = float(re.search("ramp_([0-9]*.?[0-9]*)", command).group(1))
+                self.pid.setpoint_ramp = value if value > 0 else None
+                return [f"Ramp updated to: {value}"]
+            except (AttributeError, ValueError):
+                return [f"Can not parse ramp, message was: {command}"]
+        if command == "query":
+            return [f"Setpoint: {self.setpoint}, Measured temp: {self.T}, PID feedback: {self.control}"]
+        if "stop" in command:
+            self.running = False
+            self.control = PWM_OFF
+            return ["Stoping loop, fully dimming"]
+        return None
+
+
+class AmbitEmulator(PtyDevice):
+    """
+    ESP32 Ambit sensor.
+
+    The real board resets when its port is opened and prints its ROM banner; the emulator
+    can not see the port being opened and prints the banner in answer to "hello". Every
+    other command is echoed as a 'cmd: <name>' line followed by its data.
+    """
+
+    name = "Ambit"
+    BANNER = [
+        "ESP-ROM:esp32s3-20210327",
+        "Build:Mar 27 2021",
+        "rst:0x1 (POWERON),boot:0x8 (SPI_FAST_FLASH_BOOT)",
+        "SPIWP:0xee",
+        "mode:DIO, clock div:1",
+        "entry 0x403c98d4",
+    ]
+
+    def __init__(self, temperature=None, noise: float = 0.01, time_scale: float = 1.0, **kwargs):
+        """
+        :param temperature: Callable returning the temperature of the sample (°C), eg. the
+            `temperature` of a PIDEmulator, 25 °C if None.
+        :param noise: Relative standard deviation of the fluorescence and reflectance signals.
+        :param time_scale: The arrun1 points are streamed this many times faster than on the device.
+        :param kwargs: Of PtyDevice (latency, jitter, idle, seed).
+        """
+        super().__init__(**kwargs)
+        self.temperature = temperature or (lambda: 25.0)
+        self.noise = noise
+        self.time_scale = time_scale
+
+    def handle(self, command):
+        if command == "hello":
+            return self.BANNER
+        if command == "temp":
+            T = self.temperature()
+            return ["cmd: temp", f"{T + self.rng.gauss(0, 0.05):.2f}\t{T + 1.5:.2f}\t{22 + self.rng.gauss(0, 0.05):.2f}"]
+        if command.startswith("arrun1"):
+            self.arrun1(command)
+            return None
+        return [f"cmd: {command.split(',')[0]}"]
+
+    def arrun1(self, command: str):
+        """Stream the points of an 'arrun1,N,persist,<8 N values>,' protocol at its pace."""
+        try:
+            fields = command.rstrip(",").split(",")
+            count = int(fields[1])
+            _, timeline, actinic = calc_arr_param([int(v) for v in fields[3:3 + 8 * count]])
+        except (IndexError, ValueError) as e:
+            self.send(["cmd: arrun1", f"ERROR {e}"])
+            return
+        T = self.temperature()
+        gauss, noise = self.rng.gauss, self.noise
+        lines = ["cmd: arrun1"]
+        for light in actinic.tolist():
+            # fluorescence yield rises under actinic light and drops with temperature
+            F = 0.075 * (1 + 0.3 * light / 255) * (1 - 0.004 * (T - 25)) * (1 + gauss(0, noise))
+            lines.append(f"T:{T:.1f},F:{F:.4f},S:{round(505 * (1 + gauss(0, noise)))},"
+                         f"R:{round(6667 * (1 + gauss(0, noise)))},Sun:{380 + light // 4 + round(gauss(0, 2))},"
+                         f"L:{484 + round(gauss(0, 2))}")
+        self.send(lines, [0.0] + (timeline / self.time_scale).tolist())
+
+
+class MsQEmulator(PtyDevice):
+    """
+    MultispeQ (Teensy).
+
+    A protocol is a JSON list of objects with a "_protocol_set_" list; the answer has one
+    sample per object and one set per protocol of its "_protocol_set_": the autogain result of
+    an "autogain" protocol, a data_raw value per pulse of a "pulses" one. The JSON is printed in lines of about `line_length` characters (cut after a
+    comma), the last one ending with the CRC32 of the JSON as 8 hexadecimal digits.
+    """
+
+    name = "MultispeQ"
+    # Fo and Fm of a healthy leaf (data_raw counts), Fv/Fm drops above HEAT_LIMIT (°C)
+    FO, FM, HEAT_LIMIT = 15.0, 75.0, 40.0
+
+    def __init__(self, temperature=None, noise: float = 0.01, line_rate: float = None, line_length: int = 2048,
+                 **kwargs):
+        """
+        :param temperature: Callable returning the leaf temperature (°C), eg. the `temperature`
+            of a PIDEmulator, 25 °C if None.
+        :param noise: Relative standard deviation of data_raw.
+        :param line_rate: Lines per second, as fast as the port takes them if None.
+        :param line_length: Approximate length of the lines of the answer (characters).
+        :param kwargs: Of PtyDevice (latency, jitter, idle, seed).
+        """
+        super().__init__(**kwargs)
+        self.temperature = temperature or (lambda: 25.0)
+        self.noise = noise
+        self.line_rate = line_rate
+        self.line_length = line_length
+
+    def handle(self, command):
+        if command == "hello":
+            return ["MultispeQ Ready"]
+        if command.startswith("["):
+            try:
+                protocols = json.loads(command)
+            except ValueError as e:
+                return [json.dumps({"error": f"can not parse protocol: {e}"})]
+            lines = self.lines(self.answer(protocols))
+            self.send(lines, None if self.line_rate is None else [i / self.line_rate for i in range(len(lines))])
+        return None
+
+    def complete(self, buffer):
+        # protocols are sent without terminator: complete once the brackets are balanced
+        return buffer.startswith(b"[") and buffer.rstrip().endswith(b"]") and buffer.count(b"[") == buffer.count(b"]")
+
+    def answer(self, protocols) -> dict:
+        """Answer to a list of protocol objects, as a dict."""
+        T = self.temperature()
+        samples = []
+        for protocol in protocols:
+            sets = [self._set(item, T) for item in protocol.get("_protocol_set_", [])]
+            samples.append({"time": int(time.time() * 1000), "protocol_id": "", "set": sets})
+        return {"device_name": "MultispeQ", "device_version": "2", "device_id": "01:23:45:67",
+                "device_battery": 87, "device_firmware": 2.345, "sample": samples}
+
+    def _set(self, item, T) -> dict:
+        gauss, noise = self.rng.gauss, self.noise
+        values = {"label": item.get("label", "")}
+        if "autogain" in item:
+            # [index, LED, detector, pulse length, target] -> [index, LED, detector, pulse length, intensity, value]
+            values["autogain"] = [[index, led, detector, length, -round(200 * (1 + gauss(0, 0.1))),
+                                   round(target * (1 + gauss(0, noise)))]
+                                  for index, led, detector, length, target in item["autogain"]]
+        if "pulses" in item:
+            pulses = item["pulses"]
+            brightness = item.get("nonpulsed_lights_brightness", [[0]] * len(pulses))
+            # the yield relaxes towards Fm under the saturating light of a phase, towards Fo in the dark
+            fm = self.FO + (self.FM - self.FO) / (1 + math.exp((T - self.HEAT_LIMIT) / 2))
+            level, data = self.FO, []
+            for count, lights in zip(pulses, brightness):
+                target = fm if any(lights) else self.FO
+                for _ in range(count):
+                    level += (target - level) / 150
+                    data.append(round(level * (1 + gauss(0, noise))))
+            values["data_raw"] = data
+        for (name, *_) in item.get("environmental", []):
+            values.update(self._environmental(name, T))
+        return values
+
+    def _environmental(self, name, T) -> dict:
+        gauss = self.rng.gauss
+        if name == "light_intensity":
+            return {"light_intensity": max(round(gauss(2, 1)), 0), "r": 1, "g": 1, "b": 0}
+        if name == "contactless_temp":
+            return {"contactless_temp": round(T + gauss(0, 0.1), 2)}
+        if name in ("thp", "thp2"):
+            suffix = name[3:]
+            return {f"temperature{suffix}": round(22 + gauss(0, 0.05), 2),
+                    f"humidity{suffix}": round(45 + gauss(0, 0.5), 2),
+                    f"pressure{suffix}": round(1013 + gauss(0, 0.2), 2)}
+        return {name: 0}
+
+    def lines(self, answer: dict) -> list:
+        """The printed answer: lines of the JSON and the checksum trailer."""
+        text = json.dumps(answer, separators=(",", ":"))
+        lines, start = [], 0
+        while start < len(text):
+            cut = text.find(",", start + self.line_length)
+            end = len(text) if cut < 0 else cut + 1
+            lines.append(text[start:end])
+            start = end
+        lines[-1] += f"{zlib.crc32(text.encode()):08X}"
+        return lines
+
+
+EMULATORS = {"PID": PIDEmulator, "Ambit": AmbitEmulator, "MultispeQ": MsQEmulator}
+
+
+def start(devices=("PID", "Ambit"), model: ThermalModel = None, time_scale: float = 1.0, latency: float = 0.0,
+          jitter: float = 0.0, noise: float = 0.01, line_rate: float = None, seed: int = 0) -> dict:
+    """
+    Start emulators, the Ambit or MultispeQ measuring the heater of the PID when it is emulated too.
+
+    :param devices: Keys of EMULATORS.
+    :param line_rate: Lines per second of the MultispeQ answers, unlimited if None.
+    :param noise: Sensor noise of the PID (°C) and relative noise of the Ambit and MultispeQ signals.
+    :return: Dict name -> open emulator.
+    """
+    emulators = {}
+    for i, name in enumerate(devices):
+        kwargs = dict(latency=latency, jitter=jitter, noise=noise, seed=seed + i)
+        if name == "PID":
+            kwargs.update(model=model, time_scale=time_scale)
+        elif "PID" in emulators:
+            kwargs["temperature"] = lambda pid=emulators["PID"]: pid.temperature
+        if name == "Ambit":
+            kwargs["time_scale"] = time_scale
+        elif name == "MultispeQ":
+            kwargs["line_rate"] = line_rate
+        emulators[name] = EMULATORS[name](**kwargs).open()
+    return emulators
+
+
+def environment(emulators: dict) -> dict:
+    """Environment variables for hot_serial to find the emulators (and not cache them with the real devices)."""
+    return {
+        "HOT_PORTS": os.pathsep.join(emulator.port for emulator in emulators.values()),
+        "HOT_DEVICE_CACHE": os.path.join(os.path.expanduser("~"), ".hot_emulated_devices.json"),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Emulated devices on pseudo-terminals, until Ctrl+C.")
+    parser.add_argument("--devices", nargs="+", default=["PID", "Ambit"], choices=list(EMULATORS))
+    parser.add_argument("--time-scale", type=float, default=1.0, help="simulated seconds per second")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay of each answer (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay of each answer, max (s)")
+    parser.add_argument("--noise", type=float, default=0.01, help="sensor noise (°C), relative noise of the signals")
+    parser.add_argument("--line-rate", type=float, help="lines per second of the MultispeQ answers")
+    parser.add_argument("--results", nargs="+", help="results files to fit the heater model on")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = ThermalModel.from_results(args.results, max_dead_time=60) if args.results else ThermalModel()
+    emulators = start(args.devices, model, args.time_scale, args.latency, args.jitter, args.noise, args.line_rate,
+                      args.seed)
+    for name, emulator in emulators.items():
+        print(f"{name} at {emulator.port}")
+    print("\n" + " ".join(f"export {key}={value}" for key, value in environment(emulators).items()))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for emulator in emulators.values():
+            emulator.close()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Simulation of the Pico PID firmware on the PC.
+
+The PID class of the firmware ("250115 PID.py") is loaded unmodified under
+CPython, with stand-ins of the MicroPython modules it imports: `utime` reads a
+virtual clock advanced by the simulation, `micropython` provides no-op
+decorators. The controller drives a first-order-plus-dead-time model of the
+heater, with the PWM convention of the firmware (64000 = heater off, 4000 =
+full power):
+
+    tau * dT/dt = ambient + gain * power(t - dead_time) - T,    power = (64000 - pwm) / 60000
+
+HeaterPlant.from_model builds it from a hot_schedule.ThermalModel fitted on
+the PID telemetry of our runs. Its defaults are the heater of ThermalModel()
+(30 °C above ambient at full power, tau 300 s, 10 s of dead time), the plant
+of the emulators and of all the PID benchmarks unless they are given another.
+
+Usage:
+    clock = VirtualClock()
+    PID = load_pid(clock).PID
+    pid = PID(Kp=-5000, Ki=-4000, Kd=-4000, setpoint=25, sample_time=500, output_limits=[4000, 64_000], scale='ms')
+    trace = simulate(pid, HeaterPlant(T0=25), clock, duration=600, steps={60: 30})
+    settling_time(trace, 60)
+"""
+
+import collections
+import importlib.util
+import math
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "micropython")
+PID_PATH = os.path.join(FIRMWARE_DIR, "250115 PID.py")
+PWM_OFF, PWM_FULL = 64_000, 4_000
+TICKS_PERIOD = 1 << 30  # MicroPython ticks wrap at 2**30
+TSIC_LSB = 70 / 16383  # °C, resolution of the TSic716 (-10 to 60 °C on 14 bits)
+
+
+class VirtualClock:
+    """Time of the simulation, in seconds, read by the `utime` stand-in."""
+
+    def __init__(self, t: float = 0.0):
+        self.t = t
+
+    def advance(self, seconds: float):
+        self.t += seconds
+
+    def utime(self) -> types.ModuleType:
+        """A `utime` module reading this clock (the ticks wrap as on the device)."""
+        module = types.ModuleType("utime")
+        module.time = lambda: int(self.t)
+        module.time_ns = lambda: int(self.t * 1e9)
+        module.ticks_ms = lambda: int(self.t * 1e3) % TICKS_PERIOD
+        module.ticks_us = lambda: int(self.t * 1e6) % TICKS_PERIOD
+        module.ticks_cpu = lambda: int(self.t * 125e6) % TICKS_PERIOD
+        module.ticks_add = lambda ticks, delta: (ticks + delta) % TICKS_PERIOD
+        module.ticks_diff = lambda end, start: (end - start + TICKS_PERIOD // 2) % TICKS_PERIOD - TICKS_PERIOD // 2
+        module.sleep_ms = lambda ms: self.advance(ms / 1e3)
+        module.sleep = self.advance
+        return module
+
+
+def _micropython() -> types.ModuleType:
+    module = types.ModuleType("micropython")
+    module.native = module.viper = lambda f: f
+    module.const = lambda x: x
+    return module
+
+
+def load_firmware(clock: VirtualClock, path: str, name: str, modules: dict = None) -> types.ModuleType:
+    """
+    Load a firmware module with the MicroPython modules stubbed.
+
+    :param clock: Clock read by the module instead of the real time.
+    :param path: Path of the firmware file.
+    :param name: Name the module has on the device ("PID" for "250115 PID.py").
+    :param modules: Dict name -> module importable by the firmware file in addition to the
+        stubs (eg. {"PID": load_pid(clock)}), or replacing them.
+    :return: The module (a fresh one per call, bound to `clock`).
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    utime = clock.utime()
+    stubs = {"utime": utime, "time": utime, "micropython": _micropython(), **(modules or {})}
+    saved = {key: sys.modules.get(key) for key in stubs}
+    sys.modules.update(stubs)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                sys.modules.pop(key, None)
+            else:
+                sys.modules[key] = value
+    return module
+
+
+def load_pid(clock: VirtualClock, path: str = PID_PATH) -> types.ModuleType:
+    """The firmware PID module ("250115 PID.py"), bound to `clock`."""
+    return load_firmware(clock, path, "PID")
+
+
+class HeaterPlant:
+    """First-order-plus-dead-time heater driven by the PWM duty of the firmware."""
+
+    def __init__(self, T0: float = None, ambient: float = 20.0, gain: float = 30.0, tau: float = 300.0,
+                 dead_time: float = 10.0):
+        """
+        :param T0: Initial temperature, `ambient` if None; the plant starts at equilibrium there.
+        :param ambient: Temperature with the heater off (°C).
+        :param gain: Temperature rise at full power, at equilibrium (°C).
+        :param tau: Time constant (s).
+        :param dead_time: Delay between a duty change and the start of the response (s).
+
+        The defaults are those of hot_schedule.ThermalModel() (its gain is a rate: 0.1 °C/s * 300 s).
+        """
+        self.ambient, self.gain, self.tau, self.dead_time = ambient, gain, tau, dead_time
+        self.T = ambient if T0 is None else T0
+        self._t = 0.0
+        self._pwm = self.pwm_at(self.T)  # duty in effect until the first one applied comes through
+        self._pending = collections.deque()  # (time it takes effect, duty)
+
+    @classmethod
+    def from_model(cls, model, T0: float = None) -> "HeaterPlant":
+        """
+        Plant of a hot_schedule.ThermalModel, eg. ThermalModel.from_results(paths, max_dead_time=60).
+
+        The model gain is a heating rate at full power (°C/s): the rise at equilibrium is gain * tau.
+        """
+        return cls(T0, ambient=model.t_amb, gain=model.gain * model.tau, tau=model.tau, dead_time=model.dead_time)
+
+    def power(self, pwm) -> float:
+        return min(max((PWM_OFF - pwm) / (PWM_OFF - PWM_FULL), 0.0), 1.0)
+
+    def step(self, pwm, dt: float) -> float:
+        """
+        Apply `pwm` and advance by `dt` seconds, with the duty applied dead_time earlier held over
+        the step (exact for a first-order system when dt divides the dead time).
+        """
+        self._pending.append((self._t + self.dead_time, pwm))
+        while self._pending and self._pending[0][0] <= self._t + 1e-9:
+            self._pwm = self._pending.popleft()[1]
+        T_eq = self.ambient + self.gain * self.power(self._pwm)
+        self.T = T_eq + (self.T - T_eq) * math.exp(-dt / self.tau)
+        self._t += dt
+        return self.T
+
+    def pwm_at(self, T: float) -> float:
+        """Duty holding the plant at T (clamped to the PWM range)."""
+        pwm = PWM_OFF - (T - self.ambient) / self.gain * (PWM_OFF - PWM_FULL)
+        return min(max(pwm, PWM_FULL), PWM_OFF)
+
+
+class TSicSensor:
+    """Reading of the TSic716: the temperature with Gaussian noise, quantized as by ZACwire.T()."""
+
+    def __init__(self, noise: float = 0.01, lsb: float = TSIC_LSB, seed: int = 0):
+        """
+        :param noise: Standard deviation of the noise (°C).
+        :param lsb: Resolution (°C).
+        :param seed: Seed of the noise, for reproducible runs.
+        """
+        self.noise, self.lsb = noise, lsb
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, T: float) -> float:
+        if self.noise:
+            T += self.rng.normal(0, self.noise)
+        return round((T + 10) / self.lsb) * self.lsb - 10
+
+
+def simulate(pid, plant: HeaterPlant, clock: VirtualClock, duration: float, period: float = 0.5,
+             steps: dict = None, change=None, sensor=None) -> dict:
+    """
+    Run the control loop of the firmware: read T, call the PID, apply the duty, wait `period`.
+
+    :param pid: Controller, loaded with load_pid(clock).
+    :param duration: Simulated time (s).
+    :param period: Loop period (s), the sleep of the firmware loop.
+    :param steps: Dict time (s) -> new setpoint.
+    :param change: Callable(pid, setpoint) -> controller, how a new setpoint is applied
+        (default pid.set_setpoint); may return a new controller.
+    :param sensor: Callable(T) -> reading given to the PID, eg. TSicSensor(); the exact T if None.
+    :return: Dict of arrays 't', 'T' (of the plant, not the reading), 'pwm', 'setpoint' (the one
+        commanded, not the ramped one the PID is following) and 'compute' (s of CPython time spent
+        in the PID call).
+    """
+    steps = dict(sorted((steps or {}).items()))
+    change = change or (lambda pid, setpoint: pid.set_setpoint(setpoint) or pid)
+    t0 = clock.t
+    n = int(round(duration / period))
+    trace = {key: np.empty(n) for key in ("t", "T", "pwm", "setpoint", "compute")}
+    for i in range(n):
+        t = clock.t - t0
+        while steps and next(iter(steps)) <= t + 1e-9:
+            pid = change(pid, steps.pop(next(iter(steps))))
+        T = plant.T
+        reading = T if sensor is None else sensor(T)
+        start = time.perf_counter()
+        pwm = int(pid(reading))
+        trace["compute"][i] = time.perf_counter() - start
+        setpoint = getattr(pid, "target", pid.setpoint)  # versions before the setpoint ramp have no target
+        trace["t"][i], trace["T"][i], trace["pwm"][i], trace["setpoint"][i] = t, T, pwm, setpoint
+        clock.advance(period)
+        plant.step(pwm, period)
+    return trace
+
+
+def settling_time(trace: dict, t_step: float, setpoint: float = None, band: float = 0.2,
+                  hold: float = 60.0) -> float:
+    """
+    Time from `t_step` after which T stays within `band` of the setpoint.
+
+    :param setpoint: Final setpoint, the last one of the trace if None.
+    :param hold: Minimum time in the band at the end of the trace: an oscillation passing through
+        the band just before the end is not settled.
+    :return: Seconds, inf if T is not settled at the end of the trace.
+    """
+    setpoint = trace["setpoint"][-1] if setpoint is None else setpoint
+    after = trace["t"] >= t_step
+    outside = np.flatnonzero(np.abs(trace["T"][after] - setpoint) > band)
+    if outside.size == 0:
+        return 0.0
+    t_in = trace["t"][after]
+    if outside[-1] == t_in.size - 1 or t_in[-1] - t_in[outside[-1] + 1] < hold:
+        return math.inf
+    return t_in[outside[-1] + 1] - t_step
+
+
+def overshoot(trace: dict, t_step: float, start: float, setpoint: float = None) -> float:
+    """Largest excursion beyond the setpoint after `t_step`, in the direction of the step from `start` (°C)."""
+    setpoint = trace["setpoint"][-1] if setpoint is None else setpoint
+    T = trace["T"][trace["t"] >= t_step]
+    beyond = (T - setpoint) if setpoint >= start else (setpoint - T)
+    return max(float(beyond.max()), 0.0)
+
+
+def iae(trace: dict, t_from: float = 0.0, t_to: float = math.inf) -> float:
+    """Integrated absolute error |setpoint - T| between `t_from` and `t_to` (°C.s, rectangle rule)."""
+    within = (trace["t"] >= t_from) & (trace["t"] < t_to)
+    period = trace["t"][1] - trace["t"][0] if len(trace["t"]) > 1 else 0.0
+    return float(np.abs(trace["setpoint"][within] - trace["T"][within]).sum() * period)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Plotting of the Ambit runs out of the acquisition path.
+
+Figures are rendered in a separate Python process (this file run as a
+script, so the acquisition script is not re-imported as with multiprocessing
+on Windows). Rendering never holds the event loop nor the GIL of the
+acquisition process, and submit() only queues the data: the next PID command
+is never delayed by a figure.
+
+    - FilePlotter: one PNG per run, rendered with the Agg backend (no window).
+    - LivePlotter: one live window, updated in place with blitting.
+
+Both are used as the `plot` callable of hot_acquisition.SweepOrchestrator:
+
+    plotter = FilePlotter(OUTDIR + "figures")
+    SweepOrchestrator(pid, measure, plot=plotter.submit, ...)
+    ...
+    plotter.close()
+"""
+
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+
+import numpy as np
+
+
+F_LIMITS = (0.1, 0.15)
+R_LIMITS = (6300, 6900)
+
+
+def _series(results):
+    """The data sent to the renderer: only the plotted columns, as arrays."""
+    return np.asarray(results["F"]), np.asarray(results["R"])
+
+
+def draw_two_values(fig, fluo, refl, title=""):
+    """Fluorescence and reflectance against the measurement index, on two y axes of `fig`."""
+    ax1 = fig.add_subplot()
+    color_f, color_r = "tab:blue", "tab:red"
+    ax1.set_xlabel("Measurement Index")
+    ax1.set_ylabel("Fluo", color=color_f)
+    line1 = ax1.plot(np.arange(len(fluo)), fluo, color=color_f, label="Fluo")
+    ax1.tick_params(axis="y", labelcolor=color_f)
+    ax1.set_ylim(F_LIMITS)
+
+    ax2 = ax1.twinx()
+    ax2.set_ylabel("Reflectance", color=color_r)
+    line2 = ax2.plot(np.arange(len(refl)), refl, color=color_r, label="Reflectance")
+    ax2.tick_params(axis="y", labelcolor=color_r)
+    ax2.set_ylim(R_LIMITS)
+
+    lines = line1 + line2
+    ax1.legend(lines, [line.get_label() for line in lines], loc="best")
+    ax1.set_title(str(title))
+    fig.tight_layout()
+    return ax1, ax2
+
+
+def render_to_file(path, fluo, refl, title="", dpi=100):
+    """Render one run to an image file with Agg (runs in the renderer process)."""
+    from matplotlib.figure import Figure  # no pyplot: no GUI backend, no global state
+
+    fig = Figure(figsize=(6.4, 4.8))
+    draw_two_values(fig, fluo, refl, title)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+class _Renderer:
+    """Renderer process fed through its stdin by a writer thread."""
+
+    mode = None
+
+    def __init__(self, *args):
+        self._process = subprocess.Popen([sys.executable, os.path.abspath(__file__), self.mode, *map(str, args)],
+                                         stdin=subprocess.PIPE)
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def _write(self):
+        # pickling and the pipe (which blocks when full) stay out of the caller's thread
+        while (item := self._queue.get()) is not None:
+            try:
+                pickle.dump(item, self._process.stdin)
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError):  # renderer closed (eg. live window closed)
+                break
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+
+    def _submit(self, item):
+        self._queue.put_nowait(item)
+
+    def close(self, wait: bool = True):
+        """Stop the renderer; with wait, block until it is done."""
+        self._queue.put_nowait(None)
+        if wait:
+            self._writer.join()
+            self._process.wait()
+
+
+class FilePlotter(_Renderer):
+    """Write one figure per run to `outdir`, rendered with Agg in a background process."""
+
+    mode = "file"
+
+    def __init__(self, outdir: str, fmt: str = "png", dpi: int = 100, name=None):
+        """
+        :param outdir: Folder of the figures, created if needed.
+        :param fmt: Image format (extension).
+        :param dpi: Resolution of the figures.
+        :param name: Callable(index, results) -> file name without extension,
+            default "<index>_setpoint<t_setpoint>".
+        """
+        self.outdir = outdir
+        self.fmt = fmt
+        self.name = name or (lambda index, results: f"{index:04d}_setpoint{results.get('t_setpoint')}")
+        self.index = 0
+        os.makedirs(outdir, exist_ok=True)
+        super().__init__(dpi)
+
+    def submit(self, results):
+        """Queue the figure of a results dict and return immediately."""
+        path = os.path.join(self.outdir, f"{self.name(self.index, results)}.{self.fmt}")
+        self.index += 1
+        self._submit((path, *_series(results), results.get("t_setpoint", "")))
+
+
+class LivePlotter(_Renderer):
+    """One live window showing the last run, updated in a background process."""
+
+    mode = "live"
+
+    def __init__(self, keep_open: bool = True):
+        """
+        :param keep_open: Keep the window open after close() until the user closes it.
+        """
+        super().__init__(int(keep_open))
+
+    def submit(self, results):
+        """Send the data of a results dict to the window and return immediately."""
+        self._submit((*_series(results), results.get("t_setpoint", "")))
+
+    def close(self, wait: bool = False):
+        """Stop updating; with wait, block until the window is closed."""
+        super().close(wait)
+
+
+def _read_items(stream):
+    """Items sent by _Renderer, until the pipe is closed."""
+    while True:
+        try:
+            yield pickle.load(stream)
+        except EOFError:
+            return
+
+
+def _file_loop(dpi):
+    for path, fluo, refl, title in _read_items(sys.stdin.buffer):
+        try:
+            render_to_file(path, fluo, refl, title, dpi)
+        except Exception as e:  # a failed figure must not stop the next ones
+            print(f"Plotting {path} failed: {e!r}")
+
+
+def _live_loop(keep_open):
+    """One figure, lines and title redrawn with blitting."""
+    import matplotlib.pyplot as plt
+
+    items = queue.Queue()  # stdin is read in a thread, the GUI events are processed here
+
+    def read():
+        for item in _read_items(sys.stdin.buffer):
+            items.put(item)
+        items.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+
+    plt.ion()
+    fig = plt.figure()
+    ax1, ax2 = draw_two_values(fig, [], [])
+    line_f, line_r = ax1.lines[0], ax2.lines[0]
+    title = ax1.set_title("")
+    for artist in (line_f, line_r, title):
+        artist.set_animated(True)  # drawn by blitting only
+    plt.show(block=False)
+    background, length = None, None
+
+    while plt.fignum_exists(fig.number):
+        try:
+            item = items.get(timeout=0.05)
+        except queue.Empty:
+            fig.canvas.flush_events()
+            continue
+        if item is None:
+            break
+        fluo, refl, text = item
+        line_f.set_data(np.arange(len(fluo)), fluo)
+        line_r.set_data(np.arange(len(refl)), refl)
+        title.set_text(str(text))
+        if background is None or len(fluo) != length:
+            # the x axis changes: full redraw of the static parts, new background
+            length = len(fluo)
+            ax1.set_xlim(0, max(length - 1, 1))
+            fig.canvas.draw()
+            background = fig.canvas.copy_from_bbox(fig.bbox)
+        fig.canvas.restore_region(background)
+        for artist in (line_f, line_r, title):
+            fig.draw_artist(artist)
+        fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
+
+    if keep_open and plt.fignum_exists(fig.number):
+        plt.ioff()
+        plt.show()
+
+
+if __name__ == "__main__":
+    # renderer process started by FilePlotter / LivePlotter
+    if sys.argv[1] == "file":
+        _file_loop(int(sys.argv[2]))
+    else:
+        _live_loop(bool(int(sys.argv[2])))
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Ordering of the setpoints of a sweep to minimize the predicted sweep duration.
+
+The sample holder is modelled as a first order plant heated by the PWM:
+
+    dT/dt = (T_amb - T) / tau + gain * u,     u = heater power in [0, 1]
+
+fitted by least squares on the PID telemetry logged by the orchestrator
+("pid_log" of the results files), the dead time optionally by a grid search. A transition is predicted as the time to
+reach the new setpoint at full power (heating) or with the heater off
+(cooling), plus a dead time and a settling time.
+
+plan_sweep() then searches the order of the required setpoints (with repeat
+counts, approach direction and precedence constraints) of minimum predicted
+duration, by dynamic programming over the counts of remaining setpoints.
+"""
+
+import math
+import os
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+
+# PWM duty of the PID firmware: 64_000 is fully dimmed (heater off), 4_000 full power
+PWM_OFF = 64_000
+PWM_ON = 4_000
+
+Step = namedtuple("Step", ["setpoint", "direction"], defaults=(None,))
+Step.__doc__ = """
+A setpoint to measure.
+
+setpoint  : temperature, degrees
+direction : 'up' to approach it from below, 'down' from above, None for any
+"""
+
+
+def pwm_to_power(pwm):
+    """Heater power in [0, 1] from the PWM duty of the firmware."""
+    return min(max((PWM_OFF - pwm) / (PWM_OFF - PWM_ON), 0.0), 1.0)
+
+
+class ThermalModel:
+    """First order plus dead time model of the sample holder."""
+
+    def __init__(self, tau: float = 300, gain: float = 0.1, t_amb: float = 20, dead_time: float = 10,
+                 settle: float = 60, floor: float = 0.1):
+        """
+        :param tau: Time constant, seconds.
+        :param gain: Heating rate at full power, degrees per second.
+        :param t_amb: Ambient temperature (equilibrium with heater off), degrees.
+        :param dead_time: Delay before the temperature starts moving, seconds.
+        :param settle: Time from arrival to stability, seconds.
+        :param floor: Closest approach to an asymptote (T_amb or T_max) considered reachable, degrees.
+        """
+        self.tau = tau
+        self.gain = gain
+        self.t_amb = t_amb
+        self.dead_time = dead_time
+        self.settle = settle
+        self.floor = floor
+
+    def __repr__(self):
+        return (f"ThermalModel(tau={self.tau:.1f}, gain={self.gain:.4f}, t_amb={self.t_amb:.2f}, "
+                f"dead_time={self.dead_time:.1f}, settle={self.settle:.1f})")
+
+    @property
+    def t_max(self) -> float:
+        """Equilibrium temperature at full power."""
+        return self.t_amb + self.gain * self.tau
+
+    def transition(self, a: float, b: float) -> float:
+        """Predicted seconds to go from temperature a to b (without settling)."""
+        if abs(b - a) < 1e-9:
+            return 0.0
+        if b > a:  # heating at full power towards t_max
+            asymptote = self.t_max
+            ratio = (asymptote - a) / max(asymptote - b, self.floor)
+        else:  # cooling with the heater off towards t_amb
+            asymptote = self.t_amb
+            ratio = (a - asymptote) / max(b - asymptote, self.floor)
+        return self.dead_time + self.tau * math.log(max(ratio, 1.0))
+
+    def step_time(self, a: float, b: float) -> float:
+        """Predicted seconds from setting b (coming from a) to being stable at b."""
+        return self.transition(a, b) + self.settle
+
+    @classmethod
+    def fit(cls, logs, max_dead_time: float = None, **kwargs):
+        """
+        Fit tau, gain and t_amb on PID telemetry.
+
+        :param logs: Iterable of dicts with lists 't' (s), 'measured' (degrees) and 'pwm' (duty),
+            eg. the "pid_log" of the results saved by hot_acquisition.
+        :param max_dead_time: Fit the dead time too, in [0, max_dead_time] seconds: the delay of
+            the heater power that best explains the telemetry (unless dead_time is in kwargs).
+        :param kwargs: Other ThermalModel parameters (dead_time, settle, ...).
+        :return: Fitted ThermalModel.
+        """
+        import numpy as np
+
+        logs = [(np.asarray(log["t"], dtype=float), np.asarray(log["measured"], dtype=float),
+                 np.array([pwm_to_power(p) for p in log["pwm"]])) for log in logs if len(log["t"]) >= 3]
+        if not logs:
+            raise ValueError("no telemetry to fit")
+
+        def solve(delay):
+            rows, rates = [], []
+            for t, T, u in logs:
+                dt = np.diff(t)
+                # power applied `delay` seconds before each interval (held between two readings)
+                source = np.searchsorted(t, t[:-1] - delay, side="right") - 1
+                ok = (dt > 0) & (source >= 0)
+                rates.append((np.diff(T)[ok] / dt[ok]))
+                # regress on the mid points: dT/dt = c0 + c1 * T + c2 * u
+                Tm = 0.5 * (T[1:] + T[:-1])[ok]
+                rows.append(np.column_stack([np.ones(Tm.size), Tm, u[source[ok]]]))
+            A = np.vstack(rows)
+            y = np.concatenate(rates)
+            coefs, *_ = np.linalg.lstsq(A, y, rcond=None)
+            return coefs, float(np.mean((A @ coefs - y) ** 2)) if y.size else np.inf
+
+        delay = 0.0
+        if max_dead_time is not None and "dead_time" not in kwargs:
+            # grid search on the reading period
+            step = float(np.median(np.concatenate([np.diff(t) for t, _, _ in logs])))
+            errors = {d: solve(d)[1] for d in np.arange(0, max_dead_time + step / 2, step)}
+            delay = kwargs["dead_time"] = float(min(errors, key=errors.get))
+        (c0, c1, c2), _ = solve(delay)
+        if c1 >= 0:
+            raise ValueError("fitted plant is not stable (dT/dt increases with T)")
+        tau = -1.0 / c1
+        return cls(tau=tau, gain=c2, t_amb=c0 * tau, **kwargs)
+
+    @classmethod
+    def from_results(cls, paths, **kwargs):
+        """
+        Fit on the "pid_log" of saved results files (JSON or hot_storage formats), in time order.
+        Missing files (eg. a catalogued run moved or deleted) are skipped.
+
+        The settling time is estimated as the median of the measured "t_settling"
+        minus the predicted transition, unless given in kwargs.
+        """
+        from hot_storage import load_run
+
+        results = []
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            data = load_run(path)  # JSON or columnar file
+            if "pid_log" in data:
+                results.append(data)
+        model = cls.fit([r["pid_log"] for r in results], **kwargs)
+        if "settle" not in kwargs:
+            extra = []
+            for prev, cur in zip(results, results[1:]):
+                if "t_settling" in cur:
+                    extra.append(cur["t_settling"] - model.transition(prev["t_setpoint"], cur["t_setpoint"]))
+            if extra:
+                extra.sort()
+                model.settle = max(extra[len(extra) // 2], 0.0)
+        return model
+
+
+def _allowed(direction, prev, setpoint) -> bool:
+    if direction == "up":
+        return prev < setpoint
+    if direction == "down":
+        return prev > setpoint
+    return True
+
+
+def predict_duration(order, model: ThermalModel, start: float) -> float:
+    """Predicted seconds to run `order` (list of setpoints or Steps) starting at temperature `start`."""
+    total, prev = 0.0, start
+    for step in order:
+        setpoint = step.setpoint if isinstance(step, Step) else step
+        total += model.step_time(prev, setpoint)
+        prev = setpoint
+    return total
+
+
+def plan_sweep(steps, model: ThermalModel, start: float, precedence=(), max_states: int = 200_000):
+    """
+    Find the order of `steps` with the minimum predicted duration.
+
+    :param steps: List of setpoints (numbers) or Step(setpoint, direction); repeats are
+        given by listing a step several times.
+    :param model: ThermalModel used to predict the transitions.
+    :param start: Temperature at the start of the sweep, degrees.
+    :param precedence: Pairs (a, b) of steps (numbers or Steps): every a before any b.
+    :param max_states: Above this number of DP states, fall back to a greedy order.
+    :return: Tuple (order as a list of Steps, predicted duration in seconds).
+    :raises ValueError: If the constraints can not be satisfied.
+    """
+    steps = [s if isinstance(s, Step) else Step(s) for s in steps]
+    counts = Counter(steps)
+    kinds = list(counts)
+    index = {k: i for i, k in enumerate(kinds)}
+    before = [set() for _ in kinds]  # before[j]: kinds that must be finished before kind j
+    for a, b in precedence:
+        a = a if isinstance(a, Step) else Step(a)
+        b = b if isinstance(b, Step) else Step(b)
+        before[index[b]].add(index[a])
+
+    n_states = len(kinds) + 1
+    for k in kinds:
+        n_states *= counts[k] + 1
+    if n_states > max_states:
+        return _plan_greedy(kinds, counts, before, model, start)
+
+    @lru_cache(maxsize=None)
+    def best(remaining, last):
+        # minimum time to run the `remaining` counts, the last temperature being `last`
+        if not any(remaining):
+            return 0.0, ()
+        prev = start if last < 0 else kinds[last].setpoint
+        result = (math.inf, ())
+        for j, left in enumerate(remaining):
+            if not left or any(remaining[i] for i in before[j]):
+                continue
+            if not _allowed(kinds[j].direction, prev, kinds[j].setpoint):
+                continue
+            rest = remaining[:j] + (left - 1,) + remaining[j + 1:]
+            cost, tail = best(rest, j)
+            cost += model.step_time(prev, kinds[j].setpoint)
+            if cost < result[0]:
+                result = (cost, (j,) + tail)
+        return result
+
+    cost, order = best(tuple(counts[k] for k in kinds), -1)
+    if math.isinf(cost):
+        raise ValueError("no order satisfies the direction/precedence constraints")
+    return [kinds[j] for j in order], cost
+
+
+def _plan_greedy(kinds, counts, before, model, start):
+    """Nearest (in predicted time) feasible step first."""
+    remaining = [counts[k] for k in kinds]
+    order, total, prev = [], 0.0, start
+    while any(remaining):
+        options = [
+            (model.step_time(prev, k.setpoint), j) for j, k in enumerate(kinds)
+            if remaining[j] and not any(remaining[i] for i in before[j]) and _allowed(k.direction, prev, k.setpoint)
+        ]
+        if not options:
+            raise ValueError("no order satisfies the direction/precedence constraints")
+        cost, j = min(options)
+        remaining[j] -= 1
+        order.append(kinds[j])
+        total += cost
+        prev = kinds[j].setpoint
+    return order, total
+
+
+def hysteresis(setpoints):
+    """Steps measuring every setpoint once approached from below and once from above."""
+    return [Step(s, "up") for s in setpoints] + [Step(s, "down") for s in setpoints]
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}h{minutes:02d}m{seconds:02d}s"
@@ -0,0 +1,633 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Serial layer for the HOT setup devices (PID Pico, Ambit, MultispeQ).
+
+A session opens the port once, does the device handshake once and is then
+reused for every command of a sweep. Every command is timed so the cost per
+command type can be reported at the end of a run.
+
+Devices are found with find_device(), which identifies them by USB id when
+possible, probes the ports concurrently and caches the result on disk. Ports
+not listed by pyserial (eg. the pseudo-terminals of hot_emulator) are added
+with the HOT_PORTS environment variable, separated by os.pathsep.
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import serial
+from serial.tools import list_ports
+
+
+BAUDRATE = 115200
+
+# File where the port of each device found is remembered between runs
+CACHE_PATH = os.environ.get("HOT_DEVICE_CACHE", os.path.join(os.path.expanduser("~"), ".hot_devices.json"))
+
+# Known devices: probe string, expected answer substring and the USB (VID, PID)
+# they usually enumerate with. Ports with a matching USB id are probed first.
+DEVICES = {
+    "PID": {  # Pico running 250121 main-class.py
+        "question": "hello\n",
+        "answer": "Hello PID here",
+        "usb_ids": [(0x2E8A, 0x0005)],
+    },
+    "PID_legacy": {  # Pico running 250115 main.py
+        "question": "\"hello\n\n\"",
+        "answer": "PID ready",
+        "usb_ids": [(0x2E8A, 0x0005)],
+    },
+    "Ambit": {  # ESP32, opening the port resets it and prints the ROM banner
+        "question": "hello",
+        "answer": "ESP-ROM:esp",
+        "usb_ids": [(0x303A, 0x1001), (0x10C4, 0xEA60), (0x1A86, 0x7523)],
+    },
+    "MultispeQ": {  # Teensy based
+        "question": "hello",
+        "answer": "MultispeQ Ready",
+        "usb_ids": [(0x16C0, 0x0483)],
+    },
+}
+
+# Regex for the answer of the PID firmware (250121 main-class.py) to "query"
+QUERY_PATTERN = re.compile(
+    r"Setpoint:\s*(-?[0-9]*\.?[0-9]*),\s*Measured temp:\s*(-?[0-9]*\.?[0-9]*),\s*PID feedback:\s*(-?[0-9]*)"
+)
+# Fields of the answers of the PID firmware to "stats" (ints) and of its autotune report (numbers)
+STATS_PATTERN = re.compile(r"(\w+): (-?\d+)")
+AUTOTUNE_PATTERN = re.compile(r"(\w+): (-?[0-9]+\.?[0-9]*|[a-z_]+)")
+# Trailer of a MultispeQ answer: closing bracket followed by an 8 character checksum
+MSQ_CHECKSUM_PATTERN = re.compile(r".*}[A-Z,0-9]{8}")
+MSQ_TRAILER = re.compile(rb"}[A-Z,0-9]{8}")  # the same, searched in the raw bytes
+
+
+def serial_ports() -> dict:
+    """
+    Lists serial ports without opening them.
+
+    :returns:
+        A dict { port: (vid, pid, serial_number) }, USB fields are None for
+        non USB ports and for the ports of HOT_PORTS.
+    """
+    ports = {p.device: (p.vid, p.pid, p.serial_number) for p in sorted(list_ports.comports())}
+    for port in os.environ.get("HOT_PORTS", "").split(os.pathsep):
+        if port:
+            ports.setdefault(port, (None, None, None))
+    return ports
+
+
+def probe(port: str, question: str, answer: str, timeout: float = 1, cancel: threading.Event = None):
+    """
+    Send `question` on `port` and wait up to `timeout` seconds for a line containing `answer`.
+
+    :param cancel: Event stopping the wait early (the port is closed within 0.1 s).
+    :return: The matching line, or None if the port can not be opened or does not answer.
+    """
+    try:
+        with serial.Serial(port, baudrate=BAUDRATE, timeout=min(timeout, 0.1)) as ser:
+            ser.write(question.encode())
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline and not (cancel is not None and cancel.is_set()):
+                line = ser.readline().decode('utf-8', errors='replace')
+                if line and answer in line:
+                    return line.strip()
+    except (OSError, serial.SerialException):
+        pass
+    return None
+
+
+def load_cache(path: str = CACHE_PATH) -> dict:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: dict, path: str = CACHE_PATH):
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=4)
+    except OSError as e:
+        print(f"Could not write device cache {path}: {e}")
+
+
+def find_device(name: str, question: str = None, answer: str = None, timeout: float = 1,
+                usb_ids=None, cache_path: str = CACHE_PATH, workers: int = 16):
+    """
+    Find the port of a device, using the cache of the previous run when possible.
+
+    1. If the cached USB serial number is connected, its port is returned without probing.
+    2. Otherwise the cached port is probed first.
+    3. Otherwise all ports are probed concurrently, ports with a USB id known
+       for this device first, ports known for other devices last.
+
+    :param name: Key of the device in DEVICES and in the cache.
+    :param question: Probe string (default: from DEVICES).
+    :param answer: Substring expected in the answer (default: from DEVICES).
+    :param timeout: Max seconds to wait for the answer on each port.
+    :param usb_ids: List of (VID, PID) of the device (default: from DEVICES).
+    :param cache_path: Path of the JSON cache, None to disable caching.
+    :param workers: Max number of ports probed at the same time.
+    :return: The port of the device, or None if not found.
+    """
+    spec = DEVICES.get(name, {})
+    question = spec.get("question", "hello\n") if question is None else question
+    answer = spec.get("answer", "") if answer is None else answer
+    usb_ids = set(map(tuple, spec.get("usb_ids", []) if usb_ids is None else usb_ids))
+    other_ids = {tuple(i) for key, other in DEVICES.items() if key != name for i in other.get("usb_ids", [])} - usb_ids
+
+    t0 = time.perf_counter()
+    ports = serial_ports()
+    cache = load_cache(cache_path) if cache_path else {}
+    entry = cache.get(name)
+
+    def found(port, how):
+        vid, pid, serial_number = ports.get(port, (None, None, None))
+        if cache_path:
+            cache[name] = {"port": port, "vid": vid, "pid": pid, "serial_number": serial_number}
+            save_cache(cache, cache_path)
+        print(f"Found {name} at: {port} ({how}, {time.perf_counter() - t0:.2f} s)")
+        return port
+
+    tried = set()
+    if entry:
+        if entry.get("serial_number"):
+            for port, (vid, pid, serial_number) in ports.items():
+                if serial_number == entry["serial_number"] and (vid, pid) == (entry.get("vid"), entry.get("pid")):
+                    return found(port, "USB serial number")
+        if entry.get("port") in ports:
+            tried.add(entry["port"])
+            if probe(entry["port"], question, answer, timeout) is not None:
+                return found(entry["port"], "cached port")
+
+    def rank(port):
+        vid, pid, _ = ports[port]
+        if (vid, pid) in usb_ids:
+            return 0
+        return 2 if (vid, pid) in other_ids else 1
+
+    candidates = sorted((p for p in ports if p not in tried), key=rank)
+    if not candidates:
+        return None
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(candidates)))
+    cancel = threading.Event()
+    try:
+        futures = {pool.submit(probe, port, question, answer, timeout, cancel): port for port in candidates}
+        for future in as_completed(futures):
+            if future.result() is not None:
+                return found(futures[future], "probe")
+    finally:
+        # close the other ports before returning: a probe still reading would take the
+        # answers meant for the next open of its port (eg. the banner of the Ambit)
+        cancel.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+    print(f"{name} not found ({time.perf_counter() - t0:.2f} s)")
+    return None
+
+
+def parse_msq_response(lines) -> dict:
+    """
+    Parse a MultispeQ answer (the lines returned by MsQSession.protocol).
+
+    :return: The JSON of the answer, the checksum trailer removed.
+    """
+    return json.loads("".join(lines).rstrip()[:-8])
+
+
+def parse_query(msg: str):
+    """
+    Parse a PID "query" answer.
+
+    :param msg: Line like 'Setpoint: 20.0, Measured temp: 21.3, PID feedback: 40000'.
+    :return: Tuple (setpoint, measured, pwm) or None if the line does not match.
+    """
+    match = QUERY_PATTERN.search(msg)
+    if match is None:
+        return None
+    try:
+        return float(match.group(1)), float(match.group(2)), int(match.group(3))
+    except ValueError:
+        return None
+
+
+class DeviceSession:
+    """
+    Long-lived serial connection to one device.
+
+    The port is opened lazily on first use and kept open until close().
+    Each command is timed and accumulated in `stats` by command name.
+    """
+
+    handshake = None     # string sent once after opening, None for no handshake
+    settle = 0.0         # seconds to wait after opening (eg. boot after reset)
+
+    def __init__(self, port: str, baudrate: int = BAUDRATE, timeout: float = 1, terminator: str = "\n"):
+        """
+        :param port: The serial port of the device.
+        :param baudrate: Baudrate of the connection (default: 115200).
+        :param timeout: Read timeout in seconds (default: 1).
+        :param terminator: String appended to every command (default: newline).
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.terminator = terminator
+        self.ser = None
+        self.stats = {}  # { command_name: [count, total_seconds, max_seconds] }
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        state = "open" if self.is_open else "closed"
+        return f"{self.__class__.__name__}({self.port!r}, {state})"
+
+    @property
+    def is_open(self) -> bool:
+        return self.ser is not None and self.ser.is_open
+
+    def open(self):
+        """Open the port (once) and run the device handshake."""
+        if self.is_open:
+            return self
+        t0 = time.perf_counter()
+        self.ser = serial.Serial(baudrate=self.baudrate, timeout=self.timeout)
+        self.ser.port = self.port
+        self.ser.rts = False  # set before opening to avoid resetting the board
+        self.ser.open()
+        if self.settle:
+            time.sleep(self.settle)
+        self.ser.reset_input_buffer()
+        if self.handshake is not None:
+            self.write(self.handshake)
+            self.on_handshake()
+        self._record("open", time.perf_counter() - t0)
+        return self
+
+    def on_handshake(self):
+        """Consume the answer of the handshake, override per device."""
+        self.ser.readline()
+
+    def close(self):
+        if self.ser is not None:
+            self.ser.close()
+        self.ser = None
+
+    def frame(self, string: str) -> bytes:
+        """Encode a command as expected by the device."""
+        return f"{string}{self.terminator}".encode()
+
+    def write(self, string: str):
+        self.open()
+        self.ser.write(self.frame(string))
+
+    def readline(self) -> str:
+        """Read one line, decoded and stripped. Empty string on timeout."""
+        self.open()
+        return self.ser.readline().decode('utf-8', errors='replace').strip()
+
+    def command(self, string: str, name: str = None) -> str:
+        """
+        Send a command and return the first line of the answer.
+
+        :param string: Command to send.
+        :param name: Name under which the timing is recorded (default: first word of the command).
+        """
+        t0 = time.perf_counter()
+        self.write(string)
+        response = self.readline()
+        self._record(name or _command_name(string), time.perf_counter() - t0)
+        return response
+
+    def command_lines(self, string: str, until=None, max_lines: int = None, name: str = None, on_line=None) -> list:
+        """
+        Send a command and collect the answer lines.
+
+        Reading stops on a read timeout (no more data), when a line matches
+        `until`, or when `max_lines` lines are collected.
+
+        :param string: Command to send.
+        :param until: Compiled regex or string pattern terminating the answer (the matching line is kept).
+        :param max_lines: Maximum number of lines to read.
+        :param name: Name under which the timing is recorded.
+        :param on_line: Callable called with each line as soon as it is read.
+        :return: List of decoded lines.
+        """
+        if isinstance(until, str):
+            until = re.compile(until)
+        t0 = time.perf_counter()
+        self.write(string)
+        lines = []
+        while max_lines is None or len(lines) < max_lines:
+            line = self.ser.readline()
+            if not line:  # read timeout, assume the device is done
+                break
+            line = line.decode('utf-8', errors='replace').rstrip()
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+            if until is not None and until.match(line):
+                break
+        self._record(name or _command_name(string), time.perf_counter() - t0)
+        return lines
+
+    def read_until(self, pattern, overlap: int = 64) -> bytes:
+        """
+        Read in blocks until the line where `pattern` is found is complete, or until a read timeout.
+
+        Much faster than line by line for long answers (pyserial readline() reads one byte
+        per call), but everything the port has received is consumed: only for answers after
+        which the device is silent.
+
+        :param pattern: Compiled bytes regex.
+        :param overlap: Bytes before each new block searched again, longer than a match.
+        :return: The bytes read.
+        """
+        self.open()
+        ser = self.ser
+        data = bytearray()
+        end = -1  # end of the match
+        while True:
+            block = ser.read(ser.in_waiting or 1)
+            if not block:  # read timeout, assume the device is done
+                break
+            start = len(data)
+            data += block
+            if end < 0:
+                match = pattern.search(data, max(start - overlap, 0))
+                end = match.end() if match else -1
+            if end >= 0 and data.find(b"\n", end) >= 0:
+                break
+        return bytes(data)
+
+    def _record(self, name: str, seconds: float):
+        entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+    def report(self) -> str:
+        """Return a table with count, mean and max duration of each command type."""
+        lines = [f"{self.__class__.__name__} {self.port}"]
+        for name, (count, total, worst) in self.stats.items():
+            lines.append(f"  {name:<12} n={count:<5d} mean={1e3 * total / count:8.1f} ms  max={1e3 * worst:8.1f} ms")
+        return "\n".join(lines)
+
+
+class PIDSession(DeviceSession):
+    """
+    Session with the Pico PID firmware.
+
+    With quoted=False the protocol of 250121 main-class.py is used (plain lines),
+    with quoted=True the one of 250115 main.py ('"command"' followed by two newlines).
+    """
+
+    def __init__(self, port: str, quoted: bool = False, **kwargs):
+        super().__init__(port, **kwargs)
+        self.quoted = quoted
+
+    def frame(self, string: str) -> bytes:
+        if self.quoted:
+            return f"\"{string}\"\n\n".encode()
+        return super().frame(string)
+
+    def setpoint(self, value, max_lines: int = 5) -> str:
+        """
+        Send a new setpoint and return the confirmation line.
+
+        The firmware echoes 'Received setpoint' and then 'Setpoint updated to: X'
+        (or 'Can not parse setpoint'); both are consumed so that they do not
+        end up in the answer of the next query.
+        """
+        t0 = time.perf_counter()
+        self.write(f"setpoint_{value}")
+        msg = ""
+        for _ in range(max_lines):
+            msg = self.readline()
+            if not msg or "updated" in msg or "parse" in msg.lower():
+                break
+        self._record("setpoint", time.perf_counter() - t0)
+        return msg
+
+    def ramp(self, rate: float, max_lines: int = 5) -> str:
+        """
+        Limit the rate of change of the setpoint (°C/s, 0 to apply new setpoints at once).
+
+        :return: The confirmation line ('Ramp updated to: X' or 'UPDATED Ramp: X').
+        """
+        self.write(f"ramp_{rate}")
+        msg = ""
+        for _ in range(max_lines):
+            msg = self.readline()
+            if not msg or "ramp" in msg.lower():
+                break
+        return msg
+
+    def query(self, trials: int = 3):
+        """
+        Ask the controller state.
+
+        :param trials: Number of lines read to skip stale output before giving up.
+        :return: Tuple (setpoint, measured, pwm) or None if no answer could be parsed.
+        """
+        t0 = time.perf_counter()
+        self.write("query")
+        reading = None
+        for _ in range(trials):
+            msg = self.readline()
+            if not msg:
+                break
+            reading = parse_query(msg)
+            if reading is not None:
+                break
+        self._record("query", time.perf_counter() - t0)
+        return reading
+
+    def stats(self) -> dict:
+        """
+        Decode duration and garbage collection pauses measured by the firmware.
+
+        :return: Dict with 'decode_us', 'decode_max_us', 'decodes', 'gc_us', 'gc_max_us',
+            'gcs', 'errors', 'mem_free' (ints), empty if the answer could not be parsed.
+        """
+        msg = self.command("stats")
+        if not msg.startswith("Stats:"):
+            return {}
+        return {key: int(value) for key, value in STATS_PATTERN.findall(msg)}
+
+    def autotune(self, setpoint, rule: str = None, timeout: float = 3600, on_line=None) -> dict:
+        """
+        Run the relay autotune of the firmware around `setpoint` and wait for its report.
+
+        The firmware stores the gains it derives and uses them from the next setpoint on.
+
+        :param rule: Tuning rule, "ziegler_nichols", "some_overshoot" or "no_overshoot"
+            (fastest to smoothest settling), the firmware default if None.
+        :param timeout: Seconds to wait for the report.
+        :param on_line: Callable called with each progress line.
+        :return: Dict with the ultimate gain 'Ku' and period 'Pu' (s), the oscillation amplitude 'a'
+            (°C), the new 'Kp', 'Ki', 'Kd' (floats) and 'rule'; empty if the autotune failed.
+        :raises TimeoutError: If no report came within `timeout`.
+        """
+        t0 = time.perf_counter()
+        self.write(f"autotune_{setpoint}" + (f"_{rule}" if rule else ""))
+        while time.perf_counter() - t0 < timeout:
+            msg = self.readline()
+            if msg.startswith("Autotune:"):
+                break
+            if msg.startswith("Autotune failed") or "parse autotune" in msg.lower() or "UNPARSED Autotune" in msg:
+                self._record("autotune", time.perf_counter() - t0)
+                return {}
+            if msg and on_line is not None:
+                on_line(msg)
+        else:
+            raise TimeoutError(f"no autotune report after {timeout} s")
+        self._record("autotune", time.perf_counter() - t0)
+        return {key: value if key == "rule" else float(value) for key, value in AUTOTUNE_PATTERN.findall(msg)}
+
+    def schedule(self, table, on: str = "setpoint", max_lines: int = 5) -> str:
+        """
+        Upload a gain schedule: the firmware interpolates Kp, Ki, Kd between its points.
+
+        The schedule is stored on the device and used after a restart too.
+
+        :param table: Iterable of (x, Kp, Ki, Kd), x a setpoint or a temperature (°C);
+            None to go back to fixed gains.
+        :param on: "setpoint" to follow the setpoint, "input" to follow the measured temperature.
+        :return: The confirmation line ('Schedule updated: N points on ...').
+        """
+        if table is None:
+            self.write("schedule_off")
+        else:
+            points = ",".join(":".join(f"{value:g}" for value in row) for row in table)
+            self.write(f"schedule_{on}_{points}")
+        msg = ""
+        for _ in range(max_lines):
+            msg = self.readline()
+            if not msg or "schedule" in msg.lower():
+                break
+        return msg
+
+    def autotune_schedule(self, setpoints, rule: str = None, on: str = "setpoint", **kwargs) -> list:
+        """
+        Autotune around each setpoint and upload the gains found as a gain schedule.
+
+        :param setpoints: Operating points, eg. the setpoints of a sweep.
+        :param kwargs: Passed to autotune() (timeout, on_line).
+        :return: The table uploaded, list of (setpoint, Kp, Ki, Kd); the failed points are left out.
+        """
+        table = []
+        for setpoint in setpoints:
+            result = self.autotune(setpoint, rule, **kwargs)
+            if result:
+                table.append((setpoint, result["Kp"], result["Ki"], result["Kd"]))
+            else:
+                print(f"Autotune at {setpoint} failed, left out of the schedule")
+        if table:
+            self.schedule(table, on)
+        return table
+
+    def stop(self) -> str:
+        return self.command("stop")
+
+
+class AmbitSession(DeviceSession):
+    """
+    Session with the Ambit sensor.
+
+    Opening the port resets the ESP, so the session waits for the boot and
+    sends 'hello' (master mode) only once instead of before every command.
+    """
+
+    handshake = "hello"
+    settle = 0.7
+
+    def on_handshake(self):
+        time.sleep(0.5)
+        self.ser.reset_input_buffer()
+
+    def run(self, string: str, max_lines: int = None, on_line=None) -> list:
+        """
+        Send a command and read lines until the device is quiet.
+
+        :param string: Command to send (eg. 'temp' or an 'arrun1,...' string).
+        :param max_lines: Stop after this many lines instead of waiting for the read timeout.
+        :param on_line: Callable called with each line as soon as it is read.
+        """
+        return self.command_lines(string.strip(), max_lines=max_lines, on_line=on_line)
+
+
+class MsQSession(DeviceSession):
+    """Session with the MultispeQ, commands are sent without terminator."""
+
+    def __init__(self, port: str, **kwargs):
+        kwargs.setdefault("terminator", "")
+        super().__init__(port, **kwargs)
+
+    def protocol(self, string: str) -> list:
+        """
+        Send a protocol and read until the checksum trailer.
+
+        The answer is read in blocks (see read_until), the MultispeQ waits for the next command after it.
+
+        :return: Lines of the answer, as command_lines() returns them (see parse_msq_response).
+        """
+        t0 = time.perf_counter()
+        self.write(string)
+        text = self.read_until(MSQ_TRAILER).decode('utf-8', errors='replace')
+        self._record("protocol", time.perf_counter() - t0)
+        lines = [line.rstrip() for line in text.split("\n")]
+        if lines and not lines[-1] and text.endswith("\n"):
+            lines.pop()
+        return lines
+
+    def protocol_json(self, string: str) -> dict:
+        """Send a protocol and return the JSON of the answer."""
+        return parse_msq_response(self.protocol(string))
+
+
+def _command_name(string: str) -> str:
+    match = re.match(r"\W*([A-Za-z]+)", string)
+    return match.group(1) if match else "command"
+
+
+_sessions = {}
+
+
+def open_session(port: str, cls=DeviceSession, **kwargs) -> DeviceSession:
+    """
+    Return the open session for `port`, creating it on first use.
+
+    Sessions are kept for the whole run (one connection per device) and
+    closed at interpreter exit.
+    """
+    session = _sessions.get(port)
+    if session is None or not isinstance(session, cls):
+        if session is not None:
+            session.close()
+        session = _sessions[port] = cls(port, **kwargs)
+    return session.open()
+
+
+def close_sessions(report: bool = True):
+    """Close all sessions, printing their timing report."""
+    for session in list(_sessions.values()):
+        if report and session.stats:
+            print(session.report())
+        session.close()
+    _sessions.clear()
+
+
+atexit.register(close_sessions, False)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Detection of the temperature stabilization from the streaming PID readings.
+
+The detector keeps a rolling time window of (time, temperature) samples with
+running sums, so mean, standard deviation and slope (least squares) are
+updated in O(1) per reading. The plant counts as settled when, over a full
+window, the mean is close to the setpoint, the noise is small and the
+temperature does not drift any more.
+"""
+
+from collections import deque
+from math import sqrt
+
+
+class StabilizationDetector:
+    """
+    Rolling mean / standard deviation / slope convergence test.
+
+    Usage:
+        detector = StabilizationDetector(setpoint=25)
+        for t, T in readings:
+            if detector.update(t, T):
+                break
+        detector.settling_time  # seconds from the first reading (or t_start) to stability
+    """
+
+    def __init__(self, setpoint: float, window: float = 30, mean_tol: float = 0.1, std_tol: float = 0.05,
+                 slope_tol: float = 0.05, min_samples: int = 10, max_wait: float = None):
+        """
+        :param setpoint: Target temperature, degrees.
+        :param window: Length of the rolling window, seconds.
+        :param mean_tol: Max |mean - setpoint| over the window, degrees.
+        :param std_tol: Max standard deviation over the window, degrees.
+        :param slope_tol: Max |slope| of the least squares line over the window, degrees per minute.
+        :param min_samples: Min number of samples in the window before testing.
+        :param max_wait: Declare stability anyway this many seconds after the start (None: wait forever).
+        """
+        self.setpoint = setpoint
+        self.window = window
+        self.mean_tol = mean_tol
+        self.std_tol = std_tol
+        self.slope_tol = slope_tol
+        self.min_samples = min_samples
+        self.max_wait = max_wait
+        self.reset()
+
+    def reset(self, setpoint: float = None, t_start: float = None):
+        """
+        Clear the window.
+
+        :param setpoint: New setpoint (default: keep the current one).
+        :param t_start: Origin of settling_time, eg. the time the setpoint was sent
+            (default: time of the first reading).
+        """
+        if setpoint is not None:
+            self.setpoint = setpoint
+        self._samples = deque()
+        self._n = 0
+        self._st = self._sx = self._stt = self._stx = self._sxx = 0.0
+        self.t_start = t_start
+        self.t_stable = None
+        self.timed_out = False
+
+    def update(self, t: float, value: float) -> bool:
+        """
+        Add a reading and return whether the temperature is stable.
+
+        Readings not newer than the last one are ignored, so feeding the same
+        reading twice is harmless. Once stable, the detector stays stable until reset().
+
+        :param t: Time of the reading, seconds (any origin, eg. time.time()).
+        :param value: Measured temperature, degrees.
+        """
+        if self.t_stable is not None:
+            return True
+        if self._samples and t <= self._samples[-1][0] + self.t_start:
+            return False
+        if self.t_start is None:
+            self.t_start = t
+        t = t - self.t_start  # keep the sums small for numerical accuracy
+
+        self._add(t, value, 1)
+        while t - self._samples[0][0] > self.window:
+            self._add(*self._samples[0], -1)
+
+        if self.is_settled() or (self.max_wait is not None and t >= self.max_wait):
+            self.timed_out = not self.is_settled()
+            self.t_stable = t + self.t_start
+            return True
+        return False
+
+    def _add(self, t: float, x: float, sign: int):
+        if sign > 0:
+            self._samples.append((t, x))
+        else:
+            self._samples.popleft()
+        self._n += sign
+        self._st += sign * t
+        self._sx += sign * x
+        self._stt += sign * t * t
+        self._stx += sign * t * x
+        self._sxx += sign * x * x
+
+    def stats(self):
+        """Return (mean, std, slope in degrees/min) of the current window, None if empty."""
+        n = self._n
+        if n == 0:
+            return None
+        mean = self._sx / n
+        var = max(self._sxx / n - mean * mean, 0.0)
+        denom = n * self._stt - self._st * self._st
+        slope = (n * self._stx - self._st * self._sx) / denom * 60 if denom > 1e-12 else 0.0
+        return mean, sqrt(var), slope
+
+    def is_settled(self) -> bool:
+        if self._n < self.min_samples:
+            return False
+        if self._samples[-1][0] - self._samples[0][0] < 0.9 * self.window:  # window not full yet
+            return False
+        mean, std, slope = self.stats()
+        return (abs(mean - self.setpoint) <= self.mean_tol
+                and std <= self.std_tol
+                and abs(slope) <= self.slope_tol)
+
+    @property
+    def stable(self) -> bool:
+        return self.t_stable is not None
+
+    @property
+    def settling_time(self):
+        """Seconds from t_start to stability, None if not stable yet."""
+        if self.t_stable is None:
+            return None
+        return self.t_stable - self.t_start
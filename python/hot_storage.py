@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Columnar storage of the measurement results.
+
+A results dict (Ambit run, MultispeQ device JSON, ...) is split into its
+numeric series, stored as typed arrays, and the rest of the dict, stored as
+a small JSON metadata string in the same file. Each series is replaced in
+the metadata by {"__array__": key}, so load_run() puts the arrays back at
+their place and returns the same structure as the original dict, with NumPy
+arrays instead of lists.
+
+Formats, chosen with `fmt` or the HOT_STORAGE_FORMAT environment variable:
+    - "npz": NumPy .npz, no extra dependency
+    - "hdf5": .h5 with h5py, one dataset per series
+    - "parquet": .parquet with pyarrow, one list column per series
+
+The legacy .json files are read by load_run() too, and converted with
+convert_json() / convert_dir(), or from the command line (the runs of the
+catalogue of hot_catalog then point to the converted files):
+
+    python hot_storage.py DATA_DIR [--format npz] [--remove] [--catalog hot_runs.sqlite]
+
+NumPy, like h5py and pyarrow, is imported by the functions that use it: the
+acquisition scripts import this module without loading it.
+"""
+
+import json
+import os
+from glob import glob
+
+
+FORMATS = {"npz": ".npz", "hdf5": ".h5", "parquet": ".parquet"}
+DEFAULT_FORMAT = os.environ.get("HOT_STORAGE_FORMAT", "npz")
+LEGACY_PATTERNS = ("*_Ambit.json", "*_HOT_setpoint*.json")
+MIN_ARRAY_SIZE = 8  # shorter numeric lists stay in the metadata, readable
+METADATA_KEY = "__metadata__"
+ARRAY_MARKER = "__array__"
+
+
+def _as_array(value):
+    """Typed array for a numeric list (any depth, rectangular), None otherwise."""
+    import numpy as np
+
+    if isinstance(value, np.ndarray):
+        array = value
+    elif isinstance(value, (list, tuple)) and value:
+        try:
+            array = np.asarray(value)
+        except ValueError:  # ragged nested lists
+            return None
+    else:
+        return None
+    if array.dtype.kind not in "biuf" or array.size < MIN_ARRAY_SIZE:
+        return None
+    if array.dtype == np.int64 and array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max:
+        array = array.astype(np.int32)
+    return array
+
+
+def split_results(results):
+    """
+    Split results into numeric series and metadata.
+
+    :param results: Results dict (or list), as saved in the JSON files.
+    :return: Tuple (arrays, metadata): dict key -> array, keys being the paths in
+        the results ("pid_log/t", "sample/0/set/1/data_raw"...), and the results
+        with each series replaced by {"__array__": key}.
+    """
+    import numpy as np
+
+    arrays = {}
+
+    def walk(value, path):
+        array = _as_array(value)
+        if array is not None:
+            arrays[path] = array
+            return {ARRAY_MARKER: path}
+        if isinstance(value, dict):
+            return {k: walk(v, f"{path}/{k}" if path else str(k)) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [walk(v, f"{path}/{i}" if path else str(i)) for i, v in enumerate(value)]
+        if isinstance(value, np.ndarray):  # short or non numeric array
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    return arrays, walk(results, "")
+
+
+def join_results(arrays: dict, metadata):
+    """Inverse of split_results(): put the arrays back in the metadata."""
+    if isinstance(metadata, dict):
+        if len(metadata) == 1 and ARRAY_MARKER in metadata:
+            return arrays[metadata[ARRAY_MARKER]]
+        return {k: join_results(arrays, v) for k, v in metadata.items()}
+    if isinstance(metadata, list):
+        return [join_results(arrays, v) for v in metadata]
+    return metadata
+
+
+def _path_with_ext(path: str, fmt: str) -> str:
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown storage format {fmt!r}, expected one of {list(FORMATS)}")
+    root, ext = os.path.splitext(path)
+    if ext in FORMATS.values() or ext == ".json":
+        path = root
+    return path + FORMATS[fmt]
+
+
+def save_run(path: str, results, fmt: str = None, overwrite: bool = False) -> str:
+    """
+    Save a results dict in a columnar file.
+
+    :param path: File path, the extension of the format is added/replaced.
+    :param results: Results dict, NumPy arrays or lists of numbers.
+    :param fmt: "npz", "hdf5" or "parquet", DEFAULT_FORMAT if None.
+    :param overwrite: Replace an existing file instead of raising FileExistsError.
+    :return: Path of the saved file.
+    """
+    fmt = fmt or DEFAULT_FORMAT
+    path = _path_with_ext(path, fmt)
+    if not overwrite and os.path.exists(path):
+        raise FileExistsError(f"{path} exists, not overwritten")
+    arrays, metadata = split_results(results)
+    metadata = json.dumps(metadata, ensure_ascii=False)
+    if fmt == "npz":
+        import numpy as np
+
+        np.savez(path, **arrays, **{METADATA_KEY: np.array(metadata)})
+    elif fmt == "hdf5":
+        import h5py
+
+        with h5py.File(path, "w") as f:
+            f.attrs[METADATA_KEY] = metadata
+            for key, array in arrays.items():
+                f.create_dataset(key, data=array)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # one row, one list column per series; shapes kept for the 2D+ arrays
+        shapes = {key: array.shape for key, array in arrays.items() if array.ndim > 1}
+        table = pa.table({key: pa.array([array.ravel()]) for key, array in arrays.items()})
+        table = table.replace_schema_metadata({METADATA_KEY: metadata, "shapes": json.dumps(shapes)})
+        pq.write_table(table, path)
+    return path
+
+
+def load_arrays(path: str):
+    """
+    Read the series and the metadata of a file saved by save_run().
+
+    :return: Tuple (arrays, metadata) as returned by split_results().
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == FORMATS["npz"]:
+        import numpy as np
+
+        with np.load(path) as f:
+            metadata = str(f[METADATA_KEY])
+            arrays = {key: f[key] for key in f.files if key != METADATA_KEY}
+    elif ext == FORMATS["hdf5"]:
+        import h5py
+
+        arrays = {}
+        with h5py.File(path, "r") as f:
+            metadata = f.attrs[METADATA_KEY]
+            f.visititems(lambda key, item: arrays.__setitem__(key, item[()]) if isinstance(item, h5py.Dataset) else None)
+    elif ext == FORMATS["parquet"]:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        schema = table.schema.metadata
+        metadata = schema[METADATA_KEY.encode()].decode()
+        shapes = json.loads(schema[b"shapes"])
+        arrays = {}
+        for key in table.column_names:
+            array = table.column(key).chunk(0).values.to_numpy()
+            arrays[key] = array.reshape(shapes[key]) if key in shapes else array
+    else:
+        raise ValueError(f"not a columnar results file: {path}")
+    return arrays, json.loads(metadata)
+
+
+def load_run(path: str):
+    """
+    Load a results file, columnar or legacy JSON.
+
+    :return: The results dict, series as NumPy arrays.
+    """
+    if os.path.splitext(path)[1] == ".json":
+        with open(path, encoding="utf-8") as f:
+            arrays, metadata = split_results(json.load(f))
+    else:
+        arrays, metadata = load_arrays(path)
+    return join_results(arrays, metadata)
+
+
+def convert_json(path: str, fmt: str = None, remove: bool = False, catalog=None) -> str:
+    """
+    Convert a legacy JSON results file, next to it.
+
+    :param remove: Delete the JSON file once converted and checked.
+    :param catalog: hot_catalog.RunCatalog where the run of the JSON file, if catalogued,
+        is moved to the new file (needed with `remove`).
+    :return: Path of the new file.
+    """
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+    new_path = save_run(path, results, fmt, overwrite=True)  # converted again: same content
+    if remove:
+        import numpy as np
+
+        arrays, _ = split_results(results)
+        saved, _ = load_arrays(new_path)
+        if saved.keys() != arrays.keys() or not all(np.array_equal(saved[k], arrays[k]) for k in arrays):
+            raise IOError(f"{new_path} does not match {path}, JSON file kept")
+    if catalog is not None:
+        catalog.move(path, new_path)
+    if remove:
+        os.remove(path)
+    return new_path
+
+
+def convert_dir(directory: str, fmt: str = None, remove: bool = False, patterns=LEGACY_PATTERNS,
+                catalog=None) -> list:
+    """Convert the legacy JSON results files of `directory` and its subfolders, see convert_json()."""
+    paths = sorted({p for pattern in patterns for p in glob(os.path.join(directory, "**", pattern), recursive=True)})
+    converted = []
+    for path in paths:
+        converted.append(convert_json(path, fmt, remove, catalog))
+        print(f"{path} -> {converted[-1]}")
+    return converted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from hot_catalog import CATALOG_PATH, RunCatalog
+
+    parser = argparse.ArgumentParser(description="Convert the JSON results files to a columnar format.")
+    parser.add_argument("directory")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, choices=list(FORMATS))
+    parser.add_argument("--remove", action="store_true", help="delete the JSON files once converted")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="catalogue to update, if it exists")
+    args = parser.parse_args()
+    catalog = RunCatalog(args.catalog) if os.path.exists(args.catalog) else None
+    convert_dir(args.directory, args.format, args.remove, catalog=catalog)
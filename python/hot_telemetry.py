@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 2026
+
+Decoder of the binary telemetry frames of the PID firmware (261018 telemetry.py).
+
+Frames are found by their sync byte and validated with their CRC, so text
+lines printed by the firmware between frames are skipped. All candidate
+frames of a chunk are checked at once with NumPy, and the fields are
+returned as NumPy arrays instead of being parsed line by line with regexes.
+"""
+
+import numpy as np
+
+
+SYNC = 0xA5
+FRAME_SIZE = 14
+FRAME_DTYPE = np.dtype([
+    ("sync", "u1"),
+    ("seq", "u1"),
+    ("ticks", "<u4"),
+    ("setpoint", "<i2"),
+    ("measured", "<i2"),
+    ("pwm", "<u2"),
+    ("crc", "<u2"),
+])
+TICKS_PERIOD = 1 << 30  # MicroPython ticks_ms() wraps at 2**30
+
+
+def _crc16_table():
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def crc16(rows: np.ndarray) -> np.ndarray:
+    """CRC-16/CCITT-FALSE of each row of a 2D uint8 array (same as binascii.crc_hqx(row, 0xFFFF))."""
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for col in rows.T:
+        crc = (crc << np.uint16(8)) ^ CRC16_TABLE[(crc >> np.uint16(8)) ^ col]
+    return crc
+
+
+def decode_frames(data: bytes):
+    """
+    Decode all the valid frames in `data`.
+
+    :param data: Raw bytes read from the port.
+    :return: Tuple (frames, rest, n_bad):
+        - frames: structured array of FRAME_DTYPE
+        - rest: trailing bytes that may be the start of a frame, to prepend to the next chunk
+        - n_bad: number of sync bytes outside valid frames not starting a valid frame
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    last_start = raw.size - FRAME_SIZE
+    starts = np.flatnonzero(raw[:last_start + 1] == SYNC) if last_start >= 0 else np.empty(0, dtype=np.intp)
+    rows = raw[starts[:, None] + np.arange(FRAME_SIZE)]
+    crc = rows[:, -2].astype(np.uint16) | (rows[:, -1].astype(np.uint16) << np.uint16(8))
+    valid = crc16(rows[:, :-2]) == crc
+    bad = starts[~valid]
+    starts, rows = starts[valid], rows[valid]
+
+    # A sync byte inside a valid frame can not start another frame
+    if starts.size > 1 and np.any(np.diff(starts) < FRAME_SIZE):
+        keep, end = [], -1
+        for i, start in enumerate(starts):
+            if start >= end:
+                keep.append(i)
+                end = start + FRAME_SIZE
+        starts, rows = starts[keep], rows[keep]
+
+    # Wrong CRC candidates not lying inside a valid frame are corrupted frames
+    owner = np.searchsorted(starts, bad, side="right") - 1
+    inside = (owner >= 0) & (bad < starts[np.maximum(owner, 0)] + FRAME_SIZE) if starts.size else np.zeros(bad.size, bool)
+    n_bad = int(np.count_nonzero(~inside))
+
+    consumed = int(starts[-1]) + FRAME_SIZE if starts.size else 0
+    rest = bytes(raw[max(consumed, last_start + 1):])
+    frames = np.ascontiguousarray(rows).view(FRAME_DTYPE).reshape(-1)
+    return frames, rest, n_bad
+
+
+def frames_to_arrays(frames: np.ndarray) -> dict:
+    """
+    Convert frames to arrays in physical units.
+
+    :return: Dict of arrays: 't' (s since the first frame, ticks wrap handled),
+        'seq', 'setpoint' and 'measured' (degrees), 'pwm'.
+    """
+    ticks = frames["ticks"].astype(np.int64)
+    elapsed = np.concatenate([[0], np.cumsum(np.diff(ticks) % TICKS_PERIOD)]) if ticks.size else ticks
+    return {
+        "t": elapsed / 1e3,
+        "seq": frames["seq"].copy(),
+        "setpoint": frames["setpoint"] / 100,
+        "measured": frames["measured"] / 100,
+        "pwm": frames["pwm"].astype(np.int32),
+    }
+
+
+class TelemetryDecoder:
+    """Streaming decoder: feed() raw chunks as they are read, arrays() at any time."""
+
+    def __init__(self):
+        self._rest = b""
+        self._frames = []
+        self.n_bad = 0
+        self.n_lost = 0  # frames missing according to the sequence numbers
+
+    def feed(self, chunk: bytes) -> np.ndarray:
+        """Decode a chunk and return the frames completed by it."""
+        frames, self._rest, n_bad = decode_frames(self._rest + chunk)
+        self.n_bad += n_bad
+        if frames.size:
+            if self._frames:
+                frames_seq = np.concatenate([self._frames[-1]["seq"][-1:], frames["seq"]])
+            else:
+                frames_seq = frames["seq"]
+            self.n_lost += int(np.sum((np.diff(frames_seq.astype(np.int16)) - 1) % 256))
+            self._frames.append(frames)
+        return frames
+
+    def arrays(self) -> dict:
+        frames = np.concatenate(self._frames) if self._frames else np.empty(0, dtype=FRAME_DTYPE)
+        return frames_to_arrays(frames)
+
+
+def read_telemetry(session, duration: float) -> dict:
+    """
+    Switch the PID firmware to binary telemetry, record for `duration` seconds and switch back.
+
+    :param session: Open hot_serial.PIDSession.
+    :param duration: Recording time, seconds.
+    :return: Dict of arrays, see frames_to_arrays().
+    """
+    import time
+
+    decoder = TelemetryDecoder()
+    session.write("telemetry_bin")
+    deadline = time.monotonic() + duration
+    try:
+        while time.monotonic() < deadline:
+            chunk = session.ser.read(max(session.ser.in_waiting, 1))
+            if chunk:
+                decoder.feed(chunk)
+    finally:
+        session.write("telemetry_text")
+        session.ser.reset_input_buffer()
+    return decoder.arrays()